@@ -7,69 +7,58 @@
 # Changed default text in a lot of areas. wasn't needed. Saves on clutter.
 
 
+import sys
+import time
+
+# When the program started, for the startup time in the Performance window.
+STARTED = time.perf_counter()
+
+# Anything on the command line means the command line version, which never loads Tk.
+# Try "ticketsystem --help".
+if __name__ == '__main__' and len(sys.argv) > 1:
+    import ticketcli
+    sys.exit(ticketcli.main())
+
 import tkinter as tk
-from tkinter import ttk, scrolledtext, simpledialog, messagebox, PhotoImage
+from tkinter import ttk, scrolledtext, simpledialog, messagebox
 from tkinter.font import Font
-import json
-import os
-from datetime import datetime
-import webbrowser
 import logging
+import os
+import bisect
 
-# File to store tickets.
-# To-Do : Make this file changeable, so you can load multiple lists depending on what your doing.
-# We could even set it up to keep opening/pending/closed tickets on different lists in the future if needed. 
-TICKET_FILE = 'tickets.json'
-
-class Ticket:
-    def __init__(self, title, description, phone_number, creation_date=None, notes=None, is_open=True, status="open"):
-        self.title = title
-        self.description = description
-        self.phone_number = phone_number
-        self.notes = notes if notes is not None else []
-        self.is_open = is_open
-        self.status = status
-        self.creation_date = creation_date or datetime.now().strftime('%m-%d-%Y %H:%M:%S')
-    
-    def set_status(self, new_status):
-        self.status = new_status
-
-    def add_note(self, note):
-        note_entry = {'note': note, 'timestamp': datetime.now().strftime('%m-%d-%Y %H:%M:%S')}
-        self.notes.append(note_entry)
+from ticketcore import (STATUSES, LOG_ACTIONS, Ticket, setup_logging, log_action, load_tickets, record_change, changing,
+                        check_for_changes, ticket_to_dict, render_ticket, ticket_key, read_open_tickets, read_log_page,
+                        read_log_since, log_end, clear_log, IOWorker, WorkspaceCache, default_workspace, workspace_name,
+                        timings, timed, format_of, read_import, import_steps, export_job, parse_ticket_ids,
+                        format_ticket_ids, batch_change, report_text, caller_key)
 
-    def close(self):
-        self.is_open = False
+# How often (in milliseconds) the window looks for changes another copy of the program made to the
+# same ticket file, say one on another computer using a shared drive. Only the changed tickets get redrawn.
+CHECK_FOR_CHANGES_EVERY = 2000
 
-    def __str__(self):
-        notes_str = ''
-        for note in self.notes:
-            notes_str += 'Note ({}): {}\n        '.format(note['timestamp'], note['note'])
-        status = "Open" if self.is_open else "Closed"
-        
-        # Display the title on the first line and the rest of the information on the next lines
-        return f'[{status}] {self.creation_date}\n Name: {self.title}\n Contact: {self.phone_number}\n Description: {self.description}\n {notes_str}\n'
+# How many lines of the action log the log window reads at a time.
+LOG_PAGE_SIZE = 500
 
+# Only this many tickets get put in the display at first, more are added as you scroll down.
+# That way a view with thousands of tickets still shows up right away. 0 puts everything in at once.
+DISPLAY_PAGE_SIZE = 50
 
 # For updates and all important info related to this program.
 def open_github():
+    # webbrowser, the About picture and the file dialogs are only loaded when they're used, it makes starting up quicker.
+    import webbrowser
     webbrowser.open('https://github.com/erfwerm')  # Open the GitHub page in a web browser
     logging.info("Github page for Erfwerm opened! Woo!")
 
 
-# Function to set up the logging.
-def setup_logging():
-    logging.basicConfig(filename='Tickets.log', level=logging.INFO, 
-                        format='%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-
-
 def show_about_this():
     about_window = tk.Toplevel(root)
     about_window.title("About this program")
     about_window.geometry("700x400")  
 
-    image_path = "jayburgerssmall.png"  
-    img = PhotoImage(file=image_path)
+    # Next to the program, or inside the bundle when it's the packaged executable.
+    image_path = os.path.join(getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__))), "jayburgerssmall.png")
+    img = tk.PhotoImage(file=image_path)
     img_label = tk.Label(about_window, image=img)
     img_label.image = img  
     img_label.pack(side="top", pady=10)
@@ -79,166 +68,280 @@ def show_about_this():
     about_label.pack(side="top", padx=10, pady=10)
 
 
-###### TICKET FUNCTIONS ######
-def load_tickets():
-    if not os.path.exists(TICKET_FILE):
-        return []
-    with open(TICKET_FILE, 'r') as file:
-        tickets_data = json.load(file)
-        if not tickets_data:
-            return []
-        loaded_tickets = []
-        for data in tickets_data:
-            ticket = Ticket(
-                data['title'],
-                data['description'],
-                data['phone_number'],
-                data['creation_date'],
-                notes=data.get('notes', []),
-                is_open=data['is_open'],
-                status=data.get('status', 'open')  
-            )
-            loaded_tickets.append(ticket)
-            logging.info("Tickets Loaded successfully")
-        return loaded_tickets
-        
-
-def save_tickets(tickets):
-    logging.info("Tickets Saved successfully")
-    with open(TICKET_FILE, 'w') as file:
-        json.dump([{
-            'title': ticket.title,
-            'description': ticket.description,
-            'phone_number': ticket.phone_number,
-            'notes': ticket.notes,
-            'is_open': ticket.is_open,
-            'status': ticket.status,
-            'creation_date': ticket.creation_date
-        } for ticket in tickets], file)
+###### DISPLAY ######
+
+class ViewSection:
+    '''One part of a view: a heading, then the tickets with some statuses, newest first.
+    Search results pass a fixed list of tickets instead of statuses.
+    tickets is the store (workspace) the section's tickets come from.'''
+
+    def __init__(self, heading, empty_text='', tickets=None, statuses=None, fixed=None):
+        self.heading = heading
+        self.empty_text = empty_text
+        self.tickets = tickets
+        self.statuses = statuses
+        self.fixed = fixed
+        self.mark = None
+        self.started = False
+        self.done = False
+        self.empty_shown = False
+        # Keys of the tickets on screen, oldest first, and the oldest key handed out so far.
+        self.shown = []
+        self.cursor = None
+        self.position = 0
+
+    def holds(self, ticket):
+        return self.fixed is None and (self.statuses is None or ticket.status in self.statuses)
+
+    def fetch(self, count):
+        if self.fixed is not None:
+            batch = self.fixed[self.position:self.position + count]
+            self.position += len(batch)
+        else:
+            batch = self.tickets.page(self.statuses, self.cursor, count)
+            if batch:
+                self.cursor = ticket_key(batch[-1])
+        return batch
+
+
+class PagedView:
+    '''Fills a text widget from its sections one page at a time, adding the next page as you scroll.
+    Every ticket on screen sits between two marks, so when one ticket changes only its own
+    block of text gets replaced, or moved to the section it belongs in now.
+    A view can show more than one workspace, and IDs repeat between workspaces,
+    so each block is named after the workspace's number in this view and the ticket ID.'''
+
+    def __init__(self, display_area, sections):
+        self.display_area = display_area
+        self.sections = sections
+        self.current = 0
+        self.where = {}
+        self.stores = []
+        self.done = False
+        self.loading = False
+
+    def block(self, store, ticket_id):
+        for number, known in enumerate(self.stores):
+            if known is store:
+                break
+        else:
+            number = len(self.stores)
+            self.stores.append(store)
+        return f'ticket{number}_{ticket_id}'
+
+    @timed('render page')
+    def render_page(self):
+        display_area = self.display_area
+        start = display_area.index('end-1c')
+        parts = []
+        marks = []
+        offset = 0
+        remaining = DISPLAY_PAGE_SIZE if DISPLAY_PAGE_SIZE > 0 else float('inf')
+        while remaining > 0 and self.current < len(self.sections):
+            section = self.sections[self.current]
+            if not section.started:
+                section.started = True
+                if section.heading:
+                    heading = f'\n-------------- {section.heading} ----------------\n'
+                    parts.append(heading)
+                    offset += len(heading)
+                section.mark = f'section{self.current}'
+                marks.append((section.mark, offset))
+            wanted = remaining if remaining != float('inf') else 1000
+            batch = section.fetch(wanted)
+            if not batch and not section.shown and not section.empty_shown:
+                parts.append(section.empty_text)
+                offset += len(section.empty_text)
+                section.empty_shown = True
+            for ticket in batch:
+                text = render_ticket(ticket)
+                block = self.block(section.tickets, ticket.ticket_id)
+                marks.append((f'{block}_start', offset))
+                offset += len(text)
+                marks.append((f'{block}_end', offset))
+                parts.append(text)
+                self.where[block] = section
+            section.shown[0:0] = [ticket_key(ticket) for ticket in reversed(batch)]
+            remaining -= len(batch)
+            if len(batch) < wanted:
+                section.done = True
+                self.current += 1
+        self.done = self.current >= len(self.sections)
+        # One insert for the whole page, Tk is a lot faster with one big insert than many small ones.
+        display_area.insert(tk.END, ''.join(parts))
+        for name, mark_offset in marks:
+            display_area.mark_set(name, f'{start}+{mark_offset}c')
+            # End marks stay put when a ticket is inserted right after them, start marks move along.
+            display_area.mark_gravity(name, 'right' if name.endswith('_start') else 'left')
+        self.loading = False
+
+    def forget(self):
+        for block in self.where:
+            self.display_area.mark_unset(f'{block}_start', f'{block}_end')
+        for section in self.sections:
+            if section.mark:
+                self.display_area.mark_unset(section.mark)
+
+    def put(self, index, ticket, block):
+        text = render_ticket(ticket)
+        self.display_area.insert(index, text)
+        self.display_area.mark_set(f'{block}_start', index)
+        self.display_area.mark_gravity(f'{block}_start', 'right')
+        self.display_area.mark_set(f'{block}_end', f'{index}+{len(text)}c')
+        self.display_area.mark_gravity(f'{block}_end', 'left')
+
+    def replace(self, ticket, block):
+        index = self.display_area.index(f'{block}_start')
+        self.display_area.delete(index, f'{block}_end')
+        self.put(index, ticket, block)
+
+    def remove(self, ticket, section, block):
+        self.display_area.delete(f'{block}_start', f'{block}_end')
+        self.display_area.mark_unset(f'{block}_start', f'{block}_end')
+        del section.shown[bisect.bisect_left(section.shown, ticket_key(ticket))]
+        del self.where[block]
+        if not section.shown and section.done:
+            self.display_area.insert(section.mark, section.empty_text)
+            section.empty_shown = True
+
+    def insert(self, ticket, section):
+        key = ticket_key(ticket)
+        # Older than anything this section has shown yet, the next page will bring it in.
+        if not section.started or (not section.done and section.cursor is not None and key < section.cursor):
+            return
+        if section.empty_shown:
+            self.display_area.delete(section.mark, f'{section.mark}+{len(section.empty_text)}c')
+            section.empty_shown = False
+        newer = bisect.bisect_right(section.shown, key)
+        if newer < len(section.shown):
+            # Goes right below the oldest ticket that is still newer than this one.
+            index = self.display_area.index(f'{self.block(section.tickets, section.shown[newer][1])}_end')
+        else:
+            index = self.display_area.index(section.mark)
+        block = self.block(section.tickets, ticket.ticket_id)
+        self.put(index, ticket, block)
+        section.shown.insert(newer, key)
+        self.where[block] = section
+
+    @timed('redraw ticket')
+    def ticket_changed(self, ticket, store):
+        block = self.block(store, ticket.ticket_id)
+        section = self.where.get(block)
+        if section is not None and (section.fixed is not None or section.holds(ticket)):
+            self.replace(ticket, block)
+            return
+        if section is not None:
+            self.remove(ticket, section, block)
+        for section in self.sections:
+            if section.tickets is store and section.holds(ticket):
+                self.insert(ticket, section)
+                break
+
+
+@timed('show view')
+def show_sections(display_area, sections):
+    old_view = getattr(display_area, 'paged_view', None)
+    if old_view is not None:
+        old_view.forget()
+    display_area.delete('1.0', tk.END)
+    display_area.paged_view = PagedView(display_area, sections)
+    display_area.paged_view.render_page()
+
+
+def update_display(display_area, ticket, store):
+    '''Store listener, puts the one changed ticket on screen without redrawing the rest.'''
+    view = getattr(display_area, 'paged_view', None)
+    if view is not None:
+        view.ticket_changed(ticket, store)
+
+
+def on_display_scroll(display_area, first, last):
+    display_area.vbar.set(first, last)
+    view = getattr(display_area, 'paged_view', None)
+    # Close to the bottom, add the next page. Not right inside the scroll callback though, Tk doesn't like that.
+    if view is not None and not view.done and not view.loading and float(last) > 0.9:
+        view.loading = True
+        display_area.after_idle(view.render_page)
+
 
-    
 def display_tickets(tickets, display_area):
-    display_area.delete('1.0', tk.END)
-    display_area.insert(tk.END, f'\n-------------- OPEN TICKETS ----------------\n')
-    if not tickets or all(not ticket.is_open for ticket in tickets):
-        display_area.insert(tk.END, 'No Open Tickets found\n')
-        for index, ticket in enumerate(tickets):
-            if not ticket.is_open:
-                display_area.insert(tk.END, f'Ticket ID: {index} - {ticket}\n\n')
+    if tickets.count("open") + tickets.count("pending") == 0:
+        show_sections(display_area, [
+            ViewSection("OPEN TICKETS", 'No Open Tickets found\n', tickets, ("open", "pending")),
+            ViewSection(None, '', tickets, ("closed",))
+        ])
         return
-    for index, ticket in enumerate(tickets):
-        if ticket.is_open:
-            display_area.insert(tk.END, f'Ticket ID: {index} - {ticket}\n\n')
+    show_sections(display_area, [ViewSection("OPEN TICKETS", '', tickets, ("open", "pending"))])
 
 
 def display_closed_tickets(tickets, display_area):
-    display_area.delete('1.0', tk.END)
-    display_area.insert(tk.END, f'\n-------------- CLOSED TICKETS ----------------\n')
-    for index, ticket in enumerate(tickets):
-        if not ticket.is_open:
-            display_area.insert(tk.END, f'Ticket ID: {index} - {ticket}\n\n')
+    show_sections(display_area, [ViewSection("CLOSED TICKETS", '', tickets, ("closed",))])
 
 
 def update_ticket_title(tickets, display_area):
     ticket_id = simpledialog.askinteger("Update Title", "Enter ticket ID:", parent=root)
-    if ticket_id is None or ticket_id < 0 or ticket_id >= len(tickets):
+    # has and not get, an archived ticket only comes back once there's really a change to make to it.
+    if not tickets.has(ticket_id):
         messagebox.showwarning("Invalid Input", "Invalid ticket ID.")
         return
 
     new_title = simpledialog.askstring("Update Title", "Enter new title:", parent=root)
     if new_title:
-        tickets[ticket_id].title = new_title
-        logging.info(f"Ticket title updated {new_title}")
-        save_tickets(tickets)
-        display_open_pending_tickets(tickets, display_area)
+        with timed('edit title'), changing(tickets):
+            tickets.update(tickets.get(ticket_id), title=new_title)
+            log_action('edit', f"Ticket title updated {new_title}", ticket_id)
+            record_change(tickets, {'op': 'set', 'id': ticket_id, 'fields': {'title': new_title}})
     else:
         messagebox.showinfo("Info", "Update cancelled or invalid title.")
 
 
 def update_ticket_description(tickets, display_area):
     ticket_id = simpledialog.askinteger("Update Description", "Enter ticket ID:", parent=root)
-    if ticket_id is None or ticket_id < 0 or ticket_id >= len(tickets):
+    if not tickets.has(ticket_id):
         messagebox.showwarning("Invalid Input", "Invalid ticket ID.")
         return
 
     new_description = simpledialog.askstring("Update Description", "Enter new description:", parent=root)
     if new_description:
-        tickets[ticket_id].description = new_description
-        logging.info(f"Ticket description updated {new_description}")
-        save_tickets(tickets)
-        display_open_pending_tickets(tickets, display_area)
+        with timed('edit description'), changing(tickets):
+            tickets.update(tickets.get(ticket_id), description=new_description)
+            log_action('edit', f"Ticket description updated {new_description}", ticket_id)
+            record_change(tickets, {'op': 'set', 'id': ticket_id, 'fields': {'description': new_description}})
     else:
         messagebox.showinfo("Info", "Update cancelled or invalid description.")
 
 
 def update_ticket_phone(tickets, display_area):
     ticket_id = simpledialog.askinteger("Update Phone", "Enter ticket ID:", parent=root)
-    if ticket_id is None or ticket_id < 0 or ticket_id >= len(tickets):
+    if not tickets.has(ticket_id):
         messagebox.showwarning("Invalid Input", "Invalid ticket ID.")
         return
 
     new_phone = simpledialog.askstring("Update Phone", "Enter new phone (optional):", parent=root)
     if new_phone is not None:
-        tickets[ticket_id].phone_number = new_phone
-        logging.info(f"Ticket phone updated {new_phone}")
-        save_tickets(tickets)
-        display_open_pending_tickets(tickets, display_area)
+        with timed('edit phone'), changing(tickets):
+            tickets.update(tickets.get(ticket_id), phone_number=new_phone)
+            log_action('edit', f"Ticket phone updated {new_phone}", ticket_id)
+            record_change(tickets, {'op': 'set', 'id': ticket_id, 'fields': {'phone_number': new_phone}})
     else:
         messagebox.showinfo("Info", "Update cancelled.")
 
 
 def display_open_pending_tickets(tickets, display_area):
-    display_area.delete('1.0', tk.END)
-
-    # Sort tickets by creation date in descending order
-    sorted_tickets = sorted(tickets, key=lambda ticket: datetime.strptime(ticket.creation_date, '%m-%d-%Y %H:%M:%S'), reverse=True)
-
-    # Display Open Tickets
-    display_area.insert(tk.END, f'\n-------------- OPEN TICKETS ----------------\n')
-    open_tickets = [ticket for ticket in sorted_tickets if ticket.status == "open" and ticket.is_open]
-    if not open_tickets:
-        display_area.insert(tk.END, 'No Open Tickets found\n\n')
-    for ticket in open_tickets:
-        display_area.insert(tk.END, f'Ticket ID: {tickets.index(ticket)} - {ticket}\n\n')
-
-    # Display Pending Tickets
-    display_area.insert(tk.END, f'\n-------------- PENDING TICKETS ----------------\n')
-    pending_tickets = [ticket for ticket in sorted_tickets if ticket.status == "pending"]
-    if not pending_tickets:
-        display_area.insert(tk.END, 'No Pending Tickets found\n\n')
-    for ticket in pending_tickets:
-        display_area.insert(tk.END, f'Ticket ID: {tickets.index(ticket)} - {ticket}\n\n')
+    # The store keeps every status in its own bucket sorted by creation date,
+    # so each section only walks its own tickets, newest first.
+    show_sections(display_area, [
+        ViewSection("OPEN TICKETS", 'No Open Tickets found\n\n', tickets, ("open",)),
+        ViewSection("PENDING TICKETS", 'No Pending Tickets found\n\n', tickets, ("pending",))
+    ])
 
 
 def display_all_tickets(tickets, display_area):
-    display_area.delete('1.0', tk.END)
-
-    # Sort tickets by creation date in descending order
-    sorted_tickets = sorted(tickets, key=lambda ticket: datetime.strptime(ticket.creation_date, '%m-%d-%Y %H:%M:%S'), reverse=True)
-
-    # Display Open Tickets
-    display_area.insert(tk.END, f'\n-------------- OPEN TICKETS ----------------\n')
-    open_tickets = [ticket for ticket in sorted_tickets if ticket.status == "open" and ticket.is_open]
-    if not open_tickets:
-        display_area.insert(tk.END, 'No Open Tickets found\n\n')
-    for ticket in open_tickets:
-        display_area.insert(tk.END, f'Ticket ID: {tickets.index(ticket)} - {ticket}\n\n')
-
-    # Display Pending Tickets
-    display_area.insert(tk.END, f'\n-------------- PENDING TICKETS ----------------\n')
-    pending_tickets = [ticket for ticket in sorted_tickets if ticket.status == "pending"]
-    if not pending_tickets:
-        display_area.insert(tk.END, 'No Pending Tickets found\n\n')
-    for ticket in pending_tickets:
-        display_area.insert(tk.END, f'Ticket ID: {tickets.index(ticket)} - {ticket}\n\n')
-
-    # Display Closed Tickets
-    display_area.insert(tk.END, f'\n-------------- CLOSED TICKETS ----------------\n')
-    closed_tickets = [ticket for ticket in sorted_tickets if not ticket.is_open]
-    if not closed_tickets:
-        display_area.insert(tk.END, 'No Closed Tickets found\n\n')
-    for ticket in closed_tickets:
-        display_area.insert(tk.END, f'Ticket ID: {tickets.index(ticket)} - {ticket}\n\n')
+    show_sections(display_area, [
+        ViewSection("OPEN TICKETS", 'No Open Tickets found\n\n', tickets, ("open",)),
+        ViewSection("PENDING TICKETS", 'No Pending Tickets found\n\n', tickets, ("pending",)),
+        ViewSection("CLOSED TICKETS", 'No Closed Tickets found\n\n', tickets, ("closed",))
+    ])
 
 
 def create_ticket_form(tickets, display_area):
@@ -266,10 +369,16 @@ def create_ticket_form(tickets, display_area):
         description = description_text.get("1.0", tk.END).strip()  
         phone_number = phone_entry.get()
         if title and description:
-            tickets.append(Ticket(title, description, phone_number))
-            logging.info(f"Ticket Added {title}")
-            save_tickets(tickets)
-            display_open_pending_tickets(tickets, display_area)
+            # Someone calling back about a ticket that's still going usually wants a note on it, not a new one.
+            still_open = tickets.caller_history(phone_number, ("open", "pending"))
+            if still_open and not messagebox.askyesno("Caller Has Open Tickets", already_open_text(still_open), parent=form_window):
+                show_caller_history(tickets, display_area, phone_number)
+                return
+            # Inside changing, so a ticket another program just added can't get the same ID.
+            with timed('new ticket'), changing(tickets):
+                ticket = tickets.add(Ticket(title, description, phone_number))
+                log_action('add', f"Ticket Added {title}", ticket.ticket_id)
+                record_change(tickets, {'op': 'add', 'ticket': ticket_to_dict(ticket)})
             form_window.destroy()
         else:
             messagebox.showwarning("Invalid Input", "Title and description cannot be empty.", parent=form_window)
@@ -277,66 +386,130 @@ def create_ticket_form(tickets, display_area):
     submit_button = tk.Button(form_window, text="Submit", command=submit_ticket)
     submit_button.grid(row=3, column=1, sticky="e")
 
+def already_open_text(still_open, shown=5):
+    lines = [f"#{ticket.ticket_id} ({ticket.status}) {ticket.title}" for ticket in still_open[:shown]]
+    if len(still_open) > shown:
+        lines.append(f"...and {len(still_open) - shown} more")
+    return "This caller already has tickets open:\n\n" + "\n".join(lines) + "\n\nMake a new ticket anyway?"
+
 #def create_ticket_gui(tickets, display_area):
 #    create_ticket_form(tickets, display_area)
 
 
 def set_ticket_to_pending(tickets, display_area):
     ticket_id = simpledialog.askinteger("Set to Pending", "Enter ticket ID:", parent=root)
-    if ticket_id is not None and 0 <= ticket_id < len(tickets):
-        tickets[ticket_id].set_status("pending")
-        logging.info(f"Changed ticket to pending {ticket_id}")
-        save_tickets(tickets)
-        display_open_pending_tickets(tickets, display_area)
+    if tickets.has(ticket_id):
+        with timed('set pending'), changing(tickets):
+            tickets.set_status(tickets.get(ticket_id), "pending")
+            log_action('status', f"Changed ticket to pending {ticket_id}", ticket_id)
+            record_change(tickets, {'op': 'status', 'id': ticket_id, 'status': 'pending'})
 
 
 def reopen_ticket_from_pending(tickets, display_area):
     ticket_id = simpledialog.askinteger("Reopen Ticket", "Enter ticket ID:", parent=root)
-    if ticket_id is not None and 0 <= ticket_id < len(tickets):
-        tickets[ticket_id].set_status("open")
-        logging.info(f"Reopened ticket from pending {ticket_id}")
-        save_tickets(tickets)
-        display_open_pending_tickets(tickets, display_area)
+    if tickets.has(ticket_id):
+        with timed('reopen pending'), changing(tickets):
+            tickets.set_status(tickets.get(ticket_id), "open")
+            log_action('status', f"Reopened ticket from pending {ticket_id}", ticket_id)
+            record_change(tickets, {'op': 'status', 'id': ticket_id, 'status': 'open'})
 
 
 def add_note_to_ticket_gui(tickets, display_area):
     ticket_id = simpledialog.askinteger("Input", "Enter ticket ID:", parent=root)
     note = simpledialog.askstring("Input", "Enter note:", parent=root)
     display_area.focus_set()
-    if ticket_id is not None and note:
-        tickets[ticket_id].add_note(note)
-        logging.info(f"Ticket updated {ticket_id} {note}")
-        display_open_pending_tickets(tickets, display_area)
+    if note and tickets.has(ticket_id):
+        with timed('add note'), changing(tickets):
+            note_entry = tickets.add_note(tickets.get(ticket_id), note)
+            log_action('note', f"Ticket updated {ticket_id} {note}", ticket_id)
+            record_change(tickets, {'op': 'note', 'id': ticket_id, 'note': note_entry})
 
 
 def close_ticket_gui(tickets, display_area):
     
     ticket_id = simpledialog.askinteger("Input", "Enter ticket ID:", parent=root)
-    if ticket_id is not None:
+    if tickets.has(ticket_id):
         if messagebox.askyesno("Confirm", "Are you sure you want to close this ticket?"):
-            tickets[ticket_id].close()
-            tickets[ticket_id].set_status("closed")  
-            logging.info(f"Ticket closed {ticket_id}")
-            save_tickets(tickets)
-            display_open_pending_tickets(tickets, display_area)
+            with timed('close ticket'), changing(tickets):
+                ticket = tickets.get(ticket_id)
+                tickets.close(ticket)
+                log_action('status', f"Ticket closed {ticket_id}", ticket_id)
+                record_change(tickets, {'op': 'status', 'id': ticket_id, 'status': 'closed', 'closed_date': ticket.closed_date})
 
 
 def reopen_ticket_gui(tickets, display_area):
     ticket_id = simpledialog.askinteger("Input", "Enter ticket ID:", parent=root)
     display_area.focus_set()
-    if ticket_id is not None and 0 <= ticket_id < len(tickets):
-        ticket = tickets[ticket_id]
+    # Only looked at here. get brings it out of the archive when it's really being reopened.
+    ticket = tickets.find(ticket_id)
+    if ticket is not None:
         if not ticket.is_open:
-            ticket.is_open = True 
-            logging.info(f"Ticket opened {ticket_id}")
-            save_tickets(tickets)  
-            display_open_pending_tickets(tickets, display_area)
+            with timed('reopen ticket'), changing(tickets):
+                tickets.set_status(tickets.get(ticket_id), "open")
+                log_action('status', f"Ticket opened {ticket_id}", ticket_id)
+                record_change(tickets, {'op': 'status', 'id': ticket_id, 'status': 'open'})
         else:
             messagebox.showinfo("Info", "This ticket is already open.")
     else:
         messagebox.showinfo("Info", "Invalid ticket ID.")
 
 
+# The batch form's actions, as shown and as batch_change calls them.
+BATCH_CHOICES = {"Close": 'close', "Set to Pending": 'pending', "Reopen": 'reopen', "Add Note": 'note',
+                 "Edit Title": 'title', "Edit Description": 'description', "Edit Phone Number": 'phone_number'}
+
+def shown_search_results(tickets, display_area):
+    '''IDs of the search results on screen from this workspace, if a search is what's showing.'''
+    view = getattr(display_area, 'paged_view', None)
+    if view is None:
+        return []
+    return [ticket.ticket_id for section in view.sections if section.fixed is not None and section.tickets is tickets
+            for ticket in section.fixed]
+
+def batch_change_form(tickets, display_area):
+    form_window = tk.Toplevel(root)
+    form_window.title("Change Many Tickets")
+
+    tk.Label(form_window, text="Ticket IDs (like 10-20, 25):").grid(row=0, column=0, sticky="w")
+    ids_entry = tk.Entry(form_window, width=40)
+    ids_entry.grid(row=0, column=1, sticky="w")
+    # Starts out with the search results on screen, so a search can be followed by closing everything it found.
+    ids_entry.insert(0, format_ticket_ids(shown_search_results(tickets, display_area)))
+
+    tk.Label(form_window, text="Change:").grid(row=1, column=0, sticky="w")
+    action_box = ttk.Combobox(form_window, values=list(BATCH_CHOICES), state="readonly", width=20)
+    action_box.current(0)
+    action_box.grid(row=1, column=1, sticky="w")
+
+    tk.Label(form_window, text="Note or new text:").grid(row=2, column=0, sticky="w")
+    text_entry = tk.Entry(form_window, width=40)
+    text_entry.grid(row=2, column=1, sticky="w")
+
+    def apply_change():
+        choice = action_box.get()
+        try:
+            ticket_ids = parse_ticket_ids(ids_entry.get())
+        except ValueError as error:
+            messagebox.showwarning("Invalid Input", str(error), parent=form_window)
+            return
+        if not ticket_ids:
+            messagebox.showwarning("Invalid Input", "Enter the ticket IDs to change.", parent=form_window)
+            return
+        if not messagebox.askyesno("Confirm", f"{choice}: {len(ticket_ids)} tickets?", parent=form_window):
+            return
+        # All of them are saved as one change. Only the tickets on screen get redrawn, and Tk draws
+        # the window once after this returns, not once for every ticket.
+        try:
+            changed = batch_change(tickets, ticket_ids, BATCH_CHOICES[choice], text_entry.get().strip())
+        except ValueError as error:
+            messagebox.showwarning("Invalid Input", str(error), parent=form_window)
+            return
+        form_window.destroy()
+        show_ticket_counts(status_bar, tickets, f"{choice}: changed {len(changed)} tickets")
+
+    tk.Button(form_window, text="Apply", command=apply_change).grid(row=3, column=1, sticky="e")
+
+
 # Quick action buttons for the more common actions used in the program.
 def create_toolbar(root, tickets, display_area):
     toolbar = ttk.Frame(root)
@@ -346,11 +519,12 @@ def create_toolbar(root, tickets, display_area):
     update_button.grid(row=0, column=2, padx=2, pady=2)
     close_button = ttk.Button(toolbar, text="Close Ticket", command=lambda: close_ticket_gui(tickets, display_area))
     close_button.grid(row=0, column=4, padx=2, pady=2)
-    save_button = ttk.Button(toolbar, text="Save", command=lambda: save_tickets(tickets))
+    save_button = ttk.Button(toolbar, text="Save", command=lambda: io_worker.save(tickets))
     save_button.grid(row=0, column=6, padx=2, pady=2)
     refresh_button = ttk.Button(toolbar, text="Refresh", command=lambda: display_all_tickets(tickets, display_area))
     refresh_button.grid(row=0, column=8, padx=2, pady=2)
     toolbar.grid(row=0, column=0, sticky="ew")
+    return toolbar
 
 def create_status_bar(root):
     status_bar = ttk.Label(root, text="Ready", relief=tk.SUNKEN, anchor=tk.W)
@@ -360,6 +534,30 @@ def create_status_bar(root):
 def update_status(status_bar, message):
     status_bar.config(text=message)
 
+def poll_io_worker():
+    # Background jobs can't touch Tk themselves, so the window checks for finished ones here.
+    for message, done, result in io_worker.finished():
+        if message:
+            update_status(status_bar, message)
+        if done:
+            done(result)
+    # Checked more often while starting up, the first tickets shouldn't wait around to be shown.
+    root.after(10 if tickets is None else 100, poll_io_worker)
+
+def poll_for_changes():
+    # Every open workspace is checked, a view can show more than one. Checking is a stat or two when nothing changed,
+    # and if another program is busy writing right now it's left for the next time around.
+    for path, store in workspaces:
+        changed = check_for_changes(store)
+        if changed and store is tickets:
+            show_ticket_counts(status_bar, tickets, f"{len(changed)} tickets changed by someone else")
+    root.after(CHECK_FOR_CHANGES_EVERY, poll_for_changes)
+
+def show_ticket_counts(status_bar, tickets, message="Ready"):
+    # The store keeps the counts as tickets change, so this is free to call after every change.
+    counts = '   '.join(f'{status.capitalize()}: {tickets.count(status)}' for status in STATUSES)
+    update_status(status_bar, f'{message}   |   {counts}')
+
 ###### VIEW MODES ######
 
 def set_sepia_mode(display_area):
@@ -409,100 +607,174 @@ def search_open_tickets(tickets, display_area):
     search_term = simpledialog.askstring("Search", "Enter ticket title to search for:", parent=root)
     if search_term:
         search_term = search_term.lower()
-        logging.info(f"Searching for ticket : {search_term}")
-        matching_tickets = [ticket for ticket in tickets if ticket.is_open and search_term in ticket.title.lower()]
-        display_search_results(matching_tickets, display_area)
+        log_action('search', f"Searching for ticket : {search_term}")
+        matching_tickets = tickets.search(search_term, fields=('title',), statuses=("open", "pending"), whole_phrase=True)
+        display_search_results(tickets, matching_tickets, display_area)
 
 
 def search_open_tickets_by_description(tickets, display_area):
     search_term = simpledialog.askstring("Search", "Enter description to search for:", parent=root)
     if search_term:
         search_term = search_term.lower()
-        logging.info(f"Searching for ticket : {search_term}")
-        matching_tickets = [ticket for ticket in tickets if ticket.is_open and search_term in ticket.description.lower()]
-        display_search_results(matching_tickets, display_area)
+        log_action('search', f"Searching for ticket : {search_term}")
+        matching_tickets = tickets.search(search_term, fields=('description',), statuses=("open", "pending"), whole_phrase=True)
+        display_search_results(tickets, matching_tickets, display_area)
 
 
 def search_open_tickets_by_phone(tickets, display_area):
     search_term = simpledialog.askstring("Search", "Enter phone number to search for:", parent=root)
     if search_term:
         search_term = search_term.lower()
-        logging.info(f"Searching for ticket : {search_term}")
-        matching_tickets = [ticket for ticket in tickets if ticket.is_open and search_term in ticket.phone_number.lower()]
-        display_search_results(matching_tickets, display_area)
+        log_action('search', f"Searching for ticket : {search_term}")
+        matching_tickets = tickets.search(search_term, fields=('phone_number',), statuses=("open", "pending"), whole_phrase=True)
+        display_search_results(tickets, matching_tickets, display_area)
 
 
-def display_search_results(tickets, display_area):
-    display_area.delete('1.0', tk.END)
-    if not tickets:
-        display_area.insert(tk.END, 'No matching tickets found\n')
+def caller_history_gui(tickets, display_area):
+    phone_number = simpledialog.askstring("Caller History", "Enter the caller's phone number, written any way:", parent=root)
+    if phone_number is None:
+        return
+    if not caller_key(phone_number):
+        messagebox.showwarning("Invalid Input", "That phone number has no digits in it.")
         return
-    for index, ticket in enumerate(tickets):
-        display_area.insert(tk.END, f'Ticket ID: {index} - {ticket}\n\n')
+    log_action('search', f"Caller history for : {phone_number}")
+    show_caller_history(tickets, display_area, phone_number)
+
+
+def show_caller_history(tickets, display_area, phone_number):
+    # Every ticket the caller ever opened, closed and archived ones too, found by the digits of the number.
+    history = tickets.caller_history(phone_number)
+    still_open = [ticket for ticket in history if ticket.status != "closed"]
+    closed = [ticket for ticket in history if ticket.status == "closed"]
+    show_sections(display_area, [
+        ViewSection(f"OPEN AND PENDING FROM {phone_number.strip()}", 'Nothing open from this caller\n\n', tickets, fixed=still_open),
+        ViewSection(f"CLOSED FROM {phone_number.strip()}", 'Nothing closed from this caller\n\n', tickets, fixed=closed)
+    ])
+
+
+def search_all_tickets(tickets, display_area):
+    search_term = simpledialog.askstring("Search", "Search titles, descriptions, phone numbers and notes\nof all tickets, closed ones too:", parent=root)
+    if search_term:
+        log_action('search', f"Searching everything for : {search_term}")
+        display_search_results(tickets, tickets.search(search_term), display_area)
+
+
+def search_all_workspaces(display_area):
+    search_term = simpledialog.askstring("Search", "Search every open workspace, closed tickets too:", parent=root)
+    if search_term:
+        log_action('search', f"Searching all workspaces for : {search_term}")
+        show_sections(display_area, [
+            ViewSection(f"{workspace_name(path).upper()}", 'No matching tickets found\n\n', store, fixed=store.search(search_term))
+            for path, store in workspaces
+        ])
+
+
+def display_all_workspaces(display_area):
+    show_sections(display_area, [
+        ViewSection(f"{workspace_name(path).upper()} - OPEN TICKETS", 'No Open Tickets found\n\n', store, ("open", "pending"))
+        for path, store in workspaces
+    ])
+
+
+def display_search_results(tickets, matching_tickets, display_area):
+    show_sections(display_area, [ViewSection(None, 'No matching tickets found\n', tickets, fixed=list(matching_tickets))])
 
 ###### MENU ######
 
+def lazy_menu(menu_bar, label, fill):
+    '''A menu that gets its items the first time it's opened, so starting up doesn't build menus nobody opens.'''
+    menu = tk.Menu(menu_bar, tearoff=0)
+    def fill_once():
+        if menu.index(tk.END) is None:
+            fill(menu)
+    menu.config(postcommand=fill_once)
+    menu_bar.add_cascade(label=label, menu=menu)
+
 def create_menu(root, tickets, display_area):
     menu_bar = tk.Menu(root)
     root.config(menu=menu_bar)
 
-    ticket_menu = tk.Menu(menu_bar, tearoff=0)
-
-
-    set_menu = tk.Menu(menu_bar, tearoff=0)
-    menu_bar.add_cascade(label="Set", menu=set_menu)
-    set_menu.add_command(label="Update Ticket", command=lambda: add_note_to_ticket_gui(tickets, display_area))
-    set_menu.add_command(label="Close Ticket", command=lambda: close_ticket_gui(tickets, display_area))
-    set_menu.add_command(label="Reopen Ticket", command=lambda: reopen_ticket_gui(tickets, display_area))
-    set_menu.add_separator()
-    set_menu.add_command(label="Set Ticket to Pending", command=lambda: set_ticket_to_pending(tickets, display_area))
-    set_menu.add_command(label="Reopen Pending Ticket", command=lambda: reopen_ticket_from_pending(tickets, display_area))
-    set_menu.add_separator()
-    set_menu.add_command(label="Edit Title", command=lambda: update_ticket_title(tickets, display_area))
-    set_menu.add_command(label="Edit Description", command=lambda: update_ticket_description(tickets, display_area))
-    set_menu.add_command(label="Edit Phone Number", command=lambda: update_ticket_phone(tickets, display_area))
-
-    search_menu = tk.Menu(menu_bar, tearoff=0)
-    menu_bar.add_cascade(label="Search", menu=search_menu)
-    search_menu.add_command(label="Search by title", command=lambda: search_open_tickets(tickets, display_area))
-    search_menu.add_command(label="Search by phone", command=lambda: search_open_tickets_by_phone(tickets, display_area))
-    search_menu.add_command(label="Search by description", command=lambda: search_open_tickets_by_description(tickets, display_area))
-
-    menu_bar.add_cascade(label="Show", menu=ticket_menu)
-    ticket_menu.add_command(label="Show Open Tickets", command=lambda: display_tickets(tickets, display_area))
-    ticket_menu.add_command(label="Show Closed Tickets", command=lambda: display_closed_tickets(tickets, display_area))
-    ticket_menu.add_command(label="Show Open+Pending", command=lambda: display_open_pending_tickets(tickets, display_area))
-    ticket_menu.add_command(label="Show ALL Tickets", command=lambda: display_all_tickets(tickets, display_area))
-  
-    mode_menu = tk.Menu(menu_bar, tearoff=0)
-    menu_bar.add_cascade(label="Mode", menu=mode_menu)
-    mode_menu.add_command(label="Dark Mode", command=lambda: set_dark_mode(display_area))
-    mode_menu.add_command(label="Light Mode", command=lambda: set_light_mode(display_area))
-    mode_menu.add_command(label="Sepia Mode", command=lambda: set_sepia_mode(display_area))
-    mode_menu.add_command(label="Pastel Mode", command=lambda: set_pastel_mode(display_area))
-    mode_menu.add_command(label="Neon Mode", command=lambda: set_neon_mode(display_area))
-    mode_menu.add_command(label="Solarized Mode", command=lambda: set_solarized_mode(display_area))
-    mode_menu.add_command(label="High Contrast Mode", command=lambda: set_high_contrast_mode(display_area))
-
-    settings_menu = tk.Menu(menu_bar, tearoff=0)
-    menu_bar.add_cascade(label="Settings", menu=settings_menu)
-    settings_menu.add_command(label="Toggle Bold Font", command=lambda: toggle_bold_font(display_area))
-    settings_menu.add_command(label="Increase Font Size", command=lambda: increase_font_size(display_area))
-    settings_menu.add_command(label="Decrease Font Size", command=lambda: decrease_font_size(display_area))
-    settings_menu.add_command(label="Align Text Left", command=lambda: align_text_left(display_area))
-    settings_menu.add_command(label="Align Text Center", command=lambda: align_text_center(display_area))
-    settings_menu.add_command(label="Align Text Right", command=lambda: align_text_right(display_area))
-    settings_menu.add_separator()
-    settings_menu.add_command(label="Text Color", command=lambda: change_text_color(display_area, color= simpledialog.askstring("Input", "Font color : ", parent=root)))
-    settings_menu.add_separator()
-    settings_menu.add_command(label="Reset to Default", command=lambda: reset_default_settings(display_area))
-
-    help_menu = tk.Menu(menu_bar, tearoff=0)
-    menu_bar.add_cascade(label="Help", menu=help_menu)
-    help_menu.add_command(label="GitHub Page", command=open_github)
-    help_menu.add_command(label="About This Program", command=show_about_this)
+    file_menu = tk.Menu(menu_bar, tearoff=0)
+    menu_bar.add_cascade(label="File", menu=file_menu)
+    file_menu.add_command(label="New Workspace...", command=new_workspace)
+    file_menu.add_command(label="Open Workspace...", command=open_workspace)
+    file_menu.add_separator()
+    # The open workspaces, the one in use is marked. The menu is made again on every switch.
+    for path, store in workspaces:
+        label = f"{'* ' if store is tickets else ''}{workspace_name(path)}"
+        file_menu.add_command(label=label, command=lambda path=path: switch_workspace(path))
+    file_menu.add_separator()
+    file_menu.add_command(label="Show All Workspaces", command=lambda: display_all_workspaces(display_area))
+    file_menu.add_command(label="Search All Workspaces", command=lambda: search_all_workspaces(display_area))
+    file_menu.add_separator()
+    file_menu.add_command(label="Import Tickets...", command=import_tickets_gui)
+    file_menu.add_command(label="Export Tickets...", command=export_tickets_gui)
+
+    # The rest only get their items the first time they're opened.
+    def fill_set_menu(set_menu):
+        set_menu.add_command(label="Update Ticket", command=lambda: add_note_to_ticket_gui(tickets, display_area))
+        set_menu.add_command(label="Close Ticket", command=lambda: close_ticket_gui(tickets, display_area))
+        set_menu.add_command(label="Reopen Ticket", command=lambda: reopen_ticket_gui(tickets, display_area))
+        set_menu.add_separator()
+        set_menu.add_command(label="Set Ticket to Pending", command=lambda: set_ticket_to_pending(tickets, display_area))
+        set_menu.add_command(label="Reopen Pending Ticket", command=lambda: reopen_ticket_from_pending(tickets, display_area))
+        set_menu.add_separator()
+        set_menu.add_command(label="Edit Title", command=lambda: update_ticket_title(tickets, display_area))
+        set_menu.add_command(label="Edit Description", command=lambda: update_ticket_description(tickets, display_area))
+        set_menu.add_command(label="Edit Phone Number", command=lambda: update_ticket_phone(tickets, display_area))
+        set_menu.add_separator()
+        set_menu.add_command(label="Change Many Tickets...", command=lambda: batch_change_form(tickets, display_area))
+    lazy_menu(menu_bar, "Set", fill_set_menu)
+
+    def fill_search_menu(search_menu):
+        search_menu.add_command(label="Search by title", command=lambda: search_open_tickets(tickets, display_area))
+        search_menu.add_command(label="Search by phone", command=lambda: search_open_tickets_by_phone(tickets, display_area))
+        search_menu.add_command(label="Caller History", command=lambda: caller_history_gui(tickets, display_area))
+        search_menu.add_command(label="Search by description", command=lambda: search_open_tickets_by_description(tickets, display_area))
+        search_menu.add_separator()
+        search_menu.add_command(label="Search everything", command=lambda: search_all_tickets(tickets, display_area))
+    lazy_menu(menu_bar, "Search", fill_search_menu)
+
+    def fill_show_menu(ticket_menu):
+        ticket_menu.add_command(label="Show Open Tickets", command=lambda: display_tickets(tickets, display_area))
+        ticket_menu.add_command(label="Show Closed Tickets", command=lambda: display_closed_tickets(tickets, display_area))
+        ticket_menu.add_command(label="Show Open+Pending", command=lambda: display_open_pending_tickets(tickets, display_area))
+        ticket_menu.add_command(label="Show ALL Tickets", command=lambda: display_all_tickets(tickets, display_area))
+    lazy_menu(menu_bar, "Show", fill_show_menu)
+
+    def fill_mode_menu(mode_menu):
+        mode_menu.add_command(label="Dark Mode", command=lambda: set_dark_mode(display_area))
+        mode_menu.add_command(label="Light Mode", command=lambda: set_light_mode(display_area))
+        mode_menu.add_command(label="Sepia Mode", command=lambda: set_sepia_mode(display_area))
+        mode_menu.add_command(label="Pastel Mode", command=lambda: set_pastel_mode(display_area))
+        mode_menu.add_command(label="Neon Mode", command=lambda: set_neon_mode(display_area))
+        mode_menu.add_command(label="Solarized Mode", command=lambda: set_solarized_mode(display_area))
+        mode_menu.add_command(label="High Contrast Mode", command=lambda: set_high_contrast_mode(display_area))
+    lazy_menu(menu_bar, "Mode", fill_mode_menu)
+
+    def fill_settings_menu(settings_menu):
+        settings_menu.add_command(label="Toggle Bold Font", command=lambda: toggle_bold_font(display_area))
+        settings_menu.add_command(label="Increase Font Size", command=lambda: increase_font_size(display_area))
+        settings_menu.add_command(label="Decrease Font Size", command=lambda: decrease_font_size(display_area))
+        settings_menu.add_command(label="Align Text Left", command=lambda: align_text_left(display_area))
+        settings_menu.add_command(label="Align Text Center", command=lambda: align_text_center(display_area))
+        settings_menu.add_command(label="Align Text Right", command=lambda: align_text_right(display_area))
+        settings_menu.add_separator()
+        settings_menu.add_command(label="Text Color", command=lambda: change_text_color(display_area, color= simpledialog.askstring("Input", "Font color : ", parent=root)))
+        settings_menu.add_separator()
+        settings_menu.add_command(label="Reset to Default", command=lambda: reset_default_settings(display_area))
+        settings_menu.add_separator()
+        settings_menu.add_command(label="Start API Server", command=start_api_server)
+    lazy_menu(menu_bar, "Settings", fill_settings_menu)
+
+    def fill_help_menu(help_menu):
+        help_menu.add_command(label="GitHub Page", command=open_github)
+        help_menu.add_command(label="About This Program", command=show_about_this)
+    lazy_menu(menu_bar, "Help", fill_help_menu)
 
     menu_bar.add_command(label="View Log", command=view_log)
+    menu_bar.add_command(label="Performance", command=view_performance)
+    menu_bar.add_command(label="Reports", command=view_reports)
 
 
 ###### FONT SETTINGS ######
@@ -568,23 +840,147 @@ def center_window(root, width=800, height=600):
 #### Log Functions ####
 
 def view_log():
+    # Only the newest page of the log is read at first, older pages as you ask for them, read backwards from
+    # where the last page stopped. New lines show up at the bottom as they're written.
     log_window = tk.Toplevel(root)
     log_window.title("Action Log")
-    log_window.geometry("600x400")
+    log_window.geometry("700x450")
+
+    controls = tk.Frame(log_window)
+    controls.pack(fill=tk.X)
+    tk.Label(controls, text="Ticket ID:").pack(side=tk.LEFT)
+    ticket_entry = tk.Entry(controls, width=8)
+    ticket_entry.pack(side=tk.LEFT)
+    tk.Label(controls, text="Action:").pack(side=tk.LEFT)
+    action_choice = ttk.Combobox(controls, values=('',) + LOG_ACTIONS, width=10, state="readonly")
+    action_choice.pack(side=tk.LEFT)
 
     text_area = scrolledtext.ScrolledText(log_window, wrap=tk.WORD)
     text_area.pack(expand=True, fill=tk.BOTH)
 
-    def clear_log():
-        open('Tickets.log', 'w').close()
+    # cursor is where the next older page starts, tail_from where new lines get read from.
+    # view goes up by one every time the filter changes, so a page read for the old filter is thrown away.
+    state = {'cursor': None, 'tail_from': 0, 'ticket_id': None, 'action': None, 'view': 0}
+
+    def show_older(view, page):
+        lines, cursor = page
+        if view != state['view'] or not text_area.winfo_exists():
+            return
+        state['cursor'] = cursor
+        first_page = text_area.index('end-1c') == '1.0'
+        if lines:
+            text_area.insert('1.0', '\n'.join(lines) + '\n')
+        if first_page:
+            text_area.see(tk.END)
+        older_button.config(state=tk.NORMAL if cursor else tk.DISABLED)
+
+    def load_older():
+        cursor, view = state['cursor'], state['view']
+        ticket_id, action = state['ticket_id'], state['action']
+        io_worker.submit(lambda: read_log_page(cursor, LOG_PAGE_SIZE, ticket_id, action),
+                         done=lambda page: show_older(view, page), busy="Reading the log", finished="Log loaded")
+
+    def apply_filter(event=None):
+        ticket_text = ticket_entry.get().strip()
+        if ticket_text and not ticket_text.isdigit():
+            messagebox.showwarning("Invalid Input", "Invalid ticket ID.", parent=log_window)
+            return
+        state['ticket_id'] = int(ticket_text) if ticket_text else None
+        state['action'] = action_choice.get() or None
+        state['view'] += 1
+        state['cursor'], state['tail_from'] = log_end()
         text_area.delete('1.0', tk.END)
+        load_older()
+
+    def tail():
+        if not text_area.winfo_exists():
+            return
+        lines, state['tail_from'] = read_log_since(state['tail_from'], state['ticket_id'], state['action'])
+        if lines:
+            at_bottom = text_area.yview()[1] >= 0.999
+            text_area.insert(tk.END, '\n'.join(lines) + '\n')
+            if at_bottom:
+                text_area.see(tk.END)
+        log_window.after(1000, tail)
+
+    def clear_log_gui():
+        if messagebox.askyesno("Confirm", "Delete the whole action log, old pages too?", parent=log_window):
+            clear_log()
+            apply_filter()
+
+    tk.Button(controls, text="Filter", command=apply_filter).pack(side=tk.LEFT)
+    older_button = tk.Button(controls, text="Load Older", command=load_older, state=tk.DISABLED)
+    older_button.pack(side=tk.LEFT)
+    tk.Button(controls, text="Clear Log", command=clear_log_gui).pack(side=tk.RIGHT)
+    ticket_entry.bind('<Return>', apply_filter)
+    action_choice.bind('<<ComboboxSelected>>', apply_filter)
+
+    apply_filter()
+    tail()
+
+def view_performance():
+    perf_window = tk.Toplevel(root)
+    perf_window.title("Performance")
+    perf_window.geometry("700x500")
+
+    controls = tk.Frame(perf_window)
+    controls.pack(fill=tk.X)
+    timing_on = tk.BooleanVar(value=timings.enabled)
+    def toggle_timing():
+        timings.enabled = timing_on.get()
+    tk.Checkbutton(controls, text="Timing on", variable=timing_on, command=toggle_timing).pack(side=tk.LEFT)
+    def profile_next():
+        timings.profile_next()
+        update_status(status_bar, "The next thing you do will be profiled")
+    tk.Button(controls, text="Profile Next Action", command=profile_next).pack(side=tk.LEFT)
+    tk.Button(controls, text="Reset", command=timings.reset).pack(side=tk.LEFT)
+
+    text_area = scrolledtext.ScrolledText(perf_window, wrap=tk.NONE, font=("Courier", 10))
+    text_area.pack(expand=True, fill=tk.BOTH)
 
-    with open('Tickets.log', 'r') as file:
-        log_content = file.read()
-        text_area.insert(tk.END, log_content)
+    def refresh():
+        # Redrawn every second while the window is open.
+        if not text_area.winfo_exists():
+            return
+        lines = [f'{"Operation":<20}{"Count":>8}{"p50 ms":>10}{"p95 ms":>10}{"Max ms":>10}{"Total s":>10}']
+        for name, count, p50, p95, longest, total in timings.summary():
+            lines.append(f'{name:<20}{count:>8}{p50 * 1000:>10.2f}{p95 * 1000:>10.2f}{longest * 1000:>10.2f}{total:>10.2f}')
+        if timings.last_profile is not None:
+            name, report = timings.last_profile
+            lines.append(f'\n\nProfile of the last "{name}":\n{report}')
+        top = text_area.yview()[0]
+        text_area.delete('1.0', tk.END)
+        text_area.insert(tk.END, '\n'.join(lines))
+        text_area.yview_moveto(top)
+        perf_window.after(1000, refresh)
+    refresh()
+
+def view_reports():
+    report_window = tk.Toplevel(root)
+    report_window.title("Reports")
+    report_window.geometry("600x600")
+
+    controls = tk.Frame(report_window)
+    controls.pack(fill=tk.X)
+    tk.Label(controls, text="Days:").pack(side=tk.LEFT)
+    days = tk.IntVar(value=14)
+    for count in (7, 14, 30, 90):
+        tk.Radiobutton(controls, text=str(count), variable=days, value=count, command=lambda: refresh(False)).pack(side=tk.LEFT)
+
+    text_area = scrolledtext.ScrolledText(report_window, wrap=tk.NONE, font=("Courier", 10))
+    text_area.pack(expand=True, fill=tk.BOTH)
 
-    clear_button = tk.Button(log_window, text="Clear Log", command=clear_log)
-    clear_button.pack()
+    def refresh(again=True):
+        # The totals are kept up to date as tickets change, so redrawing every few seconds costs next to nothing.
+        if not text_area.winfo_exists():
+            return
+        top = text_area.yview()[0]
+        text_area.delete('1.0', tk.END)
+        text_area.insert(tk.END, report_text(tickets, days.get()))
+        text_area.yview_moveto(top)
+        if again:
+            report_window.after(5000, refresh)
+    refresh()
 
 ###### Main Program ######
 
@@ -615,23 +1011,246 @@ bottom_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
 # Create a scrolled text widget for the main display area
 main_display = scrolledtext.ScrolledText(bottom_frame, wrap=tk.WORD, font=body_font)
 main_display.pack(expand=True, fill=tk.BOTH)
+main_display.config(yscrollcommand=lambda first, last: on_display_scroll(main_display, first, last))
 
-# Load tickets
-tickets = load_tickets()
-
-# Create the toolbar and status bar
-create_toolbar(root, tickets, main_display)
-create_menu(root, tickets, main_display)
 status_bar = create_status_bar(root)
+update_status(status_bar, "Loading tickets...")
+
+# Tickets load in the background. The window is up right away and fills in when they're ready.
+# tickets is the store of the workspace in use, every open one is kept in workspaces.
+tickets = None
+toolbar = None
+workspaces = WorkspaceCache()
+io_worker = IOWorker()
+# The local HTTP API (see ticketserver.py), once it's started from the Settings menu.
+api_server = None
+api_writer = None
+# (store, steps) for the import being added a step at a time, see finish_import.
+running_import = None
+
+def show_workspace(path, store, message):
+    '''Makes an open workspace the one the toolbar, menus and views work on.'''
+    global tickets, toolbar
+    tickets = store
+    if api_writer is not None:
+        api_writer.use_store(tickets)
+    if toolbar is not None:
+        toolbar.destroy()
+    toolbar = create_toolbar(root, tickets, main_display)
+    create_menu(root, tickets, main_display)
+    root.title(f"Ticket System - {workspace_name(path)}")
+
+    # Display all tickets and update status
+    display_open_pending_tickets(tickets, main_display)
+    show_ticket_counts(status_bar, tickets, message)
+
+def startup_step(name):
+    # How long after starting the program it got this far. It shows up in the Performance window,
+    # and benchmarks/startup.py reads it from the screen.
+    seconds = time.perf_counter() - STARTED
+    timings.add(name, seconds)
+    if os.environ.get('TICKETSYSTEM_STARTUP_CHECK'):
+        print(f'{name}: {seconds:.4f}', flush=True)
+
+def show_first_tickets(open_tickets):
+    # Only if the whole workspace didn't beat it here.
+    if tickets is not None:
+        return
+    show_sections(main_display, [ViewSection("OPEN TICKETS", 'No Open Tickets found\n\n', fixed=open_tickets)])
+    update_status(status_bar, "Loading closed tickets...")
+    root.update_idletasks()
+    startup_step('startup: first tickets')
+
+def start_up():
+    path = default_workspace()
+    # The open and pending tickets are at the top of the ticket file, so they go on screen
+    # before the closed ones have been read. The menus and buttons come with the whole workspace.
+    io_worker.submit(lambda: read_open_tickets(path), done=show_first_tickets, busy=f"Loading {workspace_name(path)}")
+    switch_workspace(path)
+
+def on_tickets_loaded(path, loaded_tickets, new=False):
+    # Every open store keeps its listeners, so a view showing more than one workspace stays up to date.
+    # Only the workspace in use shows its counts.
+    first_workspace = tickets is None
+    def show_counts(ticket):
+        if tickets is loaded_tickets:
+            show_ticket_counts(status_bar, tickets)
+    loaded_tickets.listeners.append(show_counts)
+    loaded_tickets.listeners.append(lambda ticket: update_display(main_display, ticket, loaded_tickets))
+    workspaces.add(path, loaded_tickets, stores_in_use())
+    if new:
+        # So the file is there to open next time, even if nothing gets added.
+        io_worker.save(loaded_tickets)
+    show_workspace(path, loaded_tickets, f"Loaded {workspace_name(path)} successfully")
+    if first_workspace:
+        root.update_idletasks()
+        startup_step('startup: all tickets')
+        if os.environ.get('TICKETSYSTEM_STARTUP_CHECK'):
+            root.after_idle(root.destroy)
+
+    # The tickets are up, now the search index can take its time.
+    work, done = loaded_tickets.search_index_job()
+    def index_ready(index):
+        done(index)
+        if tickets is loaded_tickets:
+            show_ticket_counts(status_bar, tickets)
+    io_worker.submit(work, done=index_ready, busy="Indexing tickets for search")
+    # Then the callers, so the first new ticket doesn't wait for it.
+    contacts_work, contacts_done = loaded_tickets.contacts_job()
+    io_worker.submit(contacts_work, done=contacts_done, busy="Indexing callers")
+
+def stores_in_use():
+    # Never closed to make room for another workspace: the one in use, the ones on screen,
+    # the one the API serves and the one an import is going into.
+    in_use = [tickets]
+    view = getattr(main_display, 'paged_view', None)
+    if view is not None:
+        in_use.extend(view.stores)
+        in_use.extend(section.tickets for section in view.sections)
+    if api_writer is not None:
+        in_use.append(api_writer.tickets)
+    if running_import is not None:
+        in_use.append(running_import[0])
+    return [store for store in in_use if store is not None]
+
+def switch_workspace(path, new=False):
+    # A workspace that is still open comes back right away, others are loaded first.
+    store = workspaces.get(path)
+    if store is not None:
+        show_workspace(path, store, f"Switched to {workspace_name(path)}")
+        return
+    # The search index is left out so the first tickets show up as soon as they're read.
+    io_worker.submit(lambda: load_tickets(search_index=False, path=path),
+                     done=lambda loaded_tickets: on_tickets_loaded(path, loaded_tickets, new),
+                     busy=f"Loading {workspace_name(path)}")
+
+WORKSPACE_FILE_TYPES = [("Ticket files", "*.json"), ("SQLite ticket files", "*.db")]
+
+def new_workspace():
+    from tkinter import filedialog
+    path = filedialog.asksaveasfilename(parent=root, title="New Workspace", defaultextension=".json",
+                                        filetypes=WORKSPACE_FILE_TYPES)
+    if path:
+        log_action('workspace', f"New workspace {path}")
+        switch_workspace(path, new=True)
+
+def open_workspace():
+    from tkinter import filedialog
+    path = filedialog.askopenfilename(parent=root, title="Open Workspace", filetypes=WORKSPACE_FILE_TYPES)
+    if path:
+        log_action('workspace', f"Opened workspace {path}")
+        switch_workspace(path)
+
+IMPORT_FILE_TYPES = [("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl")]
+EXPORT_FILE_TYPES = [("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl"), ("JSON files", "*.json")]
+
+def import_tickets_gui():
+    from tkinter import filedialog
+    path = filedialog.askopenfilename(parent=root, title="Import Tickets", filetypes=IMPORT_FILE_TYPES)
+    if not path:
+        return
+    store = tickets
+    # The file is read and checked in the background, only adding the tickets happens here.
+    io_worker.submit(lambda: read_import(path), done=lambda result: finish_import(store, path, *result),
+                     busy=f"Reading {os.path.basename(path)}")
+
+def finish_import(store, path, new_tickets, problems):
+    global running_import
+    if problems:
+        messagebox.showerror("Import", f"Nothing was imported, {os.path.basename(path)} has problems:\n\n" + '\n'.join(problems))
+        return
+    # The view is put away while the tickets go in and drawn once afterwards, not once for every ticket.
+    view = getattr(main_display, 'paged_view', None)
+    if view is not None:
+        view.forget()
+        main_display.paged_view = None
+    # The tickets go in a step at a time so the window keeps drawing. The import is one change, so this
+    # window takes the mouse and keys and nothing else changes the tickets until it's done.
+    progress_window = tk.Toplevel(root)
+    progress_window.title("Import")
+    progress_window.transient(root)
+    progress_label = ttk.Label(progress_window, text=f"Importing {len(new_tickets)} tickets...")
+    progress_label.pack(padx=20, pady=20)
+    progress_window.protocol("WM_DELETE_WINDOW", lambda: None)
+    progress_window.grab_set()
+    running_import = (store, import_steps(store, new_tickets))
+
+    def finished():
+        global running_import
+        running_import = None
+        progress_window.grab_release()
+        progress_window.destroy()
+        display_open_pending_tickets(tickets, main_display)
+
+    def step():
+        try:
+            added = next(running_import[1], None)
+        except BaseException:
+            finished()
+            raise
+        if added is None:
+            finished()
+            show_ticket_counts(status_bar, tickets, f"Imported {len(new_tickets)} tickets from {os.path.basename(path)}")
+            return
+        progress_label.config(text=f"Imported {len(added)} of {len(new_tickets)} tickets...")
+        root.after(1, step)
+    root.after(1, step)
+
+def export_tickets_gui():
+    from tkinter import filedialog
+    path = filedialog.asksaveasfilename(parent=root, title="Export Tickets", defaultextension=".csv",
+                                        filetypes=EXPORT_FILE_TYPES)
+    if not path:
+        return
+    name = os.path.basename(path)
+    # The tickets are copied here and the file is written from the copy in the background, they can go on changing.
+    write = export_job(tickets, path, format_of(path))
+    io_worker.submit(write, done=lambda count: show_ticket_counts(status_bar, tickets, f"Exported {count} tickets to {name}"),
+                     busy=f"Exporting to {name}")
+
+def start_api_server():
+    global api_server, api_writer
+    if api_server is not None:
+        messagebox.showinfo("API Server", f"Already running on http://127.0.0.1:{api_server.server_port}")
+        return
+    if tickets is None:
+        messagebox.showinfo("API Server", "The tickets are still loading, try again in a moment.")
+        return
+    from ticketserver import StoreWriter, start_server
+    writer = StoreWriter(tickets)
+    try:
+        api_server = start_server(writer)
+    except OSError as error:
+        tickets.listeners.remove(writer.ticket_changed)
+        messagebox.showerror("API Server", f"Couldn't start the API server: {error}")
+        return
+    api_writer = writer
+    update_status(status_bar, f"API server running on http://127.0.0.1:{api_server.server_port}")
+    poll_api_writer()
+
+def poll_api_writer():
+    # Changes from the API run here on the window's thread, the same as changes made in the window.
+    # They wait while an import is going in, it's one change and they'd land in the middle of it.
+    if running_import is None:
+        api_writer.run_pending()
+    root.after(20, poll_api_writer)
 
-# Display all tickets and update status
-display_open_pending_tickets(tickets, main_display)
-update_status(status_bar, "Loaded tickets successfully")
+start_up()
+poll_io_worker()
+poll_for_changes()
 
 # Center the window and start loop
 center_window(root, 800, 600)
 root.mainloop()
 
-# Save tickets on close
-save_tickets(tickets)
+# Save every open workspace on close. One that never loaded isn't in workspaces, so its file is left alone.
+if api_server is not None:
+    api_server.shutdown()
+    api_server.server_close()
+io_worker.stop()
+# An import still going in when the window closed is finished first, none of it is recorded until the end.
+if running_import is not None:
+    for added in running_import[1]:
+        pass
+workspaces.close_all(compact=True)
 
@@ -1,37 +1,80 @@
 # -*- mode: python ; coding: utf-8 -*-
+#
+# pyinstaller TicketSystem.spec                 builds dist/ticketsystem/ (a folder), the quick one to start
+# set TICKETSYSTEM_ONEFILE=1 first               builds the old single dist/ticketsystem.exe
+#
+# A single-file build unpacks itself into a temp folder every time it starts, and UPX makes it
+# decompress everything on top of that, before the window can show up. The folder build starts
+# straight from where it is. benchmarks/startup.py can time either one.
+
+import os
+
+ONEFILE = os.environ.get('TICKETSYSTEM_ONEFILE') == '1'
 
 
 a = Analysis(
     ['ticketsystem.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    # The picture on the About window.
+    datas=[('jayburgerssmall.png', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Nothing in the program uses these, leaving them out makes less to read at startup.
+    excludes=['unittest', 'doctest', 'pydoc', 'lib2to3', 'tkinter.test'],
     noarchive=False,
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='ticketsystem',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=True,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+if ONEFILE:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='ticketsystem',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='ticketsystem',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        # Nothing to decompress at startup.
+        upx=False,
+        # Still a console program, the command line version prints to it.
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='ticketsystem',
+    )
@@ -0,0 +1,104 @@
+# How many requests a second the HTTP API answers.
+# Fills a throwaway workspace with made-up tickets, starts the API on it and hits it from a few client threads
+# with a mix of lists, single tickets, searches and changes. Searches are few, they cost far more than the rest.
+#
+#   python benchmarks/api_load.py
+#   python benchmarks/api_load.py --tickets 50000 --clients 16 --seconds 10 --writes 0.2
+#   python benchmarks/api_load.py --sqlite
+
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ticketcore import load_tickets, finish_saving, ticket_from_dict, record_change, ticket_to_dict
+from ticketserver import StoreWriter, start_server
+from generate import made_up_tickets, WORDS
+
+
+def fill(tickets, count):
+    for ticket_data in made_up_tickets(count, 1):
+        del ticket_data['id']
+        ticket = tickets.add(ticket_from_dict(ticket_data))
+        record_change(tickets, {'op': 'add', 'ticket': ticket_to_dict(ticket)})
+
+
+def client(port, stop, writes, results, seed):
+    rng = random.Random(seed)
+    done = 0
+    errors = 0
+    while not stop.is_set():
+        pick = rng.random()
+        body = None
+        if pick < writes:
+            method, path = 'POST', '/tickets'
+            body = json.dumps({'title': rng.choice(WORDS), 'description': ' '.join(rng.sample(WORDS, 4)),
+                               'phone_number': '555-1234'})
+        elif pick < writes + 0.02:
+            method, path = 'GET', f'/search?q={rng.choice(WORDS)}&limit=20'
+        elif pick < writes + 0.5:
+            method, path = 'GET', f'/tickets/{rng.randrange(1000)}'
+        else:
+            method, path = 'GET', '/tickets?status=open,pending&limit=20'
+        # The server answers HTTP/1.0, a connection per request like curl or a script would use.
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        connection.request(method, path, body, {'Content-Type': 'application/json'} if body else {})
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        if response.status >= 400 and response.status != 404:
+            errors += 1
+        done += 1
+    results.append((done, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Requests per second through the HTTP API.')
+    parser.add_argument('--tickets', type=int, default=10000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--writes', type=float, default=0.1, help='share of requests that create a ticket')
+    parser.add_argument('--sqlite', action='store_true', help='use an SQLite workspace instead of a JSON file')
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'tickets.db' if args.sqlite else 'tickets.json')
+    tickets = load_tickets(search_index=True, path=path)
+    fill(tickets, args.tickets)
+
+    writer = StoreWriter(tickets)
+    server = start_server(writer, port=0)
+    stop = threading.Event()
+    writer_thread = threading.Thread(target=writer.run_forever, args=(stop,))
+    writer_thread.start()
+
+    results = []
+    clients = [threading.Thread(target=client, args=(server.server_port, stop, args.writes, results, seed))
+               for seed in range(args.clients)]
+    for thread in clients:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in clients:
+        thread.join()
+    writer_thread.join()
+    server.shutdown()
+    server.server_close()
+    finish_saving(tickets)
+
+    done = sum(count for count, errors in results)
+    errors = sum(errors for count, errors in results)
+    print(f'{done / args.seconds:.0f} requests a second from {args.clients} clients ({errors} errors), '
+          f'{args.tickets} tickets, {args.writes:.0%} writes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# Made-up ticket files for the benchmarks, or for trying the program out on a big history.
+# The tickets look like a real help desk's: dates go up with the ID, nearly everything older than a month
+# is closed, callers phone in more than once and some tickets collect a lot more notes than others.
+#
+#   python benchmarks/generate.py tickets.json --tickets 100000
+#   python benchmarks/generate.py big.json --tickets 1000000 --notes 2 --spread geometric
+
+
+import argparse
+import datetime
+import itertools
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ticketcore import DATE_FORMAT, atomic_write, write_snapshot_lines
+
+
+WORDS = 'printer jam network outage email password reset vpn monitor keyboard laptop wifi screen login'.split()
+PROBLEMS = ['{} not working', '{} keeps dropping', 'Cannot get into {}', '{} is slow', 'New {} needed', '{} broken after update']
+NOTES = ['Called back, no answer', 'Left a voicemail', 'Walked them through a restart', 'Waiting on the vendor',
+         'Replaced the {}', 'Escalated to networking', 'Customer says the {} works now', 'Remote session, fixed the {}']
+
+# How many notes a ticket gets: 'fixed' gives every ticket --notes, 'geometric' averages --notes with
+# most tickets getting a few and a handful getting dozens, 'none' gives none at all.
+SPREADS = ['fixed', 'geometric', 'none']
+
+
+def note_count(rng, notes, spread):
+    if spread == 'none' or notes <= 0:
+        return 0
+    if spread == 'fixed':
+        return notes
+    # Number of tries before the first success, which averages notes.
+    count = 0
+    while rng.random() > 1 / (notes + 1):
+        count += 1
+    return count
+
+
+def made_up_tickets(count, notes=3, spread='fixed', seed=1, years=5, now=None):
+    '''Ticket dicts like the ones in tickets.json, oldest first, mostly closed like a real history.'''
+    rng = random.Random(seed)
+    now = now or datetime.datetime(2024, 6, 1, 12, 0, 0)
+    start = now - datetime.timedelta(days=365 * years)
+    step = (now - start) / max(count, 1)
+    # A few regulars call a lot, most people call once or twice.
+    callers = [f'555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}' for _ in range(max(count // 3, 1))]
+    regulars = callers[:max(len(callers) // 50, 1)]
+    for ticket_id in range(count):
+        created = start + step * ticket_id + datetime.timedelta(seconds=rng.randint(0, 59))
+        age = now - created
+        if age > datetime.timedelta(days=30):
+            status = "closed" if rng.random() < 0.98 else rng.choice(["open", "pending"])
+        else:
+            status = rng.choices(["open", "pending", "closed"], [6, 2, 2])[0]
+        thing = rng.choice(WORDS)
+        note_times = sorted(created + (age * rng.random()) for _ in range(note_count(rng, notes, spread)))
+        closed = created + age * rng.random() if status == "closed" else None
+        caller = rng.choice(regulars if rng.random() < 0.3 else callers)
+        yield {
+            'id': ticket_id,
+            'status': status,
+            'is_open': status != "closed",
+            'creation_date': created.strftime(DATE_FORMAT),
+            'title': rng.choice(PROBLEMS).format(thing).capitalize(),
+            'description': ' '.join(rng.sample(WORDS, rng.randint(5, 12))),
+            'phone_number': caller,
+            'notes': [{'note': rng.choice(NOTES).format(thing), 'timestamp': moment.strftime(DATE_FORMAT)}
+                      for moment in note_times],
+            'closed_date': closed.strftime(DATE_FORMAT) if closed else None,
+        }
+
+
+def write_ticket_file(path, count, notes=3, spread='fixed', seed=1):
+    '''Writes a ticket file the way the program saves one, open and pending tickets first.
+    The tickets are made twice over (same seed, same tickets) so a million of them never sit in memory at once.'''
+    def write_contents(file):
+        open_first = (ticket_data for ticket_data in made_up_tickets(count, notes, spread, seed) if ticket_data['is_open'])
+        closed = (ticket_data for ticket_data in made_up_tickets(count, notes, spread, seed) if not ticket_data['is_open'])
+        write_snapshot_lines(file, {'seq': 0, 'next_id': count, 'tickets': itertools.chain(open_first, closed)})
+    atomic_write(path, write_contents)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a ticket file full of made-up tickets.')
+    parser.add_argument('path')
+    parser.add_argument('--tickets', type=int, default=10000)
+    parser.add_argument('--notes', type=int, default=3, help='notes per ticket (the average with --spread geometric)')
+    parser.add_argument('--spread', choices=SPREADS, default='fixed')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    write_ticket_file(args.path, args.tickets, args.notes, args.spread, args.seed)
+    print(f'Wrote {args.tickets} tickets to {args.path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# How much memory the tickets take once they're loaded.
+# Builds a store of made-up tickets the same way loading a file does and prints the bytes per ticket.
+#
+#   python benchmarks/memory.py
+#   python benchmarks/memory.py --tickets 100000 --notes 3
+
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ticketcore import TicketStore, ticket_from_dict
+from generate import made_up_tickets
+
+
+def measure(count, notes_per_ticket):
+    # The lines are made first so only what the loaded tickets keep gets counted.
+    lines = [json.dumps(ticket_data) for ticket_data in made_up_tickets(count, notes_per_ticket)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = TicketStore()
+    store.add_loaded(ticket_from_dict(json.loads(line)) for line in lines)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / len(store)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bytes per loaded ticket.')
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--notes', type=int, default=3, help='notes on every ticket')
+    args = parser.parse_args()
+    print(f'{args.tickets} tickets with {args.notes} notes each: {measure(args.tickets, args.notes):.0f} bytes per ticket')
+
+
+if __name__ == '__main__':
+    main()
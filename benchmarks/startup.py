@@ -0,0 +1,81 @@
+# How long the window takes to show the open tickets after you start the program.
+# Makes a ticket file, starts the program on it a few times, and checks the median against a target.
+# The program prints its own times when TICKETSYSTEM_STARTUP_CHECK is set and closes itself once it's up.
+#
+#   python benchmarks/startup.py
+#   python benchmarks/startup.py --tickets 200000 --target 1.0
+#   python benchmarks/startup.py --command dist/ticketsystem/ticketsystem        the packaged build
+#
+# Needs a display, on a server run it under "xvfb-run python benchmarks/startup.py".
+# Exits with 1 if the open tickets took longer than the target to show up.
+
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate import write_ticket_file
+
+PROGRAM = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'TicketSystem.py')
+
+# Seconds from starting the program to the open tickets on screen, with 100,000 tickets in the file.
+STARTUP_TARGET = 1.0
+
+
+def start_once(command, ticket_file):
+    '''Starts the program once on a fresh copy of ticket_file. Returns the seconds until each startup step, from launching it.'''
+    # A copy every time, closing the program archives old tickets and the next run would start on a smaller file.
+    folder = tempfile.mkdtemp()
+    shutil.copy(ticket_file, os.path.join(folder, 'tickets.json'))
+    env = dict(os.environ, TICKETSYSTEM_STARTUP_CHECK='1')
+    launched = time.perf_counter()
+    process = subprocess.Popen(command, cwd=folder, env=env, stdout=subprocess.PIPE, text=True)
+    steps = {}
+    for line in process.stdout:
+        name, _, seconds = line.rpartition(': ')
+        if name.startswith('startup'):
+            # The program's own times start once Python is running, this one starts at the launch.
+            steps[name] = time.perf_counter() - launched
+            steps[name + ' (in the program)'] = float(seconds)
+    # Closing saves and archives, which isn't part of starting up.
+    process.wait()
+    shutil.rmtree(folder, ignore_errors=True)
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time from starting the program to tickets on screen.')
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--target', type=float, default=STARTUP_TARGET,
+                        help='most seconds the open tickets can take to show up')
+    parser.add_argument('--command', help='program to start (default: TicketSystem.py with this Python)')
+    args = parser.parse_args()
+
+    ticket_file = os.path.join(tempfile.mkdtemp(), 'tickets.json')
+    write_ticket_file(ticket_file, args.tickets, 3, 'geometric')
+    command = [os.path.abspath(args.command)] if args.command else [sys.executable, os.path.abspath(PROGRAM)]
+
+    runs = [start_once(command, ticket_file) for _ in range(args.runs)]
+    if not all('startup: all tickets' in steps for steps in runs):
+        print('The program never finished starting, is there a display? Try xvfb-run.', file=sys.stderr)
+        return 2
+    results = {name: round(statistics.median(steps[name] for steps in runs), 4) for name in runs[0]}
+    first = results.get('startup: first tickets', results['startup: all tickets'])
+    print(json.dumps(dict(results, tickets=args.tickets, runs=args.runs, target=args.target, command=' '.join(command))))
+    if first > args.target:
+        print(f'Too slow: the open tickets took {first:.3f}s to show up, the target is {args.target:.3f}s', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# Times the main things the program does with a big ticket file: load, save, sort, filter, search, caller history and drawing
+# tickets. Makes a ticket file of each size with generate.py first. Every result is one JSON line, so runs from
+# different versions can be kept and compared.
+#
+#   python benchmarks/suite.py
+#   python benchmarks/suite.py --sizes 1000,100000,1000000 --notes 2 --spread geometric -o results.jsonl
+#   python benchmarks/suite.py --compare results.jsonl        exits with 1 if anything got slower
+#
+# Putting tickets into the Text widget needs a display. Without one that step is left out, the rest still runs.
+# On a server, run it under "xvfb-run python benchmarks/suite.py".
+
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not on Windows.
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ticketcore import load_tickets, save_tickets, finish_saving, render_ticket, report_text
+from generate import write_ticket_file, SPREADS
+
+# How much slower than the old run a step has to be before --compare calls it a regression.
+# Steps that got slower by less than SLOWER_BY_SECONDS are left alone, tiny steps jump around a lot.
+SLOWER_BY = 1.25
+SLOWER_BY_SECONDS = 0.001
+
+# The window shows this many tickets at first (DISPLAY_PAGE_SIZE in TicketSystem.py).
+FIRST_PAGE = 50
+
+
+def text_widget():
+    '''A hidden Text widget to draw into, or None without a display.'''
+    try:
+        import tkinter
+        root = tkinter.Tk()
+    except Exception:
+        return None
+    root.withdraw()
+    return tkinter.Text(root)
+
+
+def render(tickets, statuses):
+    # The store keeps rendered text around, so it's thrown away first or only the first run would do any work.
+    shown = list(tickets.newest_first(*statuses))
+    for ticket in shown:
+        ticket.rendered = None
+    return ''.join(render_ticket(ticket) for ticket in shown)
+
+
+def steps(path, widget):
+    '''(name, function) for every step, in order. Later steps use the tickets the load step read.'''
+    state = {}
+
+    def load():
+        if 'tickets' in state:
+            finish_saving(state['tickets'])
+        state['tickets'] = load_tickets(search_index=False, path=path)
+
+    def tickets():
+        return state['tickets']
+
+    yield 'load', load
+    yield 'save', lambda: save_tickets(tickets())
+    yield 'sort', lambda: list(tickets().newest_first())
+    yield 'first_page', lambda: tickets().page(("open", "pending"), None, FIRST_PAGE)
+    yield 'filter', lambda: list(tickets().newest_first("closed"))
+    yield 'search_index', lambda: tickets().build_search_index()
+    yield 'search_title', lambda: tickets().search('printer', fields=('title',), statuses=("open", "pending"), whole_phrase=True)
+    yield 'search_phone', lambda: tickets().search('555-3', fields=('phone_number',), statuses=("open", "pending"), whole_phrase=True)
+    yield 'search_all', lambda: tickets().search('replaced printer')
+    # The first run makes the contact index, after that a caller's history is one lookup.
+    yield 'caller_history', lambda: tickets().caller_history(next(tickets().newest_first()).phone_number)
+    yield 'render', lambda: render(tickets(), ("open", "pending"))
+    # The first run works the totals out from every ticket, after that they're kept.
+    yield 'report', lambda: report_text(tickets(), 30)
+    if widget is not None:
+        def draw():
+            widget.delete('1.0', 'end')
+            widget.insert('end', render(tickets(), ("open", "pending")))
+            widget.update_idletasks()
+        yield 'render_widget', draw
+    yield 'close', lambda: finish_saving(tickets())
+
+
+def time_step(run, runs):
+    # The steps after load all work on the one store it read, and none of them change what's in it.
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def version():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or 'unknown'
+    except OSError:
+        return 'unknown'
+
+
+def run_suite(sizes, notes, spread, runs, output):
+    widget = text_widget()
+    about = {'version': version(), 'python': platform.python_version(), 'notes': notes, 'spread': spread}
+    folder = tempfile.mkdtemp()
+    for size in sizes:
+        path = os.path.join(folder, f'tickets-{size}.json')
+        write_ticket_file(path, size, notes, spread)
+        for name, run in steps(path, widget):
+            # close saves everything and lets go of the file, there's nothing left to do a second time.
+            seconds, peak = time_step(run, 1 if name == 'close' else runs)
+            result = dict(about, step=name, tickets=size, seconds=round(statistics.median(seconds), 6),
+                          best=round(min(seconds), 6), runs=len(seconds), peak_bytes=peak)
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+    if resource is None:
+        return
+    # ru_maxrss is in kilobytes on Linux and bytes on a Mac.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    output.write(json.dumps(dict(about, step='process', max_rss_kb=max_rss if sys.platform != 'darwin' else max_rss // 1024)) + '\n')
+
+
+def read_results(path):
+    with open(path, 'r') as file:
+        return {(result['step'], result['tickets']): result for result in map(json.loads, file) if 'seconds' in result}
+
+
+def compare(old_path, new_path):
+    '''Prints every step next to the old run's time and returns how many got slower by more than SLOWER_BY.'''
+    old = read_results(old_path)
+    slower = 0
+    for key, result in read_results(new_path).items():
+        if key not in old:
+            continue
+        # best is less bothered by whatever else the computer was doing than the median.
+        ratio = result['best'] / max(old[key]['best'], 1e-9)
+        flag = ''
+        if ratio > SLOWER_BY and result['best'] - old[key]['best'] > SLOWER_BY_SECONDS:
+            slower += 1
+            flag = '   SLOWER'
+        print(f'{key[0]:>14} {key[1]:>9} tickets  {old[key]["best"]:10.4f}s -> {result["best"]:10.4f}s  {ratio:5.2f}x{flag}')
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time loading, saving, sorting, searching and drawing tickets.')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='ticket counts to try, comma separated')
+    parser.add_argument('--notes', type=int, default=3, help='notes per ticket (the average with --spread geometric)')
+    parser.add_argument('--spread', choices=SPREADS, default='geometric')
+    parser.add_argument('--runs', type=int, default=3, help='times each step is run, the median is reported')
+    parser.add_argument('-o', '--output', help='file to write the results to (default: the screen)')
+    parser.add_argument('--compare', metavar='OLD_RESULTS', help='results from an earlier run to compare with')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    if args.compare:
+        # The new results are needed in a file too, to read them back for the comparison.
+        output_path = args.output or os.path.join(tempfile.mkdtemp(), 'results.jsonl')
+    else:
+        output_path = args.output
+    output = open(output_path, 'w') if output_path else sys.stdout
+    try:
+        run_suite(sizes, args.notes, args.spread, args.runs, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    if args.compare:
+        return 1 if compare(args.compare, output_path) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
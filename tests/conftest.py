@@ -0,0 +1,18 @@
+# Every test runs in an empty folder of its own, so ticket files, journals, archives and Tickets.log land there.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from helpers import Stores
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    opened = Stores(tmp_path)
+    yield opened
+    opened.close_all()
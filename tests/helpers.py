@@ -0,0 +1,82 @@
+# Helpers for the tests: opening ticket files and changing tickets the way the window and command line do.
+
+import json
+import math
+
+from ticketcore import (Reports, Ticket, changing, finish_saving, load_tickets, record_change, ticket_to_dict)
+
+
+class Stores:
+    '''Opens ticket files in a test's folder and closes whatever the test leaves open.'''
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.opened = []
+
+    def path(self, name):
+        return str(self.folder / name)
+
+    def open(self, name='tickets.json'):
+        tickets = load_tickets(search_index=False, path=self.path(name))
+        self.opened.append(tickets)
+        return tickets
+
+    def close(self, tickets, compact=False):
+        self.opened.remove(tickets)
+        finish_saving(tickets, compact)
+
+    def reopen(self, tickets, name='tickets.json', compact=False):
+        self.close(tickets, compact)
+        return self.open(name)
+
+    def close_all(self):
+        while self.opened:
+            self.close(self.opened[-1])
+
+
+def add_ticket(tickets, title='Printer jam', phone_number='555-123-4567', **fields):
+    with changing(tickets):
+        ticket = tickets.add(Ticket(title, 'Floor 2 printer keeps jamming', phone_number, **fields))
+        record_change(tickets, {'op': 'add', 'ticket': ticket_to_dict(ticket)})
+    return ticket
+
+
+def add_old_closed_ticket(tickets, title='Old ticket', created='01-02-2023 09:00:00', closed='01-05-2023 17:00:00'):
+    return add_ticket(tickets, title, creation_date=created, is_open=False, status="closed", closed_date=closed)
+
+
+def set_status(tickets, ticket_id, status, closed_date=None):
+    with changing(tickets):
+        ticket = tickets.get(ticket_id)
+        tickets.set_status(ticket, status, closed_date)
+        record_change(tickets, {'op': 'status', 'id': ticket_id, 'status': status, 'closed_date': ticket.closed_date})
+    return ticket
+
+
+def add_note(tickets, ticket_id, text):
+    with changing(tickets):
+        note_entry = tickets.add_note(tickets.get(ticket_id), text)
+        record_change(tickets, {'op': 'note', 'id': ticket_id, 'note': note_entry})
+
+
+def edit(tickets, ticket_id, **fields):
+    with changing(tickets):
+        tickets.update(tickets.get(ticket_id), **fields)
+        record_change(tickets, {'op': 'set', 'id': ticket_id, 'fields': fields})
+
+
+def saved_tickets(tickets):
+    '''Every ticket in the store as the JSON it's saved as, sorted, to compare two stores.'''
+    return sorted(json.dumps(ticket_to_dict(ticket), sort_keys=True) for ticket in tickets)
+
+
+def assert_same_reports(reports, expected):
+    '''The totals that have to match. max is left out, it only ever goes up, even when a close is taken back.'''
+    assert {day: totals for day, totals in reports.days.items() if totals != [0, 0]} == expected.days
+    assert {bucket: count for bucket, count in reports.close_times.buckets.items() if count} == expected.close_times.buckets
+    assert reports.close_times.count == expected.close_times.count
+    assert math.isclose(reports.close_times.total, expected.close_times.total, rel_tol=1e-9, abs_tol=1e-6)
+
+
+def rebuilt_reports(tickets):
+    return Reports.count_all(tickets)
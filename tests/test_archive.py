@@ -0,0 +1,73 @@
+from ticketarchive import TicketArchive
+from ticketcore import check_for_changes
+
+from helpers import add_ticket, add_old_closed_ticket, edit
+
+
+def archived_store(stores):
+    tickets = stores.open()
+    add_ticket(tickets, 'Still open')
+    for month in range(1, 4):
+        add_old_closed_ticket(tickets, f'Zebra printer {month}', created=f'0{month}-02-2023 09:00:00',
+                              closed=f'0{month}-03-2023 09:00:00')
+    assert tickets.storage.archive_old_tickets(tickets, days=30) == 3
+    return stores.reopen(tickets)
+
+
+def test_old_closed_tickets_move_to_the_archive(stores):
+    tickets = archived_store(stores)
+    assert sorted(tickets.by_id) == [0]
+    assert len(tickets.archive) == 3
+    assert [ticket.ticket_id for ticket in tickets.page(("closed",))] == [3, 2, 1]
+    assert [ticket.ticket_id for ticket in tickets.newest_first(archived=True)] == [0, 3, 2, 1]
+    assert sorted(ticket.ticket_id for ticket in tickets.search('zebra')) == [1, 2, 3]
+
+
+def test_changing_an_archived_ticket_brings_it_back(stores):
+    tickets = archived_store(stores)
+    edit(tickets, 2, title='Zebra printer, looked at again')
+    assert 2 in tickets.by_id
+    assert len(tickets.archive) == 2
+    tickets = stores.reopen(tickets)
+    assert tickets.by_id[2].title == 'Zebra printer, looked at again'
+    assert [ticket.ticket_id for ticket in tickets.page(("closed",))] == [3, 2, 1]
+
+
+
+def test_looking_at_an_archived_ticket_leaves_it_archived(stores):
+    tickets = archived_store(stores)
+    assert tickets.has(2) and not tickets.has(9)
+    assert tickets.find(2).title == 'Zebra printer 2'
+    assert tickets.find(9) is None
+    assert 2 not in tickets.by_id
+    assert len(stores.reopen(tickets).archive) == 3
+
+
+def test_another_copy_follows_the_archiving(stores):
+    tickets = stores.open()
+    add_old_closed_ticket(tickets)
+    other = stores.open()
+    tickets.storage.archive_old_tickets(tickets, days=30)
+    check_for_changes(other, wait=True)
+    assert 0 not in other.by_id
+    assert other.get(0).title == 'Old ticket'
+
+
+def test_segments_are_only_written_holding_the_file_lock(stores, monkeypatch):
+    tickets = stores.open()
+    add_old_closed_ticket(tickets)
+    add_old_closed_ticket(tickets, 'Old two')
+    locked = []
+    write_segment = TicketArchive.write_segment
+
+    def checked_write_segment(archive, month, tickets_data):
+        locked.append(tickets.storage.file_lock.depth > 0)
+        write_segment(archive, month, tickets_data)
+
+    monkeypatch.setattr(TicketArchive, 'write_segment', checked_write_segment)
+    tickets.storage.archive_old_tickets(tickets, days=30)
+    edit(tickets, 0, title='Old ticket, looked at again')
+    # Not inside changing, get still takes the lock to bring it back.
+    assert tickets.get(1).title == 'Old two'
+    assert locked == [True, True, True]
+    assert len(stores.reopen(tickets).archive) == 0
@@ -0,0 +1,99 @@
+import pytest
+
+import ticketcore
+from ticketcore import batch_change, format_ticket_ids, parse_ticket_ids
+
+from helpers import add_ticket, add_old_closed_ticket, saved_tickets, assert_same_reports, rebuilt_reports
+
+
+def test_parse_ticket_ids():
+    assert parse_ticket_ids('12, 15-17 3') == [12, 15, 16, 17, 3]
+    assert parse_ticket_ids('4,4 3-5') == [4, 3, 5]
+    assert format_ticket_ids([9, 3, 4, 5]) == '3-5, 9'
+    for text in ('12-', 'ten', '9-3', '1-100000'):
+        with pytest.raises(ValueError):
+            parse_ticket_ids(text)
+
+
+def test_a_batch_is_one_change(stores):
+    tickets = stores.open()
+    for number in range(4):
+        add_ticket(tickets, f'Ticket {number}')
+    changed = batch_change(tickets, [0, 2, 3], 'close')
+    assert [ticket.ticket_id for ticket in changed] == [0, 2, 3]
+    assert tickets.count("closed") == 3
+    # Already closed, left alone.
+    assert batch_change(tickets, [0, 1], 'close') == [tickets.get(1)]
+    batch_change(tickets, [0, 1], 'note', 'Called back')
+    expected = saved_tickets(tickets)
+    assert saved_tickets(stores.reopen(tickets)) == expected
+
+
+def test_a_missing_id_changes_nothing(stores):
+    tickets = stores.open()
+    add_ticket(tickets)
+    before = saved_tickets(tickets)
+    with pytest.raises(ValueError, match='No ticket with ID 5-6'):
+        batch_change(tickets, [0, 5, 6], 'close')
+    assert saved_tickets(tickets) == before
+    assert saved_tickets(stores.reopen(tickets)) == before
+
+
+def test_a_missing_id_leaves_archived_tickets_archived(stores):
+    tickets = stores.open()
+    add_ticket(tickets)
+    add_old_closed_ticket(tickets)
+    tickets.storage.archive_old_tickets(tickets, days=30)
+    tickets = stores.reopen(tickets)
+    with pytest.raises(ValueError, match='No ticket with ID 7'):
+        batch_change(tickets, [1, 7], 'reopen')
+    assert 1 not in tickets.by_id
+    tickets = stores.reopen(tickets)
+    assert 1 not in tickets.by_id
+    assert len(tickets.archive) == 1
+
+
+def test_a_batch_that_fails_halfway_saves_nothing_in_sqlite(stores, monkeypatch):
+    tickets = stores.open('tickets.db')
+    for number in range(3):
+        add_ticket(tickets, f'Ticket {number}')
+    before = saved_tickets(tickets)
+    actions = []
+
+    def log_action(action, message, ticket_id=None):
+        # The second ticket's change goes wrong, after the first one is already written.
+        actions.append(action)
+        if len(actions) == 2:
+            raise OSError('disk full')
+
+    monkeypatch.setattr(ticketcore, 'log_action', log_action)
+    with pytest.raises(OSError):
+        batch_change(tickets, [0, 1, 2], 'close')
+    assert saved_tickets(tickets) == before
+    assert tickets.count("closed") == 0
+    assert saved_tickets(stores.reopen(tickets, 'tickets.db')) == before
+
+
+def test_a_batch_that_fails_on_its_last_ticket_puts_the_others_back(stores, monkeypatch):
+    tickets = stores.open()
+    tickets.report()
+    for number in range(3):
+        add_ticket(tickets, f'Ticket {number}')
+    tickets.build_search_index()
+    before = saved_tickets(tickets)
+
+    def log_action(action, message, ticket_id=None):
+        if ticket_id == 2:
+            raise OSError('disk full')
+
+    monkeypatch.setattr(ticketcore, 'log_action', log_action)
+    with pytest.raises(OSError):
+        batch_change(tickets, [0, 1, 2], 'title', 'Zebra printer')
+    assert saved_tickets(tickets) == before
+    assert tickets.search('zebra') == []
+    with pytest.raises(OSError):
+        batch_change(tickets, [0, 1, 2], 'close')
+    assert saved_tickets(tickets) == before
+    assert tickets.count("closed") == 0
+    assert_same_reports(tickets.report(), rebuilt_reports(tickets))
+    assert saved_tickets(stores.reopen(tickets)) == before
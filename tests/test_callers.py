@@ -0,0 +1,58 @@
+import pytest
+
+from helpers import add_ticket, add_old_closed_ticket, edit, set_status
+
+
+def ids(tickets):
+    return [ticket.ticket_id for ticket in tickets]
+
+
+@pytest.mark.parametrize('name', ['tickets.json', 'tickets.db'])
+def test_a_callers_history_has_every_way_of_writing_the_number(stores, name):
+    tickets = stores.open(name)
+    add_ticket(tickets, 'Printer jam', '(555) 123-4567', creation_date='03-01-2024 09:00:00')
+    add_ticket(tickets, 'VPN down', '555.123.4567', creation_date='03-02-2024 09:00:00')
+    add_ticket(tickets, 'Someone else', '555-999-0000', creation_date='03-03-2024 09:00:00')
+    add_ticket(tickets, 'Toner low', '1-555-123-4567', creation_date='03-04-2024 09:00:00')
+    set_status(tickets, 1, "closed")
+    assert ids(tickets.caller_history('5551234567')) == [3, 1, 0]
+    # What the new ticket form warns about.
+    assert ids(tickets.caller_history('+1 (555) 123 4567', ("open", "pending"))) == [3, 0]
+    assert tickets.caller_history('') == []
+
+
+def test_archived_tickets_are_in_the_history_without_coming_back(stores):
+    tickets = stores.open()
+    add_old_closed_ticket(tickets, 'Last year', created='01-02-2023 09:00:00', closed='01-05-2023 17:00:00')
+    add_old_closed_ticket(tickets, 'Other caller', created='02-02-2023 09:00:00', closed='02-05-2023 17:00:00')
+    edit(tickets, 1, phone_number='555-999-0000')
+    add_ticket(tickets, 'This year', '555 123 4567')
+    assert tickets.storage.archive_old_tickets(tickets, days=30) == 2
+    # Read back from the archive's manifests.
+    tickets = stores.reopen(tickets)
+    assert ids(tickets.caller_history('555-123-4567')) == [2, 0]
+    assert ids(tickets.caller_history('555-123-4567', ("open", "pending"))) == [2]
+    assert 0 not in tickets.by_id and len(tickets.archive) == 2
+
+
+def test_a_ticket_moves_to_its_new_caller_when_the_number_changes(stores):
+    tickets = stores.open()
+    add_ticket(tickets, 'Printer jam', '555-123-4567')
+    add_ticket(tickets, 'VPN down', '555-123-4567')
+    assert ids(tickets.caller_history('5551234567')) == [1, 0]
+    edit(tickets, 0, phone_number='555-999-0000')
+    assert ids(tickets.caller_history('5551234567')) == [1]
+    assert ids(tickets.caller_history('5559990000')) == [0]
+
+
+def test_numbers_changed_while_the_index_was_built_are_filed_again(stores):
+    tickets = stores.open()
+    add_ticket(tickets, 'Printer jam', '555-123-4567')
+    work, done = tickets.contacts_job()
+    index = work()
+    edit(tickets, 0, phone_number='555-999-0000')
+    add_ticket(tickets, 'VPN down', '555-123-4567')
+    done(index)
+    assert tickets.contacts is index
+    assert ids(tickets.caller_history('5551234567')) == [1]
+    assert ids(tickets.caller_history('5559990000')) == [0]
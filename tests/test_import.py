@@ -0,0 +1,83 @@
+import pytest
+
+from ticketcore import Ticket, export_job, export_tickets, import_steps, import_tickets, read_import
+
+from helpers import add_ticket, add_old_closed_ticket, edit, saved_tickets
+
+
+def write(stores, name, text):
+    path = stores.path(name)
+    with open(path, 'w', newline='') as file:
+        file.write(text)
+    return path
+
+
+def test_every_problem_comes_with_its_line(stores):
+    path = write(stores, 'old.csv', 'title,status,creation_date\n'
+                                    'Printer jam,open,01-31-2024 09:30:00\n'
+                                    ',open,\n'
+                                    'VPN down,broken,\n'
+                                    'Laptop,closed,yesterday\n')
+    new_tickets, problems = read_import(path)
+    assert [ticket.title for ticket in new_tickets] == ['Printer jam']
+    assert problems == [
+        'line 3: no title',
+        "line 4: status 'broken' isn't one of open, pending, closed",
+        "line 5: creation_date 'yesterday' isn't a date like 01-31-2024 09:30:00 or 2024-01-31 09:30:00",
+    ]
+
+
+def test_broken_json_lines(stores):
+    path = write(stores, 'old.jsonl', '{"title": "Printer jam", "phone_number": 5551234567}\n'
+                                      '\n'
+                                      '{"title": "VPN down"\n'
+                                      '["not", "a", "ticket"]\n')
+    new_tickets, problems = read_import(path)
+    assert new_tickets[0].phone_number == '5551234567'
+    assert [problem.split(':')[0] for problem in problems] == ['line 3', 'line 4']
+
+
+def test_an_import_is_one_change(stores):
+    path = write(stores, 'old.jsonl', ''.join(f'{{"title": "Ticket {number}", "status": "pending", '
+                                              f'"creation_date": "2024-01-31 09:30:00"}}\n' for number in range(300)))
+    new_tickets, problems = read_import(path)
+    assert problems == []
+    tickets = stores.open()
+    import_tickets(tickets, new_tickets)
+    assert tickets.count("pending") == 300
+    with open(tickets.storage.journal.path) as journal:
+        assert len(journal.readlines()) == 1
+    expected = saved_tickets(tickets)
+    assert saved_tickets(stores.reopen(tickets)) == expected
+
+
+def test_an_import_in_steps_is_recorded_at_the_end(stores):
+    tickets = stores.open()
+    steps = import_steps(tickets, [Ticket(f'Ticket {number}', '', '') for number in range(250)], step=100)
+    assert [len(added) for added in steps] == [100, 200, 250]
+    assert tickets.count("open") == 250
+    with open(tickets.storage.journal.path) as journal:
+        assert len(journal.readlines()) == 1
+    expected = saved_tickets(tickets)
+    assert saved_tickets(stores.reopen(tickets)) == expected
+
+
+@pytest.mark.parametrize('name', ['tickets.json', 'tickets.db'])
+def test_an_export_has_the_tickets_from_when_it_started(stores, name):
+    tickets = stores.open(name)
+    add_ticket(tickets, 'Still open')
+    for month in range(1, 4):
+        add_old_closed_ticket(tickets, f'Zebra printer {month}', created=f'0{month}-02-2023 09:00:00',
+                              closed=f'0{month}-03-2023 09:00:00')
+    if name.endswith('.json'):
+        assert tickets.storage.archive_old_tickets(tickets, days=30) == 3
+    with open(stores.path('before.jsonl'), 'w') as output:
+        export_tickets(tickets, output, 'jsonl')
+    write = export_job(tickets, stores.path('export.jsonl'), 'jsonl')
+    # The store goes on changing before the worker gets to writing.
+    edit(tickets, 0, title='Changed meanwhile')
+    edit(tickets, 2, title='Brought back meanwhile')
+    add_ticket(tickets, 'Added meanwhile')
+    assert write() == 4
+    with open(stores.path('before.jsonl')) as before, open(stores.path('export.jsonl')) as export:
+        assert export.read() == before.read()
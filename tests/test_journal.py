@@ -0,0 +1,40 @@
+from helpers import add_ticket, add_note, edit, set_status, saved_tickets
+
+
+def test_changes_are_there_after_a_reload(stores):
+    tickets = stores.open()
+    first = add_ticket(tickets, 'Printer jam')
+    second = add_ticket(tickets, 'VPN down', '555-000-1111')
+    add_note(tickets, first.ticket_id, 'Called back')
+    edit(tickets, second.ticket_id, title='VPN down on floor 3')
+    set_status(tickets, second.ticket_id, "closed")
+    set_status(tickets, first.ticket_id, "pending")
+    expected = saved_tickets(tickets)
+
+    tickets = stores.reopen(tickets)
+    assert saved_tickets(tickets) == expected
+    assert tickets.get(first.ticket_id).notes[-1].text == 'Called back'
+    assert tickets.get(second.ticket_id).closed_date is not None
+    assert tickets.next_id == 2
+
+
+def test_a_second_copy_reads_the_journal_without_the_first_closing(stores):
+    tickets = stores.open()
+    ticket = add_ticket(tickets)
+    add_note(tickets, ticket.ticket_id, 'Still jammed')
+    # Like a crash: the first copy never saved the ticket file, only the journal has the changes.
+    other = stores.open()
+    assert saved_tickets(other) == saved_tickets(tickets)
+
+
+def test_compacting_keeps_every_ticket(stores):
+    tickets = stores.open()
+    for number in range(5):
+        add_ticket(tickets, f'Ticket {number}')
+    set_status(tickets, 3, "closed")
+    expected = saved_tickets(tickets)
+    tickets = stores.reopen(tickets, compact=True)
+    assert saved_tickets(tickets) == expected
+    tickets = stores.reopen(tickets)
+    assert saved_tickets(tickets) == expected
+
@@ -0,0 +1,19 @@
+from ticketcore import LazyTicket
+
+from helpers import add_ticket, add_note, edit, set_status
+
+
+def test_editing_a_closed_ticket_read_lazily(stores):
+    tickets = stores.open()
+    ticket = add_ticket(tickets, 'Old printer')
+    add_note(tickets, ticket.ticket_id, 'Fixed it')
+    closed_date = set_status(tickets, ticket.ticket_id, "closed").closed_date
+    tickets = stores.reopen(tickets, compact=True)
+    assert isinstance(tickets.get(ticket.ticket_id), LazyTicket)
+
+    edit(tickets, ticket.ticket_id, title='Old printer, replaced')
+    tickets = stores.reopen(tickets)
+    ticket = tickets.get(ticket.ticket_id)
+    assert ticket.title == 'Old printer, replaced'
+    assert [note.text for note in ticket.notes] == ['Fixed it']
+    assert ticket.closed_date == closed_date
@@ -0,0 +1,74 @@
+import os
+
+from ticketcore import LOG_FILE, clear_log, lines_backwards, log_end, read_log_page, read_log_since
+
+
+def log_line(number):
+    action, ticket = ('status', f' #{number % 7}') if number % 3 == 0 else ('search', '')
+    return f'2024-06-01 12:{number // 60 % 60:02d}:{number % 60:02d} - {action}{ticket} - Line {number}'
+
+
+def write_log(path, numbers, mtime=None):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(''.join(log_line(number) + '\n' for number in numbers))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def turned_over_log():
+    # Tickets.log.1 is the older copy the log was turned over into.
+    write_log(LOG_FILE + '.1', range(150), mtime=1000000)
+    write_log(LOG_FILE, range(150, 300))
+
+
+def every_page(count, **filters):
+    cursor, tail = log_end()
+    pages = []
+    while cursor is not None:
+        lines, cursor = read_log_page(cursor, count, **filters)
+        pages.append(lines)
+    # Each page is oldest first, the pages themselves come newest first.
+    return [line for page in reversed(pages) for line in page], pages
+
+
+def test_paging_back_reads_every_line_once_into_the_older_copies(stores):
+    turned_over_log()
+    lines, pages = every_page(40)
+    assert lines == [log_line(number) for number in range(300)]
+    assert [len(page) for page in pages] == [40] * 7 + [20]
+
+
+def test_paging_back_for_one_ticket_or_one_action(stores):
+    turned_over_log()
+    lines, pages = every_page(10, ticket_id=5)
+    assert lines == [log_line(number) for number in range(300) if number % 3 == 0 and number % 7 == 5]
+    lines, pages = every_page(25, action='search')
+    assert lines == [log_line(number) for number in range(300) if number % 3]
+
+
+def test_reading_backwards_across_small_blocks(stores):
+    write_log(LOG_FILE, range(20))
+    with open(LOG_FILE, 'rb') as file:
+        data = file.read()
+    found = list(lines_backwards(LOG_FILE, block_size=7))
+    assert [line for offset, line in found] == [log_line(number) for number in reversed(range(20))]
+    # Each offset is where its line starts, the next page starts reading before it.
+    assert all(data[offset:].startswith(line.encode()) for offset, line in found)
+    assert [line for offset, line in lines_backwards(LOG_FILE, found[5][0], block_size=7)] == \
+           [line for offset, line in found[6:]]
+
+
+def test_tailing_picks_up_new_lines_and_starts_over_after_clearing(stores):
+    write_log(LOG_FILE, range(5))
+    offset = log_end()[1]
+    with open(LOG_FILE, 'a', encoding='utf-8') as file:
+        file.write(log_line(5) + '\n' + log_line(6)[:10])
+    lines, offset = read_log_since(offset)
+    # The half written line waits until it's finished.
+    assert lines == [log_line(5)]
+    with open(LOG_FILE, 'a', encoding='utf-8') as file:
+        file.write(log_line(6)[10:] + '\n')
+    assert read_log_since(offset)[0] == [log_line(6)]
+    clear_log()
+    write_log(LOG_FILE, [7])
+    assert read_log_since(offset)[0] == [log_line(7)]
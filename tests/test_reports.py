@@ -0,0 +1,81 @@
+import ticketcli
+from ticketcore import batch_change, check_for_changes, file_stamp, import_tickets, Ticket
+
+from helpers import add_ticket, add_old_closed_ticket, set_status, assert_same_reports, rebuilt_reports
+
+
+def test_running_totals_match_counting_from_scratch(stores):
+    tickets = stores.open()
+    tickets.report()
+    for number in range(5):
+        add_ticket(tickets, f'Ticket {number}')
+    add_old_closed_ticket(tickets)
+    set_status(tickets, 1, "closed")
+    set_status(tickets, 2, "pending")
+    set_status(tickets, 1, "open")
+    set_status(tickets, 5, "open")
+    batch_change(tickets, [0, 3], 'close')
+    import_tickets(tickets, [Ticket('Imported', '', '', '01-31-2024 09:30:00', is_open=False,
+                                    closed_date='02-02-2024 10:00:00')])
+    assert_same_reports(tickets.report(), rebuilt_reports(tickets))
+
+    # Saved with the ticket file and read back.
+    tickets = stores.reopen(tickets, compact=True)
+    assert tickets.reports is not None
+    assert_same_reports(tickets.report(), rebuilt_reports(tickets))
+
+
+def test_archived_tickets_are_not_counted_twice(stores):
+    tickets = stores.open()
+    add_old_closed_ticket(tickets)
+    add_ticket(tickets)
+    tickets.report()
+    tickets.storage.archive_old_tickets(tickets, days=30)
+    set_status(tickets, 0, "open")
+    tickets = stores.reopen(tickets)
+    assert_same_reports(tickets.report(), rebuilt_reports(tickets))
+
+
+def test_a_close_read_back_counts_when_it_happened(stores):
+    tickets = stores.open()
+    add_ticket(tickets, creation_date='03-01-2024 09:00:00')
+    tickets.report()
+    tickets = stores.reopen(tickets, compact=True)
+    other = stores.open()
+    other.report()
+    set_status(tickets, 0, "closed", '03-04-2024 12:00:00')
+    assert_same_reports(tickets.report(), rebuilt_reports(tickets))
+    # Another copy reads the close from the journal.
+    check_for_changes(other, wait=True)
+    assert other.by_id[0].closed_date == '03-04-2024 12:00:00'
+    assert_same_reports(other.report(), rebuilt_reports(other))
+    # And so does a copy loading the ticket file and replaying the journal.
+    stores.close(other)
+    tickets = stores.reopen(tickets)
+    assert tickets.reports is not None
+    assert_same_reports(tickets.report(), rebuilt_reports(tickets))
+
+
+def test_a_report_saves_only_the_reports(stores, capsys):
+    tickets = stores.open()
+    add_ticket(tickets)
+    add_old_closed_ticket(tickets)
+    stores.close(tickets, compact=True)
+    stamp = file_stamp(stores.path('tickets.json'))
+    assert ticketcli.main(['--file', stores.path('tickets.json'), 'report']) == 0
+    assert 'Opened' in capsys.readouterr().out
+    assert file_stamp(stores.path('tickets.json')) == stamp
+    tickets = stores.open()
+    assert tickets.reports is not None
+    assert_same_reports(tickets.report(), rebuilt_reports(tickets))
+
+
+def test_reports_counting_changes_still_in_the_journal_are_not_saved(stores):
+    tickets = stores.open()
+    add_ticket(tickets)
+    tickets = stores.reopen(tickets, compact=True)
+    add_ticket(tickets, 'Only in the journal')
+    tickets.report()
+    assert not tickets.storage.save_reports(tickets)
+    tickets = stores.reopen(tickets)
+    assert tickets.reports is None
@@ -0,0 +1,39 @@
+from helpers import add_ticket, add_note, edit, set_status
+
+
+def found(tickets, query, **options):
+    return sorted(ticket.ticket_id for ticket in tickets.search(query, **options))
+
+
+def test_search_follows_edits(stores):
+    tickets = stores.open()
+    tickets.build_search_index()
+    add_ticket(tickets, 'Zebra printer jam', '(555) 123-4567')
+    add_ticket(tickets, 'Laptop screen', '555-999-0000')
+    assert found(tickets, 'zebra') == [0]
+    assert found(tickets, '555-123-4567', fields=('phone_number',)) == [0]
+
+    edit(tickets, 0, title='Label printer jam', phone_number='555-000-1111')
+    assert found(tickets, 'zebra') == []
+    assert found(tickets, '555-123-4567', fields=('phone_number',)) == []
+    assert found(tickets, 'label printer', whole_phrase=True) == [0]
+
+    add_note(tickets, 1, 'Replaced the zebra stripes')
+    set_status(tickets, 1, "closed")
+    assert found(tickets, 'zebra') == [1]
+    assert found(tickets, 'zebra', statuses=("open",)) == []
+    # Every trigram of the old title came out, nothing is left pointing at ticket 0.
+    assert 0 not in tickets.search_index.postings['zeb']
+
+
+def test_search_after_a_reload(stores):
+    tickets = stores.open()
+    for number in range(30):
+        add_ticket(tickets, f'Ticket {number}', f'555-000-{number:04d}')
+    set_status(tickets, 7, "closed")
+    tickets = stores.reopen(tickets, compact=True)
+    edit(tickets, 7, title='Printer on fire')
+    assert found(tickets, 'fire') == [7]
+    assert found(tickets, 'ticket 7', whole_phrase=True) == []
+    assert found(tickets, '0007', fields=('phone_number',)) == [7]
+    assert found(tickets, 'ticket 1', whole_phrase=True) == [1] + list(range(10, 20))
@@ -0,0 +1,77 @@
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+import ticketserver
+from ticketserver import APIError, StoreWriter, set_status, start_server
+
+from helpers import add_ticket
+
+
+def test_a_job_that_timed_out_never_runs(stores, monkeypatch):
+    tickets = stores.open()
+    add_ticket(tickets)
+    writer = StoreWriter(tickets)
+    monkeypatch.setattr(ticketserver, 'WRITER_TIMEOUT', 0.05)
+    with pytest.raises(APIError):
+        writer.submit(set_status(0, "closed"))
+    # The owning thread only gets to it now.
+    writer.run_pending()
+    assert tickets.get(0).status == "open"
+
+
+def test_a_job_that_started_in_time_is_waited_for(stores, monkeypatch):
+    tickets = stores.open()
+    add_ticket(tickets)
+    writer = StoreWriter(tickets)
+    monkeypatch.setattr(ticketserver, 'WRITER_TIMEOUT', 0.05)
+    close = set_status(0, "closed")
+
+    def slow_close(tickets):
+        time.sleep(0.2)
+        return close(tickets)
+
+    owner = threading.Thread(target=lambda: (time.sleep(0.01), writer.run_pending()))
+    owner.start()
+    assert json.loads(writer.submit(slow_close))['status'] == "closed"
+    owner.join()
+    assert tickets.get(0).status == "closed"
+
+
+@pytest.fixture
+def server(stores):
+    tickets = stores.open()
+    add_ticket(tickets)
+    writer = StoreWriter(tickets)
+    server = start_server(writer, port=0)
+    stop = threading.Event()
+    owner = threading.Thread(target=writer.run_forever, args=(stop, 0.05))
+    owner.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    stop.set()
+    owner.join()
+
+
+def post(server, path, body, headers):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_port)
+    connection.request('POST', path, body, headers)
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status
+
+
+def test_only_json_from_this_computer_is_taken(server):
+    body = json.dumps({'ids': '0', 'action': 'close'})
+    # What a form or fetch() on any web page can send without asking first.
+    assert post(server, '/batch', body, {'Content-Type': 'text/plain'}) == 415
+    assert post(server, '/batch', body, {'Content-Type': 'application/json', 'Origin': 'https://example.com'}) == 403
+    assert post(server, '/batch', body, {'Content-Type': 'application/json', 'Host': 'example.com:8765'}) == 403
+    assert server.writer.tickets.get(0).status == "open"
+    assert post(server, '/batch', body, {'Content-Type': 'application/json', 'Origin': 'http://localhost:3000'}) == 200
+    assert server.writer.tickets.get(0).status == "closed"
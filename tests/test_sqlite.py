@@ -0,0 +1,71 @@
+import gc
+
+from ticketcore import Ticket, check_for_changes, import_tickets
+
+from helpers import add_note, add_ticket, edit, set_status
+
+
+def test_only_tickets_something_holds_stay_loaded(stores):
+    tickets = stores.open('tickets.db')
+    import_tickets(tickets, [Ticket(f'Ticket {number}', '', '') for number in range(300)])
+    gc.collect()
+    assert len(tickets.loaded) == 0
+    held = tickets.get(5)
+    page = tickets.page(None, None, 50)
+    assert len(tickets.loaded) == 51
+    del page
+    gc.collect()
+    assert list(tickets.loaded) == [5]
+    # Whoever asks while it's held gets the same ticket, changes and all.
+    tickets.update(held, title='Changed')
+    assert tickets.get(5) is held
+    assert tickets.search('Changed') == [held]
+
+
+def search_ids(tickets, query, **options):
+    return [ticket.ticket_id for ticket in tickets.search(query, **options)]
+
+
+def test_search_finds_any_part_of_a_word(stores):
+    tickets = stores.open('tickets.db')
+    import_tickets(tickets, [Ticket('Printer jam on floor 2', 'Paper stuck', '(555) 123-4567'),
+                             Ticket('VPN down', 'No connection from home', '555-987-6543'),
+                             Ticket('Toner low', 'Third floor', '555-222-3333')])
+    add_note(tickets, 2, 'Ordered a new printer cartridge')
+    # The title counts for more than a note.
+    assert search_ids(tickets, 'print') == [0, 2]
+    assert search_ids(tickets, 'print', fields=('notes',)) == [2]
+    assert search_ids(tickets, 'jam paper') == [0]
+    assert search_ids(tickets, 'jam paper', whole_phrase=True) == []
+    # However the number was typed in.
+    assert search_ids(tickets, '5551234567') == [0]
+    set_status(tickets, 0, "closed")
+    assert search_ids(tickets, 'print', statuses=("open", "pending")) == [2]
+
+
+def test_words_too_short_for_trigrams_still_match(stores):
+    tickets = stores.open('tickets.db')
+    import_tickets(tickets, [Ticket('Printer jam on floor 2', '', ''), Ticket('50% off toner', '', ''),
+                             Ticket('500 off toner', '', ''), Ticket('a_b test', '', '')])
+    assert search_ids(tickets, 'on') == [2, 1, 0]
+    assert search_ids(tickets, 'jam 2') == [0]
+    # % and _ are only themselves, not LIKE wildcards.
+    assert search_ids(tickets, '0%') == [1]
+    assert search_ids(tickets, '_') == [3]
+
+
+def test_another_copy_reads_back_only_what_changed(stores):
+    first = stores.open('tickets.db')
+    second = stores.open('tickets.db')
+    add_ticket(first, 'Printer jam')
+    add_ticket(first, 'VPN down')
+    assert {ticket.ticket_id for ticket in check_for_changes(second, wait=True)} == {0, 1}
+    kept = second.get(1)
+    assert check_for_changes(second, wait=True) == []
+    edit(first, 0, title='Printer fixed')
+    set_status(first, 1, "closed")
+    assert {ticket.ticket_id for ticket in check_for_changes(second, wait=True)} == {0, 1}
+    # A ticket second already had is changed in place.
+    assert kept.status == "closed" and second.get(1) is kept
+    assert second.get(0).title == 'Printer fixed'
+    assert second.count("closed") == 1 and second.count("open") == 1
@@ -0,0 +1,41 @@
+from ticketcore import check_for_changes
+
+from helpers import add_ticket, add_note, edit, set_status, saved_tickets
+
+
+def test_another_copy_sees_the_changes(stores):
+    first = stores.open()
+    second = stores.open()
+    ticket = add_ticket(first)
+    add_note(first, ticket.ticket_id, 'Called back')
+
+    changed = check_for_changes(second, wait=True)
+    assert {each.ticket_id for each in changed} == {ticket.ticket_id}
+    assert second.get(ticket.ticket_id).notes[-1].text == 'Called back'
+    assert check_for_changes(second, wait=True) == []
+
+
+def test_two_copies_never_hand_out_the_same_id(stores):
+    first = stores.open()
+    second = stores.open()
+    one = add_ticket(first, 'From the first copy')
+    two = add_ticket(second, 'From the second copy')
+    assert one.ticket_id != two.ticket_id
+    check_for_changes(first, wait=True)
+    assert saved_tickets(first) == saved_tickets(second)
+
+
+def test_changes_saved_into_the_ticket_file_are_merged(stores):
+    first = stores.open()
+    kept = add_ticket(first, 'Both copies have this one')
+    second = stores.open()
+    edit(first, kept.ticket_id, title='Changed by the first copy')
+    new = add_ticket(first, 'Only the first copy has this one')
+    set_status(first, new.ticket_id, "pending")
+    # Saved into the ticket file, so the second copy has to merge it instead of reading the journal.
+    first.storage.save_until_written(first)
+
+    check_for_changes(second, wait=True)
+    assert second.get(kept.ticket_id).title == 'Changed by the first copy'
+    assert second.get(new.ticket_id).status == "pending"
+    assert saved_tickets(second) == saved_tickets(first)
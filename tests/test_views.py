@@ -0,0 +1,84 @@
+import pytest
+
+from ticketcore import Ticket, batch_change, check_for_changes, import_tickets, render_ticket, ticket_key
+
+from helpers import add_note, add_ticket, edit, set_status
+
+
+def many_tickets(tickets, count=130):
+    # A day apart, every third one closed long ago so the JSON store can archive it.
+    statuses = ["open", "pending", "closed"]
+    import_tickets(tickets, [Ticket(f'Ticket {number}', '', '', f'01-{number % 28 + 1:02d}-{2010 + number // 28} 09:00:00',
+                                    status=statuses[number % 3], is_open=number % 3 != 2,
+                                    closed_date=f'01-{number % 28 + 1:02d}-{2010 + number // 28} 17:00:00' if number % 3 == 2 else None)
+                             for number in range(count)])
+
+
+def all_pages(tickets, statuses, count=50):
+    found = []
+    before = None
+    while True:
+        page = tickets.page(statuses, before, count)
+        found.extend(page)
+        if len(page) < count:
+            return found
+        before = ticket_key(page[-1])
+
+
+@pytest.mark.parametrize('name', ['tickets.json', 'tickets.db'])
+def test_paging_walks_every_ticket_once_newest_first(stores, name):
+    tickets = stores.open(name)
+    many_tickets(tickets)
+    if name.endswith('.json'):
+        assert tickets.storage.archive_old_tickets(tickets, days=30) == 43
+        tickets = stores.reopen(tickets)
+    every = [ticket.ticket_id for ticket in tickets.newest_first(archived=True)]
+    assert len(every) == 130
+    assert [ticket.ticket_id for ticket in all_pages(tickets, None)] == every
+    assert [ticket.ticket_id for ticket in all_pages(tickets, ("closed",), 7)] == \
+           [ticket.ticket_id for ticket in tickets.newest_first("closed", archived=True)]
+    open_pending = all_pages(tickets, ("open", "pending"), 10)
+    assert len(open_pending) == 87
+    assert all(ticket_key(newer) > ticket_key(older) for newer, older in zip(open_pending, open_pending[1:]))
+
+
+def test_a_ticket_is_rendered_again_only_after_it_changes(stores):
+    tickets = stores.open()
+    many_tickets(tickets, 3)
+    first, second = tickets.get(0), tickets.get(1)
+    text = render_ticket(first)
+    assert render_ticket(first) is text
+    other = render_ticket(second)
+    edit(tickets, 0, title='Printer on fire')
+    assert 'Printer on fire' in render_ticket(first)
+    assert render_ticket(second) is other
+
+
+@pytest.mark.parametrize('name', ['tickets.json', 'tickets.db'])
+def test_listeners_hear_about_every_changed_ticket(stores, name):
+    tickets = stores.open(name)
+    many_tickets(tickets, 6)
+    heard = []
+    tickets.listeners.append(lambda ticket: heard.append((ticket.ticket_id, ticket.status)))
+    set_status(tickets, 0, "closed")
+    add_note(tickets, 1, 'Called back')
+    edit(tickets, 3, title='Printer on fire')
+    batch_change(tickets, [3, 5], 'pending')
+    assert heard == [(0, "closed"), (1, "pending"), (3, "open"), (3, "pending"), (5, "pending")]
+    # And about the ones another program changed, when they're read in.
+    other = stores.open(name)
+    edit(other, 2, title='Changed elsewhere')
+    check_for_changes(tickets, wait=True)
+    assert heard[-1] == (2, "closed")
+
+
+def test_the_next_page_is_right_after_tickets_changed_in_between(stores):
+    tickets = stores.open()
+    many_tickets(tickets, 60)
+    first_page = tickets.page(("open",), None, 10)
+    older = tickets.page(("open",), ticket_key(first_page[-1]), 10)
+    # One ticket further down is closed and a new one comes in on top before the next page is asked for.
+    set_status(tickets, older[0].ticket_id, "closed")
+    add_ticket(tickets, 'Newest')
+    next_page = tickets.page(("open",), ticket_key(first_page[-1]), 10)
+    assert [ticket.ticket_id for ticket in next_page] == [ticket.ticket_id for ticket in older[1:]]
@@ -0,0 +1,37 @@
+import json
+import threading
+
+from ticketcore import IOWorker
+
+from helpers import add_ticket
+
+
+def test_saves_waiting_their_turn_are_written_once(stores):
+    tickets = stores.open()
+    add_ticket(tickets)
+    worker = IOWorker()
+    busy = threading.Event()
+    worker.submit(busy.wait)
+    written = []
+    save_snapshot = tickets.storage.save_snapshot
+    tickets.storage.save_snapshot = lambda snapshot, saved_ids=(): written.append(len(snapshot['tickets'])) or save_snapshot(snapshot, saved_ids)
+    for number in range(3):
+        add_ticket(tickets, f'Ticket {number}')
+        worker.save(tickets)
+    busy.set()
+    worker.stop()
+    # Only the newest snapshot got written.
+    assert written == [4]
+    with open(tickets.storage.path) as file:
+        assert len(json.load(file)['tickets']) == 4
+    messages = [message for message, done, result in worker.finished() if message]
+    assert messages == ['Saving tickets...', 'Tickets saved']
+
+
+def test_a_job_that_fails_is_reported_and_the_next_one_still_runs():
+    worker = IOWorker()
+    worker.submit(lambda: 1 / 0, busy='Reading the log')
+    worker.submit(lambda: 42, done=lambda result: None, finished='Done')
+    worker.stop()
+    results = [(message, result) for message, done, result in worker.finished()]
+    assert results == [('Reading the log...', None), ('Reading the log failed: division by zero', None), ('Done', 42)]
@@ -0,0 +1,42 @@
+from ticketcore import WorkspaceCache
+
+from helpers import add_ticket, saved_tickets
+
+
+def open_workspaces(stores, cache, count, in_use=()):
+    '''Opens count more workspaces into cache, taking the ones it closes off the test's list.'''
+    for number in range(count):
+        tickets = stores.open(f'workspace{number}.json')
+        add_ticket(tickets, f'Ticket in workspace {number}')
+        for key in cache.add(stores.path(f'workspace{number}.json'), tickets, in_use):
+            stores.opened.remove(next(store for store in stores.opened if store.storage.path == key))
+
+
+def test_a_workspace_in_use_is_never_closed_to_make_room(stores):
+    cache = WorkspaceCache(budget_mb=0)
+    first = stores.open('first.json')
+    shown = []
+    first.listeners.append(shown.append)
+    cache.add(stores.path('first.json'), first)
+    open_workspaces(stores, cache, 3, in_use=[first])
+    # Everything but the first and the newest was closed.
+    assert [path for path, store in cache] == [stores.path('first.json'), stores.path('workspace2.json')]
+    assert cache.get(stores.path('first.json')) is first
+    ticket = add_ticket(first, 'Still works')
+    assert shown == [ticket]
+    expected = saved_tickets(first)
+    assert saved_tickets(stores.reopen(first, 'first.json')) == expected
+
+
+def test_a_closed_workspace_lets_go_of_its_listeners(stores):
+    cache = WorkspaceCache(budget_mb=0)
+    first = stores.open('first.json')
+    add_ticket(first, 'Saved before closing')
+    first.listeners.append(lambda ticket: None)
+    cache.add(stores.path('first.json'), first)
+    open_workspaces(stores, cache, 3)
+    assert first.listeners == []
+    # Touching it again means loading it again, with everything it had.
+    assert cache.get(stores.path('first.json')) is None
+    expected = saved_tickets(first)
+    assert saved_tickets(stores.open('first.json')) == expected
@@ -0,0 +1,253 @@
+# Archive for old closed tickets, used by the JSON storage (see ARCHIVE_AFTER_DAYS in ticketcore.py).
+# Tickets closed long ago move out of tickets.json into the archive folder, so saving, views and
+# searches stop paying for them. There is one segment per month the tickets were created in:
+#   archive/2023-04.jsonl.gz   the tickets, one JSON line each, newest first, gzipped
+#   archive/2023-04.json       the manifest: how many, the newest and oldest, their IDs, their callers and a search filter
+# Only the manifests are read at start. A segment is unzipped when a closed view scrolls into its
+# month, or when its filter says a search might find something in it.
+
+
+import base64
+import gzip
+import json
+import logging
+import os
+import zlib
+from collections import OrderedDict
+
+from ticketcore import (TicketStore, SearchIndex, atomic_write, caller_key, parse_date, phone_digits, ticket_from_dict,
+                        ticket_key, trigrams)
+
+
+# Segments kept unzipped in memory, so scrolling through a month doesn't unzip it again for every page.
+CACHED_SEGMENTS = 4
+
+# Size of the search filter. More bits per trigram means fewer segments opened for nothing.
+FILTER_BITS_PER_GRAM = 10
+
+
+def filter_positions(gram, size):
+    # crc32 is the same on every run and every computer, Python's hash() isn't.
+    data = gram.encode('utf-8')
+    return [zlib.crc32(data, seed) % size for seed in (1, 2, 3)]
+
+
+def make_filter(grams):
+    '''A bloom filter of the trigrams in a segment. It can say "maybe" for a trigram that isn't there,
+    but never "no" for one that is, so a segment it rules out really has nothing to find.'''
+    size = max(64, len(grams) * FILTER_BITS_PER_GRAM)
+    size += -size % 8
+    bits = bytearray(size // 8)
+    for gram in grams:
+        for position in filter_positions(gram, size):
+            bits[position // 8] |= 1 << (position % 8)
+    return size, base64.b64encode(bytes(bits)).decode('ascii')
+
+
+def segment_callers(tickets_data):
+    callers = {}
+    for data in tickets_data:
+        key = caller_key(data['phone_number'])
+        if key:
+            callers.setdefault(key, []).append(data['id'])
+    return callers
+
+
+class ArchiveSegment:
+    '''One month of archived tickets. The manifest is always in memory, the tickets only when asked for.'''
+
+    def __init__(self, folder, month, manifest):
+        self.folder = folder
+        self.month = month
+        self.manifest = manifest
+        self.ids = set(manifest['ids'])
+        self.oldest = (parse_date(manifest['oldest'][0]), manifest['oldest'][1])
+        self.bits = base64.b64decode(manifest['filter'])
+        self.filter_size = manifest['filter_size']
+
+    @property
+    def path(self):
+        return os.path.join(self.folder, self.month + '.jsonl.gz')
+
+    def read(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def callers(self):
+        '''{caller_key: [ticket IDs]} for the segment. Segments written before the manifest had them are read for it.'''
+        callers = self.manifest.get('callers')
+        if callers is None:
+            callers = self.manifest['callers'] = segment_callers(self.read())
+        return callers
+
+    def might_have(self, gram):
+        return all(self.bits[position // 8] & (1 << (position % 8)) for position in filter_positions(gram, self.filter_size))
+
+    def might_match(self, words, fields):
+        '''False only if some word of a search can't be in this segment.'''
+        for word in words:
+            grams = trigrams(word)
+            if not grams or all(self.might_have(gram) for gram in grams):
+                continue
+            digit_grams = trigrams(phone_digits(word))
+            if 'phone_number' in fields and digit_grams and all(self.might_have(gram) for gram in digit_grams):
+                continue
+            return False
+        return True
+
+
+class TicketArchive:
+    '''Every archive segment in a folder, newest month first.'''
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.segments = []
+        self.cache = OrderedDict()
+        if os.path.isdir(folder):
+            for name in sorted(os.listdir(folder), reverse=True):
+                if name.endswith('.json'):
+                    with open(os.path.join(folder, name), 'r') as file:
+                        self.segments.append(ArchiveSegment(folder, name[:-5], json.load(file)))
+
+    def __len__(self):
+        return sum(segment.manifest['count'] for segment in self.segments)
+
+    def copy(self):
+        '''Every segment file as it is now, still zipped, for copied_tickets to read later even if the archive
+        has changed by then. Reading them is quick, they're small next to the tickets in them.'''
+        copied = []
+        for segment in self.segments:
+            with open(segment.path, 'rb') as file:
+                copied.append(file.read())
+        return copied
+
+    def tickets(self, segment):
+        '''The segment's tickets, newest first, as a small store of their own so they can be searched.'''
+        store = self.cache.pop(segment.month, None)
+        if store is None:
+            store = TicketStore()
+            store.add_loaded(ticket_from_dict(data) for data in segment.read())
+        self.cache[segment.month] = store
+        while len(self.cache) > CACHED_SEGMENTS:
+            self.cache.popitem(last=False)
+        return store
+
+    def newest_first(self, skip=()):
+        '''Every archived ticket, newest first. Tickets whose ID is in skip (the ones in the store) are left out.'''
+        for segment in self.segments:
+            for ticket in self.tickets(segment).newest_first():
+                if ticket.ticket_id not in skip:
+                    yield ticket
+
+    def page(self, before, count, skip=()):
+        '''Up to count archived tickets older than the key before, newest first. Months that are all newer get skipped unopened.'''
+        found = []
+        for segment in self.segments:
+            if before is not None and segment.oldest >= before:
+                continue
+            for ticket in self.tickets(segment).newest_first():
+                if (before is not None and ticket_key(ticket) >= before) or ticket.ticket_id in skip:
+                    continue
+                found.append(ticket)
+                if len(found) == count:
+                    return found
+        return found
+
+    def ranked(self, query, fields=None, whole_phrase=False, skip=()):
+        '''Search results like SearchIndex.ranked, from only the segments that might have them.'''
+        fields = fields or tuple(SearchIndex.WEIGHTS)
+        query = query.lower().strip()
+        words = [query] if whole_phrase else query.split()
+        results = []
+        for segment in self.segments:
+            if not segment.might_match(words, fields):
+                continue
+            store = self.tickets(segment)
+            if store.search_index is None:
+                store.build_search_index()
+            results.extend(result for result in store.search_index.ranked(query, fields, ("closed",), whole_phrase)
+                           if result[2] not in skip)
+        return results
+
+    def callers(self):
+        '''(caller_key, [ticket IDs]) for every caller in every segment, from the manifests.'''
+        for segment in self.segments:
+            yield from segment.callers().items()
+
+    def has(self, ticket_id):
+        # From the manifests, no segment is read.
+        return any(ticket_id in segment.ids for segment in self.segments)
+
+    def find(self, ticket_id):
+        for segment in self.segments:
+            if ticket_id in segment.ids:
+                return self.tickets(segment).get(ticket_id)
+        return None
+
+    def add(self, tickets_data):
+        '''Puts tickets (as dicts) into the segments for the months they were created in.'''
+        months = {}
+        for data in tickets_data:
+            created_at = parse_date(data['creation_date'])
+            months.setdefault(f'{created_at.year:04d}-{created_at.month:02d}', []).append(data)
+        os.makedirs(self.folder, exist_ok=True)
+        for month, new_data in months.items():
+            segment = self.segment(month)
+            old_data = segment.read() if segment else []
+            # A ticket that was archived before (a crash before the ticket file was saved) is replaced, not doubled.
+            new_ids = {data['id'] for data in new_data}
+            self.write_segment(month, [data for data in old_data if data['id'] not in new_ids] + new_data)
+
+    def remove(self, ticket_id):
+        for segment in self.segments:
+            if ticket_id in segment.ids:
+                self.write_segment(segment.month, [data for data in segment.read() if data['id'] != ticket_id])
+                return
+
+    def segment(self, month):
+        for segment in self.segments:
+            if segment.month == month:
+                return segment
+        return None
+
+    def write_segment(self, month, tickets_data):
+        self.cache.pop(month, None)
+        self.segments = [segment for segment in self.segments if segment.month != month]
+        path = os.path.join(self.folder, month + '.jsonl.gz')
+        manifest_path = os.path.join(self.folder, month + '.json')
+        if not tickets_data:
+            os.remove(manifest_path)
+            os.remove(path)
+            return
+        store = TicketStore()
+        store.add_loaded(ticket_from_dict(data) for data in tickets_data)
+        ordered = list(store.newest_first())
+        store.build_search_index()
+        filter_size, bits = make_filter(store.search_index.postings)
+        manifest = {
+            'count': len(ordered),
+            'newest': [ordered[0].creation_date, ordered[0].ticket_id],
+            'oldest': [ordered[-1].creation_date, ordered[-1].ticket_id],
+            'ids': sorted(store.by_id),
+            'callers': segment_callers(tickets_data),
+            'filter_size': filter_size,
+            'filter': bits,
+        }
+        by_id = {data['id']: data for data in tickets_data}
+        lines = ''.join(json.dumps(by_id[ticket.ticket_id]) + '\n' for ticket in ordered).encode('utf-8')
+        # The segment goes first. A manifest always describes a segment that is already on disk.
+        atomic_write(path, lambda file: file.write(gzip.compress(lines)), 'wb')
+        atomic_write(manifest_path, lambda file: json.dump(manifest, file))
+        self.segments.append(ArchiveSegment(self.folder, month, manifest))
+        self.segments.sort(key=lambda segment: segment.month, reverse=True)
+        logging.info(f"Archive segment {month} written ({len(ordered)} tickets)")
+
+
+def copied_tickets(copied, skip=()):
+    '''The tickets in a TicketArchive.copy, newest first, leaving out the ones whose ID is in skip.'''
+    for data in copied:
+        # Segments are written newest first, the same order newest_first gives.
+        for line in gzip.decompress(data).decode('utf-8').splitlines():
+            ticket = ticket_from_dict(json.loads(line))
+            if ticket.ticket_id not in skip:
+                yield ticket
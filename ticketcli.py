@@ -0,0 +1,270 @@
+# Ticket System from the command line.
+# Uses the same tickets.json as the window but never loads Tk, so it starts fast
+# and works over SSH, in cron jobs and in scripts.
+#
+#   ticketsystem new "Printer jam" -d "Floor 2 printer keeps jamming" -p 555-123-4567
+#   ticketsystem note 12 "Called back, waiting on parts"
+#   ticketsystem close 12
+#   ticketsystem close 40-52,60                  (a batch, saved as one change)
+#   ticketsystem list --status all
+#   ticketsystem search printer
+#   ticketsystem caller "(555) 123-4567"          (every ticket from that number, however it was typed)
+#   ticketsystem export --format csv -o tickets.csv
+#   ticketsystem import old_system.csv            (or .jsonl, one ticket per line)
+#   ticketsystem report --days 30
+#   ticketsystem archive --days 365
+#   ticketsystem --file lab.json list        (another workspace instead of tickets.json)
+#
+# python ticketcli.py works the same way.
+
+
+import argparse
+import sys
+
+from ticketcore import (STATUSES, ARCHIVE_AFTER_DAYS, EXPORT_FORMATS, IMPORT_FORMATS, Ticket, setup_logging, load_tickets,
+                        record_change, changing, finish_saving, ticket_to_dict, render_ticket, log_action, format_of,
+                        export_tickets, read_import, import_tickets, parse_ticket_ids, batch_change, report_text)
+
+
+def cmd_new(tickets, args):
+    with changing(tickets):
+        ticket = tickets.add(Ticket(args.title, args.description, args.phone))
+        log_action('add', f"Ticket Added {args.title}", ticket.ticket_id)
+        record_change(tickets, {'op': 'add', 'ticket': ticket_to_dict(ticket)})
+    print(f'Created ticket {ticket.ticket_id}')
+
+
+def change_many(tickets, args, action, text=None):
+    try:
+        ticket_ids = parse_ticket_ids(args.ids)
+        changed = batch_change(tickets, ticket_ids, action, text)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+    # One ID works like it always did, quietly.
+    if len(ticket_ids) > 1:
+        print(f'Changed {len(changed)} tickets')
+
+
+def cmd_note(tickets, args):
+    return change_many(tickets, args, 'note', args.text)
+
+
+def cmd_close(tickets, args):
+    return change_many(tickets, args, 'close')
+
+
+def cmd_pending(tickets, args):
+    return change_many(tickets, args, 'pending')
+
+
+def cmd_reopen(tickets, args):
+    return change_many(tickets, args, 'reopen')
+
+
+def cmd_edit(tickets, args):
+    return change_many(tickets, args, args.field, args.value)
+
+
+def wanted_statuses(status):
+    if status == 'all':
+        return STATUSES
+    if status == 'active':
+        return ("open", "pending")
+    return (status,)
+
+
+def cmd_list(tickets, args):
+    shown = 0
+    for ticket in tickets.newest_first(*wanted_statuses(args.status), archived=True):
+        if args.limit and shown >= args.limit:
+            break
+        sys.stdout.write(render_ticket(ticket))
+        shown += 1
+
+
+def cmd_search(tickets, args):
+    fields = tuple(args.field) if args.field else None
+    results = tickets.search(args.query, fields=fields, statuses=wanted_statuses(args.status))
+    if not results:
+        print('No matching tickets found')
+    for ticket in results[:args.limit or None]:
+        sys.stdout.write(render_ticket(ticket))
+
+
+def cmd_caller(tickets, args):
+    history = tickets.caller_history(args.phone, wanted_statuses(args.status))
+    if not history:
+        print('No tickets from that number')
+    for ticket in history[:args.limit or None]:
+        sys.stdout.write(render_ticket(ticket))
+
+
+def cmd_export(tickets, args):
+    # Without --format the file name decides, tickets.csv is CSV. To the screen it's JSON.
+    file_format = args.format or (format_of(args.output, 'json') if args.output else 'json')
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        count = export_tickets(tickets, output, file_format, wanted_statuses(args.status))
+    finally:
+        if args.output:
+            output.close()
+    if args.output:
+        print(f'Exported {count} tickets to {args.output}')
+
+
+def cmd_import(tickets, args):
+    file_format = args.format or format_of(args.path)
+    if file_format not in IMPORT_FORMATS:
+        print(f"Can't import {file_format}, use CSV or JSON Lines (export --format jsonl writes it)", file=sys.stderr)
+        return 1
+    new_tickets, problems = read_import(args.path, file_format)
+    if problems:
+        print(f'Nothing imported, {args.path} has problems:', file=sys.stderr)
+        for problem in problems:
+            print(f'  {problem}', file=sys.stderr)
+        return 1
+    if args.dry_run:
+        print(f'{len(new_tickets)} tickets would be imported')
+        return
+    added = import_tickets(tickets, new_tickets)
+    if added:
+        print(f'Imported {len(added)} tickets, IDs {added[0].ticket_id} to {added[-1].ticket_id}')
+    else:
+        print('No tickets in the file')
+
+
+def cmd_report(tickets, args):
+    worked_out = getattr(tickets, 'reports', False) is None
+    sys.stdout.write(report_text(tickets, args.days))
+    if worked_out:
+        # Saved next to the ticket file, so the next report doesn't have to go through every ticket again.
+        # Only the reports, nothing about the tickets changed.
+        tickets.storage.save_reports(tickets)
+
+
+def cmd_archive(tickets, args):
+    if not hasattr(tickets.storage, 'archive_old_tickets'):
+        print('Archiving is only for the JSON ticket file, the database keeps old tickets out of the way by itself',
+              file=sys.stderr)
+        return 1
+    moved = tickets.storage.archive_old_tickets(tickets, args.days)
+    print(f'Archived {moved} tickets closed more than {args.days} days ago')
+
+
+def cmd_serve(tickets, args):
+    # Only loaded when it's used, the other commands don't need a web server.
+    import threading
+    from ticketserver import StoreWriter, start_server
+    writer = StoreWriter(tickets)
+    try:
+        server = start_server(writer, args.host, args.port, args.threads)
+    except OSError as error:
+        print(f"Couldn't start the API server: {error}", file=sys.stderr)
+        return 1
+    print(f'Serving the ticket API on http://{args.host}:{server.server_port}, Ctrl+C to stop')
+    try:
+        # Every change runs here on the main thread, which owns the store.
+        writer.run_forever(threading.Event())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='ticketsystem', description='Ticket System without the window.')
+    parser.add_argument('--file', help='workspace (ticket file) to use, .db for SQLite (default: tickets.json)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    new = commands.add_parser('new', help='create a ticket')
+    new.add_argument('title')
+    new.add_argument('-d', '--description', required=True)
+    new.add_argument('-p', '--phone', default='')
+    new.set_defaults(run=cmd_new)
+
+    # Every command that changes tickets takes one ID or a batch, "12", "12,15" or "10-20" (quote it if it has spaces).
+    # A batch is saved as one change.
+    ids_help = 'ticket ID, or IDs like 10-20,25'
+
+    note = commands.add_parser('note', help='add a note to tickets')
+    note.add_argument('ids', help=ids_help)
+    note.add_argument('text')
+    note.set_defaults(run=cmd_note)
+
+    for name, run, help_text in [('close', cmd_close, 'close tickets'),
+                                 ('pending', cmd_pending, 'set tickets to pending'),
+                                 ('reopen', cmd_reopen, 'reopen closed or pending tickets')]:
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('ids', help=ids_help)
+        command.set_defaults(run=run)
+
+    edit = commands.add_parser('edit', help="change tickets' title, description or phone number")
+    edit.add_argument('ids', help=ids_help)
+    edit.add_argument('field', choices=['title', 'description', 'phone_number'])
+    edit.add_argument('value')
+    edit.set_defaults(run=cmd_edit)
+
+    status_choices = ['active', 'all'] + list(STATUSES)
+
+    list_command = commands.add_parser('list', help='show tickets, newest first')
+    list_command.add_argument('-s', '--status', choices=status_choices, default='active',
+                              help='which tickets to show (default: open and pending)')
+    list_command.add_argument('-n', '--limit', type=int, default=0)
+    list_command.set_defaults(run=cmd_list)
+
+    search = commands.add_parser('search', help='search titles, descriptions, phone numbers and notes')
+    search.add_argument('query')
+    search.add_argument('-s', '--status', choices=status_choices, default='all')
+    search.add_argument('-f', '--field', action='append', choices=['title', 'description', 'phone_number', 'notes'],
+                        help='only search this field, can be given more than once')
+    search.add_argument('-n', '--limit', type=int, default=0)
+    search.set_defaults(run=cmd_search)
+
+    caller = commands.add_parser('caller', help="every ticket from a phone number, newest first")
+    caller.add_argument('phone')
+    caller.add_argument('-s', '--status', choices=status_choices, default='all')
+    caller.add_argument('-n', '--limit', type=int, default=0)
+    caller.set_defaults(run=cmd_caller)
+
+    export = commands.add_parser('export', help='write tickets out as JSON, JSON Lines or CSV')
+    export.add_argument('--format', choices=EXPORT_FORMATS, help='default: from the file name, JSON on the screen')
+    export.add_argument('-o', '--output', help='file to write (default: the screen)')
+    export.add_argument('-s', '--status', choices=status_choices, default='all')
+    export.set_defaults(run=cmd_export)
+
+    import_command = commands.add_parser('import', help='add every ticket in a CSV or JSON Lines file, all in one go')
+    import_command.add_argument('path')
+    import_command.add_argument('--format', choices=IMPORT_FORMATS, help='default: from the file name')
+    import_command.add_argument('--dry-run', action='store_true', help='only check the file')
+    import_command.set_defaults(run=cmd_import)
+
+    report = commands.add_parser('report', help='tickets opened and closed per day, time to close and pending ages')
+    report.add_argument('--days', type=int, default=14)
+    report.set_defaults(run=cmd_report)
+
+    archive = commands.add_parser('archive', help='move old closed tickets out of the ticket file into the archive')
+    archive.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS or 180,
+                         help='archive tickets closed more than this many days ago')
+    archive.set_defaults(run=cmd_archive)
+
+    serve = commands.add_parser('serve', help='answer HTTP/JSON requests for tickets on this computer')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--threads', type=int, default=8, help='requests handled at once')
+    serve.set_defaults(run=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logging()
+    tickets = load_tickets(search_index=False, path=args.file)
+    result = args.run(tickets, args)
+    finish_saving(tickets)
+    return result or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2495 @@
+# Ticket System core.
+# Everything that isn't the window lives here: the Ticket class, the store, searching and saving.
+# Nothing in this file needs Tk, so it can be used from the command line (ticketcli.py),
+# from scripts, or on a server without a screen.
+
+
+import csv
+import json
+import os
+import re
+import sys
+import contextlib
+import math
+import time
+from datetime import datetime, timedelta
+import logging
+import logging.handlers
+import atexit
+import threading
+import bisect
+from array import array
+import heapq
+import itertools
+import queue
+from collections import OrderedDict
+
+# For locking the ticket file against other copies of the program.
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# File to store tickets. This is the workspace that opens first, others can be opened from the
+# File menu (or with --file on the command line), so you can keep separate lists depending on what your doing.
+# We could even set it up to keep opening/pending/closed tickets on different lists in the future if needed. 
+TICKET_FILE = 'tickets.json'
+
+# Workspaces stay loaded after you switch away from them, so switching back is instant.
+# Once they add up to more than this (a rough guess, in megabytes) the one used longest ago is closed.
+WORKSPACE_CACHE_MB = 256
+
+# Where the action log goes. Once it gets to LOG_MAX_BYTES it's turned over into Tickets.log.1 (the one before
+# that becomes .2 and so on), keeping LOG_BACKUPS of them. LOG_ROTATE_WHEN = 'midnight' turns it over every day
+# instead, see TimedRotatingFileHandler in the Python docs for the other choices.
+LOG_FILE = 'Tickets.log'
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 5
+LOG_ROTATE_WHEN = None
+
+# How dates are written in the ticket file and on screen.
+DATE_FORMAT = '%m-%d-%Y %H:%M:%S'
+
+# Where tickets are kept. 'json' is TICKET_FILE with every ticket in memory.
+# 'sqlite' is SQLITE_FILE, where tickets stay in the database until a view or search needs them,
+# so a big archive opens as fast as a small one. The first SQLite start copies TICKET_FILE over.
+STORAGE = 'json'
+SQLITE_FILE = 'tickets.db'
+
+# Closed tickets move out of the ticket file into ARCHIVE_DIR (next to it) once they've been closed
+# this many days. It happens when the window closes, or with "ticketsystem archive". 0 turns it off.
+# Archived tickets still show up in closed views and searches (see ticketarchive.py).
+ARCHIVE_AFTER_DAYS = 180
+ARCHIVE_DIR = 'archive'
+
+# Journal mode. Every change is appended as one small line to a .journal file next to the
+# ticket file (tickets.journal) instead of rewriting the whole ticket file. Once enough lines
+# pile up the journal is folded back into the ticket file (the snapshot) in the background.
+USE_JOURNAL = True
+JOURNAL_COMPACT_EVERY = 500
+
+# How often (in seconds) changes get pushed all the way to the disk with fsync.
+# A burst of edits inside this window shares one flush. 0 flushes on every change.
+FLUSH_INTERVAL = 2.0
+
+# Loads, saves, searches and redraws are timed for the Performance window (next to View Log).
+# It costs a few microseconds each time. False turns it off, it can be switched in the window too.
+TIMING = True
+
+# A batch of new tickets (an import) smaller than this is put in its place one ticket at a time, a bigger one
+# is added to the end and the lists are sorted once. Either way costs about the same at around 200 tickets.
+ADD_ONE_BY_ONE = 200
+
+# Every ticket is in exactly one of these.
+STATUSES = ("open", "pending", "closed")
+
+# The same string objects are used for every ticket's status, instead of a copy per ticket from the file.
+STATUS_NAMES = {status: status for status in STATUSES}
+
+# Times are kept as whole seconds since 1970 on the wall clock, without a time zone. An int takes a
+# lot less room than a date string, and it turns back into exactly the same string, even around DST changes.
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_seconds(moment):
+    return (moment - EPOCH) // timedelta(seconds=1)
+
+
+def seconds_to_date(seconds):
+    return (EPOCH + timedelta(seconds=seconds)).strftime(DATE_FORMAT)
+
+
+###### TIMING ######
+
+class Histogram:
+    '''How long one operation took, every time it ran. Times go in buckets instead of being kept,
+    each bucket about 9% wider than the last, so it stays small and the percentiles come out close enough.'''
+
+    BUCKETS_PER_DOUBLING = 8
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @classmethod
+    def bucket(cls, seconds):
+        return math.ceil(math.log2(max(seconds, 1e-7)) * cls.BUCKETS_PER_DOUBLING)
+
+    def add(self, seconds):
+        bucket = self.bucket(seconds)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def remove(self, seconds):
+        '''Takes back one add. max stays where it was, it's only a cap on the percentiles.'''
+        bucket = self.bucket(seconds)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) - 1
+        if not self.buckets[bucket]:
+            del self.buckets[bucket]
+        self.count -= 1
+        self.total -= seconds
+
+    def percentile(self, fraction):
+        '''The time fraction (0.5 for p50) of the runs were quicker than. The top of its bucket, never above max.'''
+        wanted = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= wanted:
+                return min(2 ** (bucket / self.BUCKETS_PER_DOUBLING), self.max)
+        return self.max
+
+
+class Timings:
+    '''A Histogram per operation, filled in by timed(). Anything can read them, the Performance window does.
+    Can also run the next timed operation on one thread under cProfile, to see where its time goes.'''
+
+    def __init__(self, enabled=TIMING):
+        self.enabled = enabled
+        self.histograms = {}
+        # The background worker times its loads and saves while the window times everything else.
+        self.lock = threading.Lock()
+        self.profile_thread = None
+        # (operation, report) for the last profiled operation.
+        self.last_profile = None
+
+    def add(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def summary(self):
+        '''(name, count, p50, p95, max, total) for every operation, slowest total first.'''
+        with self.lock:
+            rows = [(name, histogram.count, histogram.percentile(0.5), histogram.percentile(0.95), histogram.max, histogram.total)
+                    for name, histogram in self.histograms.items()]
+        return sorted(rows, key=lambda row: row[5], reverse=True)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+
+    def profile_next(self):
+        '''Profiles the next operation timed on this thread.'''
+        self.profile_thread = threading.get_ident()
+
+    def start_profile(self):
+        if self.profile_thread != threading.get_ident():
+            return None
+        # Only loaded when it's used.
+        import cProfile
+        self.profile_thread = None
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish_profile(self, name, profile):
+        profile.disable()
+        import io
+        import pstats
+        report = io.StringIO()
+        pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(30)
+        self.last_profile = (name, report.getvalue())
+
+
+timings = Timings()
+
+
+@contextlib.contextmanager
+def timed(name, profile=True):
+    '''Times whatever runs inside "with timed('name'):" into timings. Works on a def as @timed('name') too.
+    profile=False for things that run by themselves, so they don't get profiled instead of what you clicked.'''
+    if not timings.enabled:
+        yield
+        return
+    capture = timings.start_profile() if profile and timings.profile_thread is not None else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+        if capture is not None:
+            timings.finish_profile(name, capture)
+
+
+class Note:
+    '''One note on a ticket. In the file it's still {'note': ..., 'timestamp': ...}, see note_to_dict.'''
+
+    __slots__ = ('text', 'time')
+
+    def __init__(self, text, time=None):
+        self.text = text
+        self.time = time if time is not None else to_seconds(datetime.now())
+
+    @property
+    def timestamp(self):
+        return seconds_to_date(self.time)
+
+
+class Ticket:
+    # No __dict__ for every ticket, which is most of what a big store costs. __weakref__ is for the SQLite store,
+    # which only keeps the tickets something else still holds.
+    __slots__ = ('ticket_id', 'title', 'description', 'phone_number', 'notes', 'status', 'closed_at', 'created_at',
+                 'rendered', '__weakref__')
+
+    def __init__(self, title, description, phone_number, creation_date=None, notes=None, is_open=True, status="open", ticket_id=None,
+                 closed_date=None):
+        self.ticket_id = ticket_id
+        self.title = title
+        self.description = description
+        self.phone_number = phone_number
+        self.notes = notes if notes is not None else []
+        # Files used to keep is_open and status apart and they could disagree (a reopened ticket
+        # stayed "closed"). is_open decides open or closed, status only tells open from pending.
+        if not is_open:
+            status = "closed"
+        elif status != "pending":
+            status = "open"
+        self.status = STATUS_NAMES[status]
+        # When it was closed. Tickets closed before this was kept have none.
+        self.closed_date = closed_date if status == "closed" else None
+        # Parse the date once here, so sorting never has to parse strings again.
+        # The string is made from it again when it's needed.
+        if creation_date:
+            self.created_at = parse_date(creation_date)
+        else:
+            self.created_at = datetime.now().replace(microsecond=0)
+        # The text the display shows for this ticket, made the first time it's needed.
+        self.rendered = None
+    
+    @property
+    def is_open(self):
+        return self.status != "closed"
+
+    @property
+    def creation_date(self):
+        return self.created_at.strftime(DATE_FORMAT)
+
+    @property
+    def closed_date(self):
+        return None if self.closed_at is None else seconds_to_date(self.closed_at)
+
+    @closed_date.setter
+    def closed_date(self, text):
+        self.closed_at = None if text is None else to_seconds(parse_date(text))
+
+    def set_status(self, new_status, closed_date=None):
+        # closed_date is for a close that happened earlier (a change read back from the journal), otherwise it's now.
+        if new_status == "closed" and self.status != "closed":
+            self.closed_at = to_seconds(datetime.now() if closed_date is None else parse_date(closed_date))
+        elif new_status != "closed":
+            self.closed_at = None
+        self.status = STATUS_NAMES[new_status]
+
+    def add_note(self, note):
+        note_entry = Note(note)
+        self.notes.append(note_entry)
+        return note_entry
+
+    def close(self):
+        self.set_status("closed")
+
+    def search_fields(self):
+        '''Title, description, phone number and the text of every note.'''
+        return self.title, self.description, self.phone_number, [note.text for note in self.notes]
+
+    def phone_field(self):
+        return self.phone_number
+
+    def saved_line(self):
+        '''The ticket's line from the ticket file if it can be written back out unchanged, otherwise None.'''
+        return None
+
+    def __str__(self):
+        notes_str = ''.join('Note ({}): {}\n        '.format(note.timestamp, note.text) for note in self.notes)
+        status = "Open" if self.is_open else "Closed"
+        
+        # Display the title on the first line and the rest of the information on the next lines
+        return f'[{status}] {self.creation_date}\n Name: {self.title}\n Contact: {self.phone_number}\n Description: {self.description}\n {notes_str}\n'
+
+
+class LazyTicket(Ticket):
+    '''A closed ticket straight from the ticket file. Only its ID, status and date are read at load,
+    the rest of its line is parsed the first time something looks at the title, description, phone number or notes.
+    Until then saving writes the line back out as it was.'''
+
+    __slots__ = ('line',)
+
+    LAZY_FIELDS = ('title', 'description', 'phone_number', 'notes', 'closed_at')
+
+    # Inside a string in the line every quote is escaped, so the first time this turns up it's the real key.
+    PHONE_KEY = '"phone_number": '
+    decoder = json.JSONDecoder()
+
+    def __init__(self, ticket_id, status, creation_date, line):
+        self.ticket_id = ticket_id
+        self.status = status
+        self.created_at = parse_date(creation_date)
+        self.rendered = None
+        self.line = line
+
+    def __getattr__(self, name):
+        # Only called for attributes that aren't set, which here means the ones still in the line
+        # (closed_date comes here too, when the closed_at it reads isn't set).
+        if name != 'line' and self.line is not None:
+            self.load()
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def is_set(self, field):
+        # Asking the slot itself, a plain getattr would load the line.
+        try:
+            getattr(Ticket, field).__get__(self, Ticket)
+        except AttributeError:
+            return False
+        return True
+
+    def load(self):
+        data = json.loads(self.line)
+        loaded = {
+            'title': data['title'],
+            'description': data['description'],
+            'phone_number': data['phone_number'],
+            'notes': [note_from_dict(note) for note in data.get('notes', [])],
+            'closed_at': None if data.get('closed_date') is None else to_seconds(parse_date(data['closed_date'])),
+        }
+        # A field that was set before loading (an edit) keeps its new value.
+        # Fields first and line last, so another thread never sees a ticket with neither.
+        for field in self.LAZY_FIELDS:
+            if not self.is_set(field):
+                setattr(self, field, loaded[field])
+        self.line = None
+
+    def edited(self):
+        return any(self.is_set(field) for field in self.LAZY_FIELDS)
+
+    def search_fields(self):
+        # The search index reads every ticket. It gets the text without keeping the whole ticket loaded.
+        line = self.line
+        if line is None or self.edited():
+            return super().search_fields()
+        data = json.loads(line)
+        return data['title'], data['description'], data['phone_number'], [note['note'] for note in data.get('notes', [])]
+
+    def phone_field(self):
+        # The contact index reads every ticket's phone number. Only that one string is parsed out of the line.
+        line = self.line
+        if line is None or self.is_set('phone_number'):
+            return super().phone_field()
+        start = line.find(self.PHONE_KEY)
+        if start < 0:
+            return self.search_fields()[2]
+        return self.decoder.raw_decode(line, start + len(self.PHONE_KEY))[0]
+
+    def saved_line(self):
+        if self.line is None or self.status != "closed" or self.edited():
+            return None
+        return self.line
+
+
+def parse_date(text):
+    '''Reads a DATE_FORMAT date. Slicing it apart is a lot quicker than strptime, which adds up over a big file.'''
+    if len(text) == 19 and text[2] == text[5] == '-' and text[10] == ' ' and text[13] == text[16] == ':':
+        try:
+            # Moving the year to the front gives an ISO date, and fromisoformat is fast.
+            return datetime.fromisoformat(text[6:10] + '-' + text[:5] + text[10:])
+        except ValueError:
+            pass
+    return datetime.strptime(text, DATE_FORMAT)
+
+
+###### LOGGING ######
+# Log lines look like
+#   2024-06-01 12:00:00 - status #12 - Ticket closed 12
+# The action and ticket ID come from log_action, so the log viewer can pick out one ticket or one kind of
+# action without taking the messages apart. Lines logged any other way get the action "app" and no ID.
+
+LOG_ACTIONS = ('add', 'edit', 'note', 'status', 'search', 'load', 'save', 'archive', 'import', 'workspace', 'app')
+LOG_LINE = re.compile(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d - (\S+)(?: #(\d+))? - ')
+
+log_listener = None
+
+
+class ActionFilter(logging.Filter):
+    # Fills in the action and ticket for lines that didn't come from log_action.
+    def filter(self, record):
+        if not hasattr(record, 'action'):
+            record.action = 'app'
+        ticket_id = getattr(record, 'ticket_id', None)
+        record.ticket = '' if ticket_id is None else f' #{ticket_id}'
+        return True
+
+
+def setup_logging():
+    '''Log lines go on a queue and a background thread writes them to LOG_FILE, so a slow disk
+    never holds up whoever is logging. Anything still on the queue is written when the program exits.'''
+    global log_listener
+    if log_listener is not None:
+        return
+    if LOG_ROTATE_WHEN:
+        file_handler = logging.handlers.TimedRotatingFileHandler(LOG_FILE, when=LOG_ROTATE_WHEN,
+                                                                 backupCount=LOG_BACKUPS, encoding='utf-8')
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES,
+                                                            backupCount=LOG_BACKUPS, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(action)s%(ticket)s - %(message)s',
+                                                datefmt='%Y-%m-%d %H:%M:%S'))
+    file_handler.addFilter(ActionFilter())
+    log_queue = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(log_queue, file_handler)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    log_listener.start()
+    atexit.register(log_listener.stop)
+
+
+def log_action(action, message, ticket_id=None):
+    '''Logs message as one of LOG_ACTIONS, about one ticket if ticket_id is given.'''
+    logging.info(message, extra={'action': action, 'ticket_id': ticket_id})
+
+
+def log_files():
+    '''The log and the copies it was turned over into, newest first.'''
+    folder = os.path.dirname(os.path.abspath(LOG_FILE))
+    name = os.path.basename(LOG_FILE)
+    stamps = []
+    for entry in os.scandir(folder):
+        if entry.name == name or entry.name.startswith(name + '.'):
+            try:
+                stamps.append((entry.stat().st_mtime, entry.name == name, entry.path))
+            except OSError:
+                # Turned over while we looked.
+                pass
+    # The log itself first even if it was just cleared, then the rest by when they were last written.
+    stamps.sort(reverse=True, key=lambda stamp: (stamp[1], stamp[0]))
+    return [path for mtime, current, path in stamps]
+
+
+def lines_backwards(path, end=None, block_size=64 * 1024):
+    '''Yields (offset, line) for every line in the file before offset end (the whole file if None), last line first.
+    Reads a block at a time from the end, so the first lines come back without reading the rest of the file.'''
+    with open(path, 'rb') as file:
+        position = file.seek(0, os.SEEK_END) if end is None else end
+        partial = b''
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            file.seek(position)
+            block = file.read(size) + partial
+            lines = block.split(b'\n')
+            # The first piece could be the end of a line that started in the block before this one.
+            partial = lines[0]
+            line_end = position + len(block)
+            for line in reversed(lines[1:]):
+                line_end -= len(line)
+                if line:
+                    yield line_end, line.decode('utf-8', errors='replace')
+                line_end -= 1
+        if partial:
+            yield 0, partial.decode('utf-8', errors='replace')
+
+
+def log_line_matches(line, ticket_id=None, action=None):
+    if ticket_id is None and action is None:
+        return True
+    match = LOG_LINE.match(line)
+    if match is None:
+        return False
+    return (action is None or match.group(1) == action) and (ticket_id is None or match.group(2) == str(ticket_id))
+
+
+def log_end():
+    '''Where the log ends right now, as a cursor for read_log_page, and the offset to tail it from.
+    A line only half written yet is left for the tail.'''
+    if not os.path.exists(LOG_FILE):
+        return None, 0
+    with open(LOG_FILE, 'rb') as file:
+        size = file.seek(0, os.SEEK_END)
+        start = max(0, size - 4096)
+        file.seek(start)
+        end = start + file.read().rfind(b'\n') + 1
+        return (os.fstat(file.fileno()).st_ino, end), end
+
+
+def read_log_page(before, count=200, ticket_id=None, action=None):
+    '''Up to count log lines, oldest first, from just before the cursor before (from log_end or the last page).
+    Carries on into the turned-over copies of the log. Returns the lines and the cursor for the page before them,
+    which is None once there's nothing older. Only reads as far back as it has to to fill the page.'''
+    if before is None:
+        return [], None
+    inode, end = before
+    found = []
+    started = False
+    for path in log_files():
+        try:
+            if not started:
+                if os.stat(path).st_ino != inode:
+                    continue
+                started = True
+            else:
+                inode, end = os.stat(path).st_ino, None
+            for offset, line in lines_backwards(path, end):
+                if log_line_matches(line, ticket_id, action):
+                    found.append(line)
+                    if len(found) == count:
+                        found.reverse()
+                        return found, (inode, offset)
+        except OSError:
+            # Turned over or cleared while we were reading.
+            break
+    found.reverse()
+    return found, None
+
+
+def read_log_since(offset, ticket_id=None, action=None):
+    '''The lines added to the end of the log since offset, and the offset to carry on from next time.
+    If the log is shorter than offset it was turned over or cleared, and it's read from the top.'''
+    try:
+        with open(LOG_FILE, 'rb') as file:
+            size = file.seek(0, os.SEEK_END)
+            if size < offset:
+                offset = 0
+            file.seek(offset)
+            data = file.read()
+    except OSError:
+        return [], 0
+    # A line only half written yet waits for next time.
+    data = data[:data.rfind(b'\n') + 1]
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    return [line for line in lines if log_line_matches(line, ticket_id, action)], offset + len(data)
+
+
+def clear_log():
+    '''Empties the log and deletes the copies it was turned over into.'''
+    for path in log_files():
+        if os.path.basename(path) == os.path.basename(LOG_FILE):
+            # The logging thread keeps the file open, so it's emptied instead of deleted.
+            open(path, 'w').close()
+        else:
+            os.remove(path)
+
+
+###### TICKET FUNCTIONS ######
+def note_to_dict(note):
+    return {'note': note.text, 'timestamp': note.timestamp}
+
+
+def note_from_dict(data):
+    return Note(data['note'], to_seconds(parse_date(data['timestamp'])))
+
+
+def ticket_to_dict(ticket):
+    # ID, status and date come first so the loader can read them off the start of a line (see TICKET_LINE_START).
+    return {
+        'id': ticket.ticket_id,
+        'status': ticket.status,
+        'is_open': ticket.is_open,
+        'creation_date': ticket.creation_date,
+        'title': ticket.title,
+        'description': ticket.description,
+        'phone_number': ticket.phone_number,
+        'notes': [note_to_dict(note) for note in ticket.notes],
+        'closed_date': ticket.closed_date
+    }
+
+
+def ticket_from_dict(data):
+    return Ticket(
+        data['title'],
+        data['description'],
+        data['phone_number'],
+        data['creation_date'],
+        notes=[note_from_dict(note) for note in data.get('notes', [])],
+        is_open=data['is_open'],
+        status=data.get('status', 'open'),
+        ticket_id=data.get('id'),
+        closed_date=data.get('closed_date')
+    )
+
+
+def ticket_data(ticket):
+    '''The ticket as a dict, without loading a LazyTicket that hasn't been looked at.'''
+    line = ticket.saved_line()
+    return json.loads(line) if line else ticket_to_dict(ticket)
+
+
+def closed_since(data):
+    '''When a closed ticket (as a dict) was closed. Tickets from before closing was dated go by their last note or creation.'''
+    if data.get('closed_date'):
+        return parse_date(data['closed_date'])
+    return max([parse_date(data['creation_date'])] + [parse_date(note['timestamp']) for note in data.get('notes', [])])
+
+
+class TicketStore:
+    '''All the tickets, plus a dict from ticket ID to ticket so a lookup doesn't search the list.
+    IDs are handed out from next_id and never reused, even if a ticket gets deleted one day.
+    Tickets are also kept in one bucket per status, so a view only walks the tickets it shows.
+    Change tickets through the store so the buckets and listeners stay up to date.'''
+
+    def __init__(self, next_id=0):
+        self.tickets = []
+        self.by_id = {}
+        # (created_at, ticket_id) pairs kept sorted as tickets come in, oldest first.
+        self.by_date = []
+        self.by_status = {status: [] for status in STATUSES}
+        self.next_id = next_id
+        # Called with the ticket after every change made through the store.
+        self.listeners = []
+        self.search_index = None
+        # Where changes get saved, set by whatever loaded the store.
+        self.storage = None
+        # Old closed tickets that were moved out of the store (a TicketArchive), if there are any.
+        self.archive = None
+        # Running totals for the Reports window (Reports), made the first time they're asked for.
+        self.reports = None
+        # Every caller's tickets by phone number (ContactIndex), made in the background or the first time it's needed.
+        self.contacts = None
+
+    def changed(self, ticket):
+        # Whatever the display had rendered for this ticket is out of date now.
+        ticket.rendered = None
+        for listener in self.listeners:
+            listener(ticket)
+
+    def add(self, ticket):
+        # Old files have no IDs. Loading them in order gives every ticket the ID it always showed.
+        if ticket.ticket_id is None:
+            ticket.ticket_id = self.next_id
+        self.next_id = max(self.next_id, ticket.ticket_id + 1)
+        self.tickets.append(ticket)
+        self.by_id[ticket.ticket_id] = ticket
+        key = (ticket.created_at, ticket.ticket_id)
+        bisect.insort(self.by_date, key)
+        bisect.insort(self.by_status[ticket.status], key)
+        if self.reports is not None:
+            self.reports.ticket_added(ticket)
+        self.changed(ticket)
+        return ticket
+
+    def add_loaded(self, tickets):
+        '''Adds tickets straight from a file. The lists are sorted once at the end instead of on every ticket,
+        and listeners aren't called, so only use this before anything is listening.'''
+        for ticket in tickets:
+            if ticket.ticket_id is None:
+                ticket.ticket_id = self.next_id
+            self.next_id = max(self.next_id, ticket.ticket_id + 1)
+            self.tickets.append(ticket)
+            self.by_id[ticket.ticket_id] = ticket
+            key = (ticket.created_at, ticket.ticket_id)
+            self.by_date.append(key)
+            self.by_status[ticket.status].append(key)
+        self.by_date.sort()
+        for keys in self.by_status.values():
+            keys.sort()
+
+    def add_many(self, new_tickets):
+        '''Adds a list of tickets. A big batch goes on the end of the lists and they're sorted once,
+        instead of every ticket moving the rest of a long list along to make room.'''
+        if len(new_tickets) < ADD_ONE_BY_ONE:
+            return [self.add(ticket) for ticket in new_tickets]
+        self.add_loaded(new_tickets)
+        for ticket in new_tickets:
+            if self.reports is not None:
+                self.reports.ticket_added(ticket)
+            self.changed(ticket)
+        return new_tickets
+
+    def drop(self, dropped):
+        '''Takes tickets out of the store, for when they've been moved to the archive. Listeners aren't called.'''
+        dropped_ids = {ticket.ticket_id for ticket in dropped}
+        self.tickets = [ticket for ticket in self.tickets if ticket.ticket_id not in dropped_ids]
+        for ticket in dropped:
+            del self.by_id[ticket.ticket_id]
+            if self.search_index is not None:
+                self.search_index.forget(ticket)
+        self.by_date = [key for key in self.by_date if key[1] not in dropped_ids]
+        for status in STATUSES:
+            self.by_status[status] = [key for key in self.by_status[status] if key[1] not in dropped_ids]
+
+    def set_status(self, ticket, new_status, closed_date=None):
+        '''closed_date is when a close really happened, when it isn't now. It's set before the reports count the close.'''
+        if new_status == ticket.status:
+            return
+        key = (ticket.created_at, ticket.ticket_id)
+        old_bucket = self.by_status[ticket.status]
+        del old_bucket[bisect.bisect_left(old_bucket, key)]
+        # Only looked at for the reports, closed_at would load a LazyTicket.
+        old = (ticket.status, ticket.closed_at) if self.reports is not None else None
+        ticket.set_status(new_status, closed_date)
+        bisect.insort(self.by_status[new_status], key)
+        if self.reports is not None:
+            self.reports.status_changed(ticket, *old)
+        self.changed(ticket)
+
+    def close(self, ticket):
+        self.set_status(ticket, "closed")
+
+    def update(self, ticket, **fields):
+        # The old text's trigrams come out while the old text is still there to work them out from.
+        if self.search_index is not None:
+            self.search_index.forget(ticket)
+        for field, value in fields.items():
+            setattr(ticket, field, value)
+        self.changed(ticket)
+
+    def refresh(self, ticket, fresh):
+        '''Copies a newer version of a ticket (read back from the file after another program changed it)
+        over the one in the store, so everything holding on to the ticket sees the change.'''
+        if fresh.status != ticket.status:
+            key = (ticket.created_at, ticket.ticket_id)
+            old_bucket = self.by_status[ticket.status]
+            del old_bucket[bisect.bisect_left(old_bucket, key)]
+            bisect.insort(self.by_status[fresh.status], key)
+        old_status, old_closed_at = ticket.status, ticket.closed_at
+        if self.search_index is not None:
+            self.search_index.forget(ticket)
+        for field in ('title', 'description', 'phone_number', 'notes', 'status', 'closed_at'):
+            setattr(ticket, field, getattr(fresh, field))
+        if isinstance(ticket, LazyTicket):
+            # Every field is set now, the line it was read from is out of date.
+            ticket.line = None
+        if self.reports is not None:
+            self.reports.status_changed(ticket, old_status, old_closed_at)
+        self.changed(ticket)
+
+    def add_note(self, ticket, note):
+        '''Adds a note and returns it the way it's written to the file, ready for the journal.'''
+        note_entry = ticket.add_note(note)
+        self.changed(ticket)
+        return note_to_dict(note_entry)
+
+    def count(self, status):
+        return len(self.by_status[status])
+
+    def page(self, statuses, before=None, count=50):
+        '''Up to count tickets with the given statuses (all if None) older than the key before, newest first.
+        Works from the sorted buckets each time, so tickets changing between pages can't confuse it.'''
+        buckets = [self.by_date] if statuses is None else [self.by_status[status] for status in statuses]
+        runs = []
+        for keys in buckets:
+            end = len(keys) if before is None else bisect.bisect_left(keys, before)
+            runs.append(reversed(keys[max(0, end - count):end]))
+        found = [self.by_id[ticket_id] for created_at, ticket_id in itertools.islice(heapq.merge(*runs, reverse=True), count)]
+        if self.archive is not None and (statuses is None or "closed" in statuses):
+            archived = self.archive.page(before, count, skip=self.by_id)
+            found = list(itertools.islice(heapq.merge(found, archived, key=ticket_key, reverse=True), count))
+        return found
+
+    def newest_first(self, *statuses, archived=False):
+        '''Walks the tickets with the given statuses (all of them if none given), newest first.
+        archived also walks the archive for closed tickets.'''
+        if not statuses:
+            keys = reversed(self.by_date)
+        elif len(statuses) == 1:
+            keys = reversed(self.by_status[statuses[0]])
+        else:
+            keys = heapq.merge(*(reversed(self.by_status[status]) for status in statuses), reverse=True)
+        found = (self.by_id[ticket_id] for created_at, ticket_id in keys)
+        if archived and self.archive is not None and (not statuses or "closed" in statuses):
+            found = heapq.merge(found, self.archive.newest_first(skip=self.by_id), key=ticket_key, reverse=True)
+        yield from found
+
+    def get(self, ticket_id):
+        '''The ticket with this ID. An archived ticket is brought back into the store, since whoever asks is about to change it.'''
+        ticket = self.by_id.get(ticket_id)
+        if ticket is None and self.archive is not None:
+            ticket = self.unarchive(ticket_id)
+        return ticket
+
+    def has(self, ticket_id):
+        '''Whether there's a ticket with this ID, archived or not. Unlike get it never brings one back.'''
+        return ticket_id in self.by_id or (self.archive is not None and self.archive.has(ticket_id))
+
+    def find(self, ticket_id):
+        '''The ticket with this ID to look at, archived or not. Unlike get it never brings one back, so
+        anything changed on it is lost. Use get for a ticket that's about to change.'''
+        ticket = self.by_id.get(ticket_id)
+        if ticket is None and self.archive is not None:
+            ticket = self.archive.find(ticket_id)
+        return ticket
+
+    def unarchive(self, ticket_id):
+        # Under the file lock, another program archiving into the same month rewrites the same segment.
+        with changing(self):
+            # It may just have been brought back by another program, its change was read in by changing.
+            if ticket_id in self.by_id:
+                return self.by_id[ticket_id]
+            ticket = self.archive.find(ticket_id)
+            if ticket is None:
+                return None
+            self.add(ticket)
+            # Saved back here before it leaves the archive, so a crash in between can't lose it.
+            record_change(self, {'op': 'add', 'ticket': ticket_to_dict(ticket)})
+            self.archive.remove(ticket_id)
+        log_action('archive', f"Ticket {ticket_id} brought back from the archive", ticket_id)
+        return ticket
+
+    def report(self):
+        '''The Reports for this store. Worked out from every ticket (archived ones too) the first time,
+        after that they're kept up to date as tickets change, and saved with the ticket file.'''
+        if self.reports is None:
+            self.reports = Reports.count_all(self)
+        return self.reports
+
+    def __iter__(self):
+        return iter(self.tickets)
+
+    def __len__(self):
+        return len(self.tickets)
+
+    def build_search_index(self):
+        self.search_index = SearchIndex(self)
+
+    def search_index_job(self):
+        return self.index_job('search_index', lambda: SearchIndex(self, listen=False))
+
+    def contacts_job(self):
+        return self.index_job('contacts', lambda: ContactIndex(self, listen=False))
+
+    def index_job(self, name, make):
+        '''Builds an index (search_index or contacts) on another thread. Run work() there, then done(result) back on this thread.
+        Anything that changes in between is kept track of and indexed again in done.'''
+        if getattr(self, name) is not None:
+            return (lambda: None), (lambda index: None)
+        changed = {}
+        def remember(ticket):
+            changed[ticket.ticket_id] = ticket
+        self.listeners.append(remember)
+
+        def work():
+            return make()
+
+        def done(index):
+            self.listeners.remove(remember)
+            # Something that needed it while it was building had to make its own already.
+            if getattr(self, name) is not None:
+                return
+            for ticket in changed.values():
+                index.index_ticket(ticket)
+            self.listeners.append(index.index_ticket)
+            setattr(self, name, index)
+        return work, done
+
+    @timed('search')
+    def search(self, query, fields=None, statuses=STATUSES, whole_phrase=False):
+        if self.search_index is None:
+            self.build_search_index()
+        results = self.search_index.ranked(query, fields, statuses, whole_phrase)
+        if self.archive is not None and "closed" in statuses:
+            results += self.archive.ranked(query, fields, whole_phrase, skip=self.by_id)
+            results.sort(key=lambda result: result[:3], reverse=True)
+        return [ticket for total, created_at, ticket_id, ticket in results]
+
+    @timed('caller history')
+    def caller_history(self, phone_number, statuses=STATUSES):
+        '''Every ticket with the given statuses from the caller with this phone number, however the number was written,
+        newest first. Archived tickets are found too.'''
+        if self.contacts is None:
+            self.contacts = ContactIndex(self)
+        found = []
+        for ticket_id in self.contacts.ticket_ids(phone_number):
+            ticket = self.by_id.get(ticket_id)
+            if ticket is None and self.archive is not None and "closed" in statuses:
+                ticket = self.archive.find(ticket_id)
+            if ticket is not None and ticket.status in statuses:
+                found.append(ticket)
+        found.sort(key=ticket_key, reverse=True)
+        return found
+
+
+###### REPORTS ######
+
+class Reports:
+    '''Running totals for the Reports window: tickets opened and closed each day, and how long tickets took to close.
+    They're changed a little every time a ticket is added or changes status, so a report never has to go through
+    the whole history, archive and all. Days are "2024-01-31". Closed tickets from before closing was dated
+    have no closing time and aren't in the closed numbers.'''
+
+    def __init__(self, next_id=0):
+        # Tickets with a lower ID are counted already, so one coming back from the archive isn't counted twice.
+        self.next_id = next_id
+        # day: [opened, closed]
+        self.days = {}
+        self.close_times = Histogram()
+
+    def ticket_added(self, ticket):
+        if ticket.ticket_id < self.next_id:
+            return
+        self.next_id = ticket.ticket_id + 1
+        self.count(ticket.created_at, ticket.status, ticket.closed_at)
+
+    def status_changed(self, ticket, old_status, old_closed_at):
+        self.count_closing(ticket.created_at, old_status, old_closed_at, -1)
+        self.count_closing(ticket.created_at, ticket.status, ticket.closed_at, 1)
+
+    def count(self, created_at, status, closed_at):
+        self.day(created_at.strftime('%Y-%m-%d'))[0] += 1
+        self.count_closing(created_at, status, closed_at, 1)
+
+    def count_closing(self, created_at, status, closed_at, change):
+        if status != "closed" or closed_at is None:
+            return
+        self.day(closing_day(closed_at))[1] += change
+        if change > 0:
+            self.close_times.add(closed_at - to_seconds(created_at))
+        else:
+            self.close_times.remove(closed_at - to_seconds(created_at))
+
+    def day(self, day):
+        totals = self.days.get(day)
+        if totals is None:
+            totals = self.days[day] = [0, 0]
+        return totals
+
+    @classmethod
+    def count_all(cls, tickets):
+        '''Reports worked out from scratch, from the store and its archive. Slow on a big history, it's only done
+        when there are no saved ones to start from.'''
+        reports = cls(tickets.next_id)
+        archived = tickets.archive.newest_first(skip=tickets.by_id) if tickets.archive is not None else ()
+        for ticket in itertools.chain(tickets, archived):
+            line = ticket.saved_line()
+            if line is None:
+                closed_at = ticket.closed_at
+            else:
+                # Read from the line, so a LazyTicket doesn't stay loaded.
+                closed_date = json.loads(line).get('closed_date')
+                closed_at = None if closed_date is None else to_seconds(parse_date(closed_date))
+            reports.count(ticket.created_at, ticket.status, closed_at)
+        log_action('load', f"Worked out the reports from {sum(opened for opened, closed in reports.days.values())} tickets")
+        return reports
+
+    def to_dict(self):
+        # Copies, a compaction writes them out on another thread while the tickets keep changing.
+        histogram = self.close_times
+        return {'next_id': self.next_id, 'days': {day: list(totals) for day, totals in self.days.items()},
+                'close_times': {'buckets': dict(histogram.buckets), 'count': histogram.count, 'total': histogram.total,
+                                'max': histogram.max}}
+
+    @classmethod
+    def from_dict(cls, data):
+        reports = cls(data['next_id'])
+        reports.days = {day: list(totals) for day, totals in data['days'].items()}
+        histogram = data['close_times']
+        # JSON keys are always strings.
+        reports.close_times.buckets = {int(bucket): count for bucket, count in histogram['buckets'].items()}
+        reports.close_times.count = histogram['count']
+        reports.close_times.total = histogram['total']
+        reports.close_times.max = histogram['max']
+        return reports
+
+
+def closing_day(closed_at):
+    return (EPOCH + timedelta(seconds=closed_at)).strftime('%Y-%m-%d')
+
+
+def how_long(seconds):
+    if seconds < 3600:
+        return f'{seconds / 60:.0f} min'
+    if seconds < 2 * 86400:
+        return f'{seconds / 3600:.1f} hours'
+    return f'{seconds / 86400:.1f} days'
+
+
+# Pending tickets are counted in these age groups, in days.
+PENDING_AGES = [(0, 1, 'under a day'), (1, 7, '1 to 7 days'), (7, 30, '7 to 30 days'), (30, None, 'over 30 days')]
+
+
+def report_text(tickets, days=14, now=None):
+    '''The report the Reports window and "ticketsystem report" show, for the last days days.'''
+    now = now or datetime.now()
+    reports = tickets.report()
+    lines = []
+
+    # The backlog (open and pending) at the end of each day, going back from now one day's opened and closed at a time.
+    backlog = tickets.count("open") + tickets.count("pending")
+    rows = []
+    for back in range(days):
+        day = (now - timedelta(days=back)).strftime('%Y-%m-%d')
+        opened, closed = reports.days.get(day, (0, 0))
+        rows.append((day, opened, closed, backlog))
+        backlog -= opened - closed
+    lines.append(f'Tickets per day, last {days} days')
+    lines.append(f'  {"Day":<12}{"Opened":>8}{"Closed":>8}{"Backlog":>9}')
+    for day, opened, closed, backlog in rows:
+        lines.append(f'  {day:<12}{opened:>8}{closed:>8}{backlog:>9}')
+    lines.append(f'  {"Total":<12}{sum(row[1] for row in rows):>8}{sum(row[2] for row in rows):>8}')
+
+    close_times = reports.close_times
+    lines.append('')
+    lines.append(f'Time to close, all {close_times.count} dated closings')
+    if close_times.count:
+        lines.append('  ' + '   '.join(f'{name} {how_long(close_times.percentile(fraction))}'
+                                       for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))))
+        lines.append(f'  average {how_long(close_times.total / close_times.count)}')
+
+    pending = list(tickets.newest_first("pending"))
+    lines.append('')
+    lines.append(f'Pending tickets by age, {len(pending)} pending')
+    for low, high, name in PENDING_AGES:
+        count = sum(1 for ticket in pending
+                    if (now - ticket.created_at).days >= low and (high is None or (now - ticket.created_at).days < high))
+        lines.append(f'  {name:<14}{count:>6}')
+    if pending:
+        oldest = pending[-1]
+        lines.append(f'  oldest: ticket {oldest.ticket_id}, {how_long((now - oldest.created_at).total_seconds())} old')
+    return '\n'.join(lines) + '\n'
+
+
+###### SEARCH INDEX ######
+
+def digits_only(text):
+    return ''.join(char for char in text if char.isdigit())
+
+
+def phone_digits(word):
+    '''The digits of word if it looks like (part of) a phone number, otherwise an empty string.'''
+    if all(char.isdigit() or char in '()-+. ' for char in word):
+        return digits_only(word)
+    return ''
+
+
+def in_sorted(values, value):
+    position = bisect.bisect_left(values, value)
+    return position < len(values) and values[position] == value
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    '''Trigram index over the title, description, phone number and notes of every ticket.
+    A search only looks at tickets that have every trigram of the search word, then checks those
+    few for the real substring match. Phone numbers are also indexed as digits only,
+    so "(555) 123-4567" and "555-123-4567" find each other.
+    Only the trigrams are kept, not the text, the few tickets a search looks at are read again.
+    Each trigram's ticket IDs are a sorted array, 4 bytes an ID where a set would take about 40.
+    The store takes a ticket out (forget) before changing its text and puts it back after.'''
+
+    # A hit in a short field says more than a hit somewhere in a long description.
+    WEIGHTS = {'title': 3, 'phone_number': 3, 'description': 1, 'notes': 1}
+
+    def __init__(self, tickets, listen=True):
+        self.tickets = tickets
+        self.postings = {}
+        # In ID order, so every ID goes on the end of its arrays.
+        for ticket in sorted(tickets, key=lambda ticket: ticket.ticket_id):
+            self.index_ticket(ticket)
+        if listen:
+            tickets.listeners.append(self.index_ticket)
+
+    def field_texts(self, ticket):
+        title, description, phone_number, notes = ticket.search_fields()
+        return {
+            'title': title.lower(),
+            'description': description.lower(),
+            'phone_number': phone_number.lower(),
+            'phone_digits': digits_only(phone_number),
+            'notes': '\n'.join(notes).lower(),
+        }
+
+    def grams_of(self, texts):
+        grams = set()
+        for text in texts.values():
+            grams |= trigrams(text)
+        return grams
+
+    def index_ticket(self, ticket):
+        # Called after every change, most of which leave the text alone, so an ID already there isn't added again.
+        ticket_id = ticket.ticket_id
+        for gram in self.grams_of(self.field_texts(ticket)):
+            posting = self.postings.get(gram)
+            if not posting:
+                self.postings[gram] = array('i', [ticket_id])
+            elif posting[-1] < ticket_id:
+                posting.append(ticket_id)
+            else:
+                position = bisect.bisect_left(posting, ticket_id)
+                if posting[position] != ticket_id:
+                    posting.insert(position, ticket_id)
+
+    def forget(self, ticket):
+        '''Takes the ticket's trigrams out, before its text changes or it leaves the store.
+        One that gets missed (a change while the index was being built) only costs a search a wasted look.'''
+        ticket_id = ticket.ticket_id
+        for gram in self.grams_of(self.field_texts(ticket)):
+            posting = self.postings.get(gram, ())
+            position = bisect.bisect_left(posting, ticket_id)
+            if position < len(posting) and posting[position] == ticket_id:
+                del posting[position]
+
+    def candidates(self, word):
+        '''IDs of tickets that have all trigrams of word, or None when word is too short to use the index.'''
+        grams = trigrams(word)
+        if not grams:
+            return None
+        postings = sorted((self.postings.get(gram, ()) for gram in grams), key=len)
+        found = set(postings[0])
+        for posting in postings[1:]:
+            if not found:
+                break
+            if len(posting) > 8 * len(found):
+                # A few IDs against a long array, each is looked up in it instead of reading all of it.
+                found = {ticket_id for ticket_id in found if in_sorted(posting, ticket_id)}
+            else:
+                found.intersection_update(posting)
+        return found
+
+    def score(self, texts, word, fields):
+        score = 0
+        digits = phone_digits(word)
+        for field in fields:
+            if field == 'phone_number':
+                matched = word in texts['phone_number'] or (digits and digits in texts['phone_digits'])
+            else:
+                matched = word in texts[field]
+            if matched:
+                score += self.WEIGHTS[field]
+        return score
+
+    def search(self, query, fields=None, statuses=STATUSES, whole_phrase=False):
+        '''Tickets matching every word of query in at least one of fields, best match first.'''
+        return [ticket for total, created_at, ticket_id, ticket in self.ranked(query, fields, statuses, whole_phrase)]
+
+    def ranked(self, query, fields=None, statuses=STATUSES, whole_phrase=False):
+        '''Like search, but (score, created_at, ticket_id, ticket) for each match, so results from elsewhere can be mixed in.'''
+        fields = fields or tuple(self.WEIGHTS)
+        query = query.lower().strip()
+        words = [query] if whole_phrase else query.split()
+        if not words:
+            return []
+        found = None
+        for word in words:
+            word_ids = self.candidates(word)
+            digits = phone_digits(word)
+            if word_ids is not None and 'phone_number' in fields and digits and digits != word:
+                digit_ids = self.candidates(digits)
+                word_ids = None if digit_ids is None else word_ids | digit_ids
+            if word_ids is None:
+                continue
+            found = word_ids if found is None else found & word_ids
+        if found is None:
+            # Every word was too short for the index, so look at every ticket with the wanted status.
+            found = (ticket.ticket_id for ticket in self.tickets.newest_first(*statuses))
+        results = []
+        for ticket_id in found:
+            # by_id and not get(), which would bring an archived ticket back.
+            ticket = self.tickets.by_id.get(ticket_id)
+            if ticket is None or ticket.status not in statuses:
+                continue
+            texts = self.field_texts(ticket)
+            total = 0
+            for word in words:
+                word_score = self.score(texts, word, fields)
+                if not word_score:
+                    break
+                total += word_score
+            else:
+                results.append((total, ticket.created_at, ticket_id, ticket))
+        results.sort(key=lambda result: result[:3], reverse=True)
+        return results
+
+
+###### CALLERS ######
+
+def caller_key(phone_number):
+    '''A phone number as digits only, the same for every way of writing it: "(555) 123-4567" and "555.123.4567"
+    both give "5551234567". A leading 1 on an 11 digit number is the country code and is left off.'''
+    digits = digits_only(phone_number or '')
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    return digits
+
+
+class ContactIndex:
+    '''The IDs of every caller's tickets by caller_key, so a caller's whole history is one dict lookup
+    however many tickets there are. Archived tickets are in it too, read from the archive manifests.'''
+
+    def __init__(self, tickets, listen=True):
+        self.tickets = tickets
+        self.callers = {}
+        # ticket_id -> caller_key, so a ticket can be taken out from under its old number when the number changes.
+        self.keys = {}
+        if tickets.archive is not None:
+            for key, ticket_ids in tickets.archive.callers():
+                for ticket_id in ticket_ids:
+                    self.put(ticket_id, key)
+        # After the archive, a ticket that's in both is filed under the number it has in the store.
+        for ticket in tickets:
+            self.index_ticket(ticket)
+        if listen:
+            tickets.listeners.append(self.index_ticket)
+
+    def put(self, ticket_id, key):
+        old_key = self.keys.get(ticket_id)
+        if old_key == key:
+            return
+        if old_key:
+            self.callers[old_key].discard(ticket_id)
+            if not self.callers[old_key]:
+                del self.callers[old_key]
+        if key:
+            # Interned, so thousands of tickets from one caller share one string.
+            key = sys.intern(key)
+            self.callers.setdefault(key, set()).add(ticket_id)
+        self.keys[ticket_id] = key
+
+    def index_ticket(self, ticket):
+        # phone_field, so a LazyTicket doesn't get loaded just for its phone number.
+        self.put(ticket.ticket_id, caller_key(ticket.phone_field()))
+
+    def ticket_ids(self, phone_number):
+        return self.callers.get(caller_key(phone_number), set())
+
+
+def make_snapshot(tickets, seq):
+    '''Copies the tickets for saving, open and pending first. A closed ticket nobody has looked at
+    is copied as the line it was loaded from.'''
+    entries = []
+    closed = []
+    for ticket in tickets:
+        if ticket.status == "closed":
+            closed.append(ticket.saved_line() or ticket_to_dict(ticket))
+        else:
+            entries.append(ticket_to_dict(ticket))
+    entries.extend(closed)
+    reports = tickets.reports.to_dict() if tickets.reports is not None else None
+    return {'seq': seq, 'next_id': tickets.next_id, 'tickets': entries, 'reports': reports}
+
+
+# The ticket file is one JSON object, but written with each ticket on a line of its own:
+#   {"seq": 12, "next_id": 340, "tickets": [
+#   {"id": 3, "status": "open", "is_open": true, "creation_date": "...", "title": ...},
+#   ...
+#   ]}
+# so it can be read a line at a time. Open and pending tickets come first.
+SNAPSHOT_START = re.compile(r'\{"seq": (\d+), "next_id": (\d+), "tickets": \[$')
+TICKET_LINE_START = re.compile(r'\{"id": (\d+), "status": "closed", "is_open": false, "creation_date": "([^"\\]*)", ')
+
+
+def write_snapshot_lines(file, snapshot):
+    file.write(f'{{"seq": {snapshot["seq"]}, "next_id": {snapshot["next_id"]}, "tickets": [\n')
+    for index, entry in enumerate(snapshot['tickets']):
+        line = entry if isinstance(entry, str) else json.dumps(entry)
+        file.write((',\n' if index else '') + line)
+    file.write('\n]}\n')
+
+
+def read_snapshot_lines(file):
+    '''Reads a ticket file a line at a time. Yields (seq, next_id) first, then every ticket.
+    Closed tickets come out as LazyTicket, so they cost next to nothing until they're looked at.
+    Files from before the one-ticket-per-line layout are read in one go like they always were.'''
+    first_line = file.readline()
+    start = SNAPSHOT_START.match(first_line.rstrip('\n'))
+    if start is None:
+        file.seek(0)
+        data = json.load(file) if first_line.strip() else []
+        if not isinstance(data, dict):
+            data = {'seq': 0, 'tickets': data or []}
+        yield data.get('seq', 0), data.get('next_id', 0)
+        for ticket_data in data['tickets']:
+            yield ticket_from_dict(ticket_data)
+        return
+    yield int(start.group(1)), int(start.group(2))
+    for line in file:
+        line = line.rstrip('\n').rstrip(',')
+        if not line:
+            continue
+        if line == ']}':
+            return
+        closed = TICKET_LINE_START.match(line)
+        if closed:
+            yield LazyTicket(int(closed.group(1)), "closed", closed.group(2), line)
+        else:
+            yield ticket_from_dict(json.loads(line))
+
+
+def read_open_tickets(path):
+    '''The open and pending tickets from the top of a ticket file, newest first, without reading the closed
+    ones after them. For something to show while the whole file loads. The journal isn't read, so the
+    last few changes can be missing. Old one-piece files and SQLite files give nothing.'''
+    if not os.path.exists(path) or path.endswith('.db'):
+        return []
+    found = []
+    with open(path, 'r') as file:
+        if SNAPSHOT_START.match(file.readline().rstrip('\n')) is None:
+            return []
+        file.seek(0)
+        lines = read_snapshot_lines(file)
+        next(lines)
+        for ticket in lines:
+            # Open and pending tickets are all saved before the first closed one.
+            if ticket.status == "closed":
+                break
+            found.append(ticket)
+    found.sort(key=ticket_key, reverse=True)
+    return found
+
+
+def read_snapshot_seq(path):
+    '''The seq at the top of a ticket file, without reading the rest of it.'''
+    with open(path, 'r') as file:
+        start = SNAPSHOT_START.match(file.readline().rstrip('\n'))
+    return int(start.group(1)) if start else 0
+
+
+def file_stamp(path):
+    '''Changes whenever the file is written or replaced. None if there is no file.'''
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def fsync_directory(path):
+    # Makes the rename itself survive a power loss. Windows can't open a folder like this and doesn't need it.
+    if os.name != 'posix':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_temp(path, write_contents, mode='w'):
+    '''Writes a temp file next to path and fsyncs it. Returns the temp file's path.
+    The process and thread are in the name, so two saves of the same file never share a temp file.'''
+    temp_path = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    with open(temp_path, mode) as file:
+        write_contents(file)
+        file.flush()
+        os.fsync(file.fileno())
+    return temp_path
+
+
+def replace_with_temp(temp_path, path):
+    os.replace(temp_path, path)
+    fsync_directory(path)
+
+
+def atomic_write(path, write_contents, mode='w'):
+    '''Writes to a temp file next to path, fsyncs it and swaps it into place.
+    A crash leaves either the old file or the new one, never half of one.'''
+    replace_with_temp(write_temp(path, write_contents, mode), path)
+
+
+def lock_file(file, wait):
+    if os.name == 'nt':
+        # Windows locks from where the file is, and gives up after 10 tries a second apart.
+        file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not wait:
+                    return False
+    try:
+        # lockf rather than flock, it also works on network drives.
+        fcntl.lockf(file.fileno(), fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def unlock_file(file):
+    if os.name == 'nt':
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.lockf(file.fileno(), fcntl.LOCK_UN)
+
+
+class FileLock:
+    '''Advisory lock on a .lock file, so copies of the program sharing a ticket file (on a shared drive, say)
+    take turns writing it. It only keeps out programs that ask for the lock too.
+    A thread that holds it can take it again, it's let go when the outermost one is done.'''
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.depth = 0
+        self.lock = threading.RLock()
+
+    def acquire(self, wait=True):
+        '''Takes the lock. Without wait it returns False right away if someone else has it.'''
+        if not self.lock.acquire(blocking=wait):
+            return False
+        if self.depth == 0:
+            file = open(self.path, 'a+')
+            if not lock_file(file, wait):
+                file.close()
+                self.lock.release()
+                return False
+            self.file = file
+        self.depth += 1
+        return True
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            unlock_file(self.file)
+            self.file.close()
+            self.file = None
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class FlushBatcher:
+    '''Calls flush at most once per interval, no matter how often request is called.
+    The arguments of the latest request are the ones that get used.'''
+
+    def __init__(self, flush, interval=FLUSH_INTERVAL):
+        self.flush = flush
+        self.interval = interval
+        self.args = ()
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def request(self, *args):
+        if self.interval <= 0:
+            self.flush(*args)
+            return
+        with self.lock:
+            self.args = args
+            if self.timer is not None:
+                return
+            self.timer = threading.Timer(self.interval, self.run)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def run(self):
+        with self.lock:
+            self.timer = None
+            args = self.args
+        self.flush(*args)
+
+    def cancel(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+
+def record_ticket_ids(record):
+    if record['op'] == 'add_many':
+        return [ticket_data['id'] for ticket_data in record['tickets']]
+    if record['op'] == 'batch':
+        return [ticket_id for each in record['records'] for ticket_id in record_ticket_ids(each)]
+    if record['op'] == 'archive':
+        # Moved out, not changed.
+        return []
+    return [record['ticket']['id'] if record['op'] == 'add' else record['id']]
+
+
+def apply_journal_record(tickets, record):
+    '''Applies one journal record and returns the tickets it changed. A record for a ticket
+    that isn't there (another program archived it in the meantime) is skipped.'''
+    op = record['op']
+    if op == 'batch':
+        return [ticket for each in record['records'] for ticket in apply_journal_record(tickets, each)]
+    if op in ('add', 'add_many'):
+        new_tickets = []
+        changed = []
+        for ticket in map(ticket_from_dict, record['tickets'] if op == 'add_many' else [record['ticket']]):
+            # Already there when a crash left an unarchived ticket in both the ticket file and the journal.
+            if ticket.ticket_id in tickets.by_id:
+                tickets.refresh(tickets.by_id[ticket.ticket_id], ticket)
+                changed.append(tickets.by_id[ticket.ticket_id])
+            else:
+                new_tickets.append(ticket)
+        return changed + tickets.add_many(new_tickets)
+    if op == 'archive':
+        tickets.drop([tickets.by_id[ticket_id] for ticket_id in record['ids'] if ticket_id in tickets.by_id])
+        # The archive as it was opened doesn't know about the new segments. While loading there's no storage
+        # yet, but then the archive is opened after they were written.
+        if tickets.storage is not None:
+            tickets.archive = tickets.storage.open_archive()
+        return []
+    # by_id and not get, which would bring an archived ticket back.
+    ticket = tickets.by_id.get(record['id'])
+    if ticket is None:
+        return []
+    if op == 'set':
+        tickets.update(ticket, **record['fields'])
+    elif op == 'status':
+        # The closing time is when it really happened, not when the journal got replayed.
+        tickets.set_status(ticket, record['status'], record.get('closed_date'))
+    elif op == 'note':
+        ticket.notes.append(note_from_dict(record['note']))
+        tickets.changed(ticket)
+    return [ticket]
+
+
+def read_journal(path, start=0):
+    '''(record, where the record ends) for every whole line of the journal from the byte offset start.
+    Stops at a line that isn't whole, another program may be halfway through writing it.'''
+    with open(path, 'rb') as file:
+        file.seek(start)
+        end = start
+        for line in file:
+            if not line.endswith(b'\n'):
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return
+            end += len(line)
+            yield record, end
+
+
+class TicketJournal:
+    '''Append-only log of ticket changes, one JSON record per line.
+    Every record gets a seq number. The snapshot remembers the seq it was taken at,
+    so loading is just the snapshot plus every record with a higher seq.
+    Other copies of the program can append to the same journal. They take turns with the
+    storage's file lock, and read each other's records first, so the seq numbers never repeat.'''
+
+    def __init__(self, path, save_snapshot, compact_every=JOURNAL_COMPACT_EVERY):
+        self.path = path
+        self.save_snapshot = save_snapshot
+        self.compact_every = compact_every
+        self.seq = 0
+        self.pending = 0
+        self.compacting = False
+        self.compaction = None
+        # How far into the journal this program has read, and the file_stamp it had then.
+        self.read_offset = 0
+        self.stamp = None
+        self.lock = threading.Lock()
+        self.syncer = FlushBatcher(self.sync)
+
+    def replay(self, tickets, snapshot_seq):
+        '''Applies every record after the snapshot. Only call it holding the file lock.'''
+        self.seq = snapshot_seq
+        self.pending = 0
+        self.read_offset = 0
+        self.stamp = None
+        self.catch_up(tickets)
+
+    def catch_up(self, tickets):
+        '''Applies the records added since this program last read the journal, and returns the tickets
+        they changed. Only call it holding the file lock.'''
+        stamp = file_stamp(self.path)
+        if stamp is None:
+            self.read_offset = 0
+            self.stamp = None
+            return []
+        if self.stamp is None or stamp[2] != self.stamp[2] or stamp[1] < self.read_offset:
+            # A new journal, another program compacted. Read it from the top, the seq skips what's applied already.
+            self.read_offset = 0
+            self.pending = 0
+        changed = []
+        for record, end in read_journal(self.path, self.read_offset):
+            self.read_offset = end
+            self.pending += 1
+            if record['seq'] <= self.seq:
+                continue
+            self.seq = record['seq']
+            changed.extend(apply_journal_record(tickets, record))
+        if self.read_offset < stamp[1]:
+            # Nobody is writing while the lock is held, so this is a half written line from a crash.
+            logging.info("Dropped a broken line at the end of the journal")
+            os.truncate(self.path, self.read_offset)
+        self.stamp = file_stamp(self.path)
+        return changed
+
+    def append(self, tickets, record):
+        '''Adds a record. Only call it holding the file lock, right after catch_up.'''
+        with self.lock:
+            self.seq += 1
+            record['seq'] = self.seq
+            # Opened for every record instead of kept open. Another program's compaction replaces the file,
+            # and Windows won't replace a file someone has open.
+            with open(self.path, 'a') as file:
+                file.write(json.dumps(record) + '\n')
+            self.stamp = file_stamp(self.path)
+            self.read_offset = self.stamp[1]
+            self.pending += 1
+            start_compaction = self.pending >= self.compact_every and not self.compacting
+            if start_compaction:
+                self.compacting = True
+        self.syncer.request()
+        if start_compaction:
+            self.compact_in_background(tickets)
+
+    def sync(self):
+        with self.lock:
+            if os.path.exists(self.path):
+                with open(self.path, 'a') as file:
+                    os.fsync(file.fileno())
+
+    def compact_in_background(self, tickets):
+        # Copy the tickets here on the calling thread, the tickets can change while the thread is writing.
+        snapshot = make_snapshot(tickets, self.seq)
+        self.compaction = threading.Thread(target=self.compact, args=(snapshot,), daemon=True)
+        self.compaction.start()
+
+    def compact(self, snapshot):
+        try:
+            if self.save_snapshot(snapshot):
+                log_action('save', f"Journal compacted at {snapshot['seq']}")
+        finally:
+            self.compacting = False
+
+    def finish_compaction(self):
+        if self.compaction is not None:
+            self.compaction.join()
+
+    def close(self):
+        '''Waits for a running compaction and gets everything on disk. Call this before the program ends.'''
+        self.finish_compaction()
+        self.syncer.cancel()
+        self.sync()
+
+    def trim(self, seq):
+        '''Drops every record that a snapshot taken at seq already has. Only call it holding the file lock.'''
+        with self.lock:
+            kept = []
+            if os.path.exists(self.path):
+                with open(self.path, 'rb') as file:
+                    kept = [(json.loads(line)['seq'], line) for line in file]
+            kept = [(record_seq, line) for record_seq, line in kept if record_seq > seq]
+            atomic_write(self.path, lambda file: file.writelines(line for record_seq, line in kept), 'wb')
+            self.pending = len(kept)
+            # Records another program added that this one hasn't applied yet are left to catch_up.
+            self.read_offset = sum(len(line) for record_seq, line in kept if record_seq <= self.seq)
+            self.stamp = file_stamp(self.path) if self.read_offset == os.path.getsize(self.path) else None
+
+
+###### STORAGE ######
+# A storage loads a store and saves its changes. Each store knows its storage,
+# so record_change and friends work the same whatever the tickets are kept in.
+
+class JsonStorage:
+    '''Tickets in a JSON file plus the journal next to it. Every ticket is kept in memory in a TicketStore.
+    More than one copy of the program can use the same file. Writes take turns with a lock file
+    (tickets.lock), and each copy reads in the others' changes with sync before it writes its own.'''
+
+    def __init__(self, path=TICKET_FILE):
+        self.path = path
+        self.file_lock = FileLock(os.path.splitext(path)[0] + '.lock')
+        # The ticket file as this program last read or wrote it. Anything else means another program saved it.
+        self.snapshot_stamp = None
+        # Without the journal, the IDs of the tickets changed since the last save. They win over another program's copy.
+        self.unsaved = set()
+        # Snapshots are numbered as they're taken, so an older one never gets written over a newer one.
+        self.snapshots_taken = itertools.count(1)
+        self.newest_written = 0
+        self.journal = TicketJournal(os.path.splitext(path)[0] + '.journal', self.save_snapshot)
+        # The report totals as of the last save (tickets.reports), see Reports.
+        self.reports_path = os.path.splitext(path)[0] + '.reports'
+        # Every workspace in a folder needs its own archive. tickets.json keeps the plain name it always had.
+        if os.path.basename(path) == TICKET_FILE:
+            self.archive_dir = os.path.join(os.path.dirname(path), ARCHIVE_DIR)
+        else:
+            self.archive_dir = os.path.splitext(path)[0] + '-' + ARCHIVE_DIR
+        # Without the journal a change means a full save, so a burst of changes is saved once.
+        self.save_batcher = FlushBatcher(self.save)
+
+    def read_snapshot(self, tickets):
+        '''Reads the ticket file into the store and returns its seq. Only call it holding the file lock.'''
+        seq = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as file:
+                lines = read_snapshot_lines(file)
+                seq, tickets.next_id = next(lines)
+                tickets.add_loaded(lines)
+        self.snapshot_stamp = file_stamp(self.path)
+        return seq
+
+    def load(self, search_index=True):
+        loaded_tickets = TicketStore()
+        # Locked so another program can't compact in between reading the ticket file and its journal.
+        with self.file_lock:
+            seq = self.read_snapshot(loaded_tickets)
+            if os.path.isdir(self.archive_dir) or ARCHIVE_AFTER_DAYS:
+                loaded_tickets.archive = self.open_archive()
+            # Before the journal, its changes are counted as they're replayed.
+            loaded_tickets.reports = self.read_reports()
+            # Without journal mode there is nothing to replay, but the seq still has to carry over.
+            self.journal.seq = seq
+            if USE_JOURNAL:
+                self.journal.replay(loaded_tickets, seq)
+        log_action('load', f"Tickets Loaded successfully ({len(loaded_tickets)})")
+        # The search index takes a while on a big file. The command line only builds it when it searches,
+        # the window builds it in the background after the tickets are on screen (search_index_job).
+        if search_index:
+            loaded_tickets.build_search_index()
+        loaded_tickets.storage = self
+        return loaded_tickets
+
+    def read_reports(self):
+        '''The Reports saved with the ticket file, or None if there are none that go with the file as it is now
+        (an older program saved it, or it was copied). Then they're worked out again when they're needed.'''
+        try:
+            with open(self.reports_path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if self.snapshot_stamp is None or data.get('stamp') != list(self.snapshot_stamp):
+            return None
+        return Reports.from_dict(data)
+
+    def save_reports(self, tickets):
+        '''Saves just the store's Reports, marked with the ticket file, so the next program to load it doesn't
+        have to work them out again. Only if they go with the file as it is on disk, returns whether they did.'''
+        with self.file_lock:
+            if tickets.reports is None or self.snapshot_stamp is None or file_stamp(self.path) != self.snapshot_stamp:
+                return False
+            if self.unsaved or read_snapshot_seq(self.path) != self.journal.seq:
+                # They count changes the ticket file doesn't have yet, replaying the journal would count them again.
+                return False
+            atomic_write(self.reports_path, lambda file: json.dump(dict(tickets.reports.to_dict(), stamp=self.snapshot_stamp), file))
+        return True
+
+    def newer_on_disk(self, seq):
+        # A snapshot taken later was written first (the Save button and a compaction can both be writing),
+        # or another program saved since this one looked. Either way what's there is at least as new.
+        stamp = file_stamp(self.path)
+        if stamp is None:
+            return False
+        disk_seq = read_snapshot_seq(self.path)
+        return disk_seq > seq or (disk_seq == seq and stamp != self.snapshot_stamp)
+
+    @timed('save')
+    def save_snapshot(self, snapshot, saved_ids=()):
+        '''Writes the ticket file and empties the journal. Returns False without writing if another program
+        saved a newer ticket file since this one last read it, sync reads that one in first.'''
+        # The slow writing happens before taking the file lock, so the other programs aren't kept waiting.
+        temp_path = write_temp(self.path, lambda file: write_snapshot_lines(file, snapshot))
+        with self.file_lock:
+            if snapshot.get('number', 0) < self.newest_written:
+                # A snapshot taken later, with every change this one has, is written already.
+                os.remove(temp_path)
+                return True
+            if self.newer_on_disk(snapshot['seq']):
+                os.remove(temp_path)
+                self.unsaved.update(saved_ids)
+                logging.info(f"Not saved, a newer {self.path} was saved first")
+                return False
+            replace_with_temp(temp_path, self.path)
+            self.snapshot_stamp = file_stamp(self.path)
+            self.newest_written = max(self.newest_written, snapshot.get('number', 0))
+            if snapshot.get('reports') is not None:
+                # Marked with the ticket file they go with. A crash before this leaves the old ones, which don't match.
+                atomic_write(self.reports_path, lambda file: json.dump(dict(snapshot['reports'], stamp=self.snapshot_stamp), file))
+            if USE_JOURNAL:
+                self.journal.trim(snapshot['seq'])
+        log_action('save', "Tickets Saved successfully")
+        return True
+
+    def take_snapshot(self, tickets):
+        # The changes so far are in this snapshot. If it can't be written they go back into unsaved.
+        saved_ids, self.unsaved = self.unsaved, set()
+        snapshot = make_snapshot(tickets, self.journal.seq)
+        snapshot['number'] = next(self.snapshots_taken)
+        return snapshot, saved_ids
+
+    def save(self, tickets):
+        '''Writes every ticket to the ticket file and empties the journal.'''
+        return self.save_snapshot(*self.take_snapshot(tickets))
+
+    def save_job(self, tickets):
+        # The snapshot is taken now so it matches the journal, the slow writing happens whenever the job runs.
+        snapshot, saved_ids = self.take_snapshot(tickets)
+        return lambda: self.save_snapshot(snapshot, saved_ids)
+
+    def save_until_written(self, tickets):
+        # Another program can save in between, then its changes are read in and this one tries again.
+        while not self.save(tickets):
+            self.sync(tickets)
+
+    def record(self, tickets, record):
+        '''Saves one change. In journal mode only the change itself gets written.'''
+        if USE_JOURNAL:
+            with self.file_lock:
+                self.sync(tickets)
+                self.journal.append(tickets, record)
+        else:
+            self.unsaved.update(record_ticket_ids(record))
+            self.save_batcher.request(tickets)
+
+    @contextlib.contextmanager
+    def changing(self, tickets):
+        with self.file_lock:
+            self.sync(tickets)
+            yield
+            if self.unsaved:
+                # Without the journal another program only sees a change once the whole file is saved,
+                # so it can't wait for the next flush.
+                self.save_batcher.cancel()
+                self.save_until_written(tickets)
+
+    def sync(self, tickets, wait=True):
+        '''Reads in what other programs changed since this one last looked and returns the changed tickets.
+        When nothing changed it costs a stat or two. Without wait it gives up if another program is writing.'''
+        if file_stamp(self.path) == self.snapshot_stamp and (not USE_JOURNAL or file_stamp(self.journal.path) == self.journal.stamp):
+            return []
+        if not self.file_lock.acquire(wait):
+            return []
+        try:
+            if file_stamp(self.path) == self.snapshot_stamp:
+                changed = self.journal.catch_up(tickets) if USE_JOURNAL else []
+            elif USE_JOURNAL and os.path.exists(self.path) and read_snapshot_seq(self.path) <= self.journal.seq:
+                # Another program compacted, but only folded in records this one has seen. Just the new journal is read.
+                self.snapshot_stamp = file_stamp(self.path)
+                changed = self.journal.catch_up(tickets)
+            else:
+                changed = self.merge_snapshot(tickets)
+        finally:
+            self.file_lock.release()
+        if changed:
+            logging.info(f"Read {len(changed)} tickets changed by another program in {self.path}")
+        return changed
+
+    def merge_snapshot(self, tickets):
+        '''Another program saved changes this one hasn't seen. The ticket file and journal are read into
+        a store of their own, and only the tickets that came out different are changed here.
+        Only call it holding the file lock.'''
+        fresh = TicketStore()
+        seq = self.read_snapshot(fresh)
+        if USE_JOURNAL:
+            known_seq = self.journal.seq
+            self.journal.replay(fresh, seq)
+            self.journal.seq = max(self.journal.seq, known_seq)
+        changed = []
+        new_tickets = []
+        for fresh_ticket in fresh:
+            ticket = tickets.by_id.get(fresh_ticket.ticket_id)
+            if ticket is None:
+                new_tickets.append(fresh_ticket)
+            elif fresh_ticket.ticket_id not in self.unsaved and saved_form(ticket) != saved_form(fresh_ticket):
+                tickets.refresh(ticket, fresh_ticket)
+                changed.append(ticket)
+        # Added in ID order, the way they were made, which the reports go by.
+        new_tickets.sort(key=lambda ticket: ticket.ticket_id)
+        changed.extend(tickets.add(ticket) for ticket in new_tickets)
+        # Gone from the file means the other program archived them.
+        gone = [ticket for ticket in tickets if ticket.ticket_id not in fresh.by_id and ticket.ticket_id not in self.unsaved]
+        if gone:
+            tickets.drop(gone)
+            tickets.archive = self.open_archive()
+        tickets.next_id = max(tickets.next_id, fresh.next_id)
+        if self.unsaved:
+            self.save_batcher.request(tickets)
+        return changed
+
+    def open_archive(self):
+        # Only loaded when there is an archive to use.
+        from ticketarchive import TicketArchive
+        return TicketArchive(self.archive_dir)
+
+    def archive_old_tickets(self, tickets, days=ARCHIVE_AFTER_DAYS):
+        '''Moves tickets closed more than days ago into the archive and saves the smaller ticket file.'''
+        # Locked from start to end. Another program bringing a ticket back rewrites a month's segment too,
+        # if both did at once one would write over the other and lose its tickets.
+        with self.file_lock:
+            self.sync(tickets)
+            # Opened again to see every segment other programs wrote, a month is added to what's on disk.
+            tickets.archive = self.open_archive()
+            cutoff = datetime.now() - timedelta(days=days)
+            old = []
+            for ticket in tickets.newest_first("closed"):
+                data = ticket_data(ticket)
+                if closed_since(data) < cutoff:
+                    old.append(data)
+            if not old:
+                return 0
+            # Into the archive first and only then out of the ticket file. A crash in between leaves
+            # them in both places, and the copy in the ticket file wins until the next run.
+            tickets.archive.add(old)
+            tickets.drop([tickets.by_id[data['id']] for data in old])
+            if USE_JOURNAL:
+                # The ticket file saved next has the same seq as before, other programs would take it for one
+                # they've seen and keep the archived tickets. A record of its own moves the seq on.
+                self.record(tickets, {'op': 'archive', 'ids': [data['id'] for data in old]})
+            self.save_until_written(tickets)
+        log_action('archive', f"Archived {len(old)} tickets closed before {cutoff.strftime(DATE_FORMAT)}")
+        return len(old)
+
+    def close(self, tickets, compact=False):
+        self.save_batcher.cancel()
+        self.journal.finish_compaction()
+        # Archiving saves the ticket file itself.
+        archived = compact and ARCHIVE_AFTER_DAYS and self.archive_old_tickets(tickets)
+        if (compact or not USE_JOURNAL) and not archived:
+            self.save_until_written(tickets)
+        if USE_JOURNAL:
+            self.journal.close()
+
+
+def saved_form(ticket):
+    # The line the ticket would be saved as, to tell whether two copies of a ticket are the same.
+    return ticket.saved_line() or json.dumps(ticket_to_dict(ticket))
+
+
+def default_workspace():
+    return SQLITE_FILE if STORAGE == 'sqlite' else TICKET_FILE
+
+
+def open_storage(path=None):
+    '''The storage for a ticket file, TICKET_FILE (or SQLITE_FILE) if none is given. .db files are SQLite.'''
+    path = path or default_workspace()
+    if path.endswith('.db'):
+        # Only loaded when it's used.
+        from ticketsqlite import SqliteStorage
+        return SqliteStorage(path)
+    return JsonStorage(path)
+
+
+@timed('load')
+def load_tickets(search_index=True, path=None):
+    return open_storage(path).load(search_index)
+
+
+def save_tickets(tickets):
+    tickets.storage.save(tickets)
+
+
+@timed('record change')
+def record_change(tickets, record):
+    '''Saves one change to wherever the tickets came from.'''
+    if tickets.storage is not None:
+        tickets.storage.record(tickets, record)
+
+
+def finish_saving(tickets, compact=False):
+    '''Gets every recorded change on disk now instead of at the next flush. Call it before exiting.
+    compact also folds the journal back into the ticket file.'''
+    tickets.storage.close(tickets, compact)
+
+
+def changing(tickets):
+    '''Put a change and its record_change inside "with changing(tickets):". Other programs using the same
+    file wait until it's recorded, and their changes are read in first, so a change never lands on top
+    of one it hasn't seen and two new tickets never get the same ID.'''
+    if tickets.storage is None:
+        return contextlib.nullcontext()
+    return tickets.storage.changing(tickets)
+
+
+@timed('check for changes', profile=False)
+def check_for_changes(tickets, wait=False):
+    '''Reads in changes other programs made to the tickets and returns the changed tickets.
+    The store's listeners hear about each one, so views update themselves.'''
+    if tickets.storage is None:
+        return []
+    return tickets.storage.sync(tickets, wait)
+
+
+###### WORKSPACES ######
+
+# Rough sizes for guessing how much memory a store takes, from benchmarks/memory.py.
+TICKET_BYTES = 1200
+LAZY_TICKET_BYTES = 350
+SEARCH_INDEX_BYTES = 550
+CONTACT_INDEX_BYTES = 180
+
+
+def workspace_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def estimate_store_bytes(tickets):
+    '''A rough guess at the memory a store takes, good enough to decide which workspace to close.'''
+    if not isinstance(tickets, TicketStore):
+        # The SQLite store only keeps the tickets it has read.
+        return len(tickets.loaded) * TICKET_BYTES
+    total = 0
+    for ticket in tickets:
+        line = ticket.saved_line()
+        total += LAZY_TICKET_BYTES + len(line) if line else TICKET_BYTES
+    if tickets.search_index is not None:
+        total += len(tickets) * SEARCH_INDEX_BYTES
+    if tickets.contacts is not None:
+        total += len(tickets.contacts.keys) * CONTACT_INDEX_BYTES
+    return total
+
+
+class WorkspaceCache:
+    '''Every open workspace (ticket file) and its store, used longest ago first.
+    When they take more than the budget the oldest ones are saved and closed, never one still in use.'''
+
+    def __init__(self, budget_mb=WORKSPACE_CACHE_MB):
+        self.budget = budget_mb * 1024 * 1024
+        self.stores = OrderedDict()
+
+    def key(self, path):
+        return os.path.abspath(path)
+
+    def get(self, path):
+        '''The store for path if it's open, marked as just used. None if it has to be loaded.'''
+        key = self.key(path)
+        if key not in self.stores:
+            return None
+        self.stores.move_to_end(key)
+        return self.stores[key]
+
+    def add(self, path, tickets, in_use=()):
+        '''Keeps a freshly loaded store. Returns the paths of workspaces closed to make room.
+        Neither it nor the stores in in_use (on screen, served by the API...) are closed, however much they take.'''
+        self.stores[self.key(path)] = tickets
+        kept = [tickets, *in_use]
+        closed = []
+        sizes = {key: estimate_store_bytes(store) for key, store in self.stores.items()}
+        for key, store in list(self.stores.items()):
+            if sum(sizes.values()) <= self.budget:
+                break
+            if any(store is used for used in kept):
+                continue
+            del self.stores[key]
+            del sizes[key]
+            # Whoever was listening is done with it, a change now would only reach views that are gone.
+            store.listeners.clear()
+            finish_saving(store)
+            logging.info(f"Closed workspace {key} to stay under {self.budget // (1024 * 1024)} MB")
+            closed.append(key)
+        return closed
+
+    def __iter__(self):
+        '''(path, store) for every open workspace.'''
+        return iter(list(self.stores.items()))
+
+    def __len__(self):
+        return len(self.stores)
+
+    def close_all(self, compact=False):
+        for key, store in self:
+            finish_saving(store, compact)
+        self.stores.clear()
+
+
+def render_ticket(ticket):
+    if ticket.rendered is None:
+        ticket.rendered = f'Ticket ID: {ticket.ticket_id} - {ticket}\n\n'
+    return ticket.rendered
+
+
+def ticket_key(ticket):
+    return (ticket.created_at, ticket.ticket_id)
+
+
+###### IMPORT AND EXPORT ######
+
+# json is one big list, jsonl (JSON Lines) is one ticket per line. Imports read csv or jsonl, a line at a time.
+EXPORT_FORMATS = ('json', 'jsonl', 'csv')
+IMPORT_FORMATS = ('jsonl', 'csv')
+CSV_FIELDS = ['id', 'title', 'description', 'phone_number', 'status', 'is_open', 'creation_date', 'closed_date', 'notes']
+
+# An import file with problems lists this many of them, the first few usually show what's wrong.
+IMPORT_PROBLEMS_SHOWN = 20
+
+
+def format_of(path, default='jsonl'):
+    '''What kind of ticket file path is going by its name: json, jsonl or csv.'''
+    extension = os.path.splitext(path)[1].lower()
+    return {'.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv'}.get(extension, default)
+
+
+def exported_tickets(tickets, statuses=STATUSES):
+    '''Every ticket with the given statuses as a dict, newest first, archived ones included.
+    One at a time, and closed tickets nobody has looked at are never loaded, so a big export doesn't fill memory.'''
+    if hasattr(tickets, 'ticket_dicts'):
+        # The database hands them over a batch at a time without keeping them.
+        return tickets.ticket_dicts(statuses)
+    return (ticket_data(ticket) for ticket in tickets.newest_first(*statuses, archived=True))
+
+
+def export_tickets(tickets, output, file_format='json', statuses=STATUSES):
+    '''Writes the tickets to the open file output and returns how many there were.
+    Each ticket is written as soon as it's read, the whole export is never one big string.'''
+    return write_export(exported_tickets(tickets, statuses), output, file_format)
+
+
+def export_job(tickets, path, file_format='json', statuses=STATUSES):
+    '''export_tickets in two halves, for exporting in the background. What's needed from the store is copied
+    now, on the thread that changes it. The function returned writes path from the copy on any thread
+    and returns how many tickets there were, and the store can go on changing meanwhile.'''
+    if hasattr(tickets, 'ticket_dicts'):
+        rows = tickets.storage.copied_rows(statuses)
+    else:
+        rows = copied_rows(tickets, statuses)
+
+    def write():
+        with open(path, 'w', newline='') as output:
+            return write_export(rows(), output, file_format)
+    return write
+
+
+def copied_rows(tickets, statuses=STATUSES):
+    # Taken holding the file lock with other programs' changes read in, so the archive and the store agree.
+    archived = None
+    with changing(tickets):
+        # The saved line of every ticket in the store, a lazy ticket's is the line it was read from so this is quick.
+        live = [(ticket_key(ticket), saved_form(ticket)) for ticket in tickets.newest_first(*statuses)]
+        if tickets.archive is not None and "closed" in statuses:
+            # Opened again, another program may have changed which segments there are.
+            from ticketarchive import TicketArchive, copied_tickets
+            archived = TicketArchive(tickets.archive.folder).copy()
+            skip = set(tickets.by_id)
+
+    def rows():
+        found = ((key, json.loads(line)) for key, line in live)
+        if archived is not None:
+            found = heapq.merge(found, ((ticket_key(ticket), ticket_data(ticket)) for ticket in copied_tickets(archived, skip)),
+                                key=lambda pair: pair[0], reverse=True)
+        return (data for key, data in found)
+    return rows
+
+
+@timed('export')
+def write_export(rows, output, file_format='json'):
+    '''Writes the ticket dicts in rows to the open file output as csv, jsonl or json. Returns how many there were.'''
+    count = 0
+    if file_format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for data in rows:
+            # The notes don't fit in one column any other way.
+            data['notes'] = json.dumps(data.get('notes', []))
+            writer.writerow(data)
+            count += 1
+    elif file_format == 'jsonl':
+        for data in rows:
+            output.write(json.dumps(data) + '\n')
+            count += 1
+    else:
+        output.write('[')
+        for data in rows:
+            output.write((',\n' if count else '\n') + json.dumps(data))
+            count += 1
+        output.write('\n]\n')
+    return count
+
+
+def import_rows(file, file_format):
+    '''(line number, row) for every ticket in an import file, read as it goes. A CSV row is a dict,
+    a JSON Lines row is still the line's text, import_ticket reads it so a broken line is just one more problem.'''
+    if file_format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(file, 1):
+        if line.strip():
+            yield line_number, line
+
+
+def import_text(row, field, required=False):
+    value = row.get(field)
+    if value is None or value == '':
+        if required:
+            raise ValueError(f'no {field}')
+        return ''
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f'{field} should be text')
+    # A phone number in a JSON file can come as a number.
+    return str(value)
+
+
+def import_date(value, field):
+    '''A date from an import file as a DATE_FORMAT string, or None if there isn't one.
+    ISO dates (2024-01-31 09:30:00) work too, most other programs write those.'''
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        for read in (parse_date, datetime.fromisoformat):
+            try:
+                return read(value.strip()).replace(tzinfo=None, microsecond=0).strftime(DATE_FORMAT)
+            except ValueError:
+                pass
+    raise ValueError(f"{field} {value!r} isn't a date like 01-31-2024 09:30:00 or 2024-01-31 09:30:00")
+
+
+def import_notes(value, creation_date):
+    '''Notes from an import file: a list of {'note': ..., 'timestamp': ...} like an export has, or of plain text.
+    In a CSV file that list is JSON, and any other text is taken as a single note.'''
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value) if value.lstrip().startswith('[') else [value]
+        except ValueError:
+            value = [value]
+    if not isinstance(value, list):
+        raise ValueError('notes should be a list')
+    notes = []
+    for note in value:
+        if isinstance(note, str):
+            note = {'note': note}
+        if not isinstance(note, dict) or not isinstance(note.get('note'), str):
+            raise ValueError('every note needs its text in "note"')
+        # A note without a time gets the ticket's, that's the closest there is.
+        timestamp = import_date(note.get('timestamp'), 'note timestamp') or creation_date
+        notes.append(Note(note['note'], None if timestamp is None else to_seconds(parse_date(timestamp))))
+    return notes
+
+
+def import_status(row):
+    status = row.get('status')
+    if status:
+        status = str(status).strip().lower()
+        if status not in STATUS_NAMES:
+            raise ValueError(f"status {row['status']!r} isn't one of {', '.join(STATUSES)}")
+        return status
+    # Only is_open, like files from before pending existed.
+    is_open = row.get('is_open')
+    if is_open in (None, '', True, 'True', 'true', '1', 1):
+        return "open"
+    if is_open in (False, 'False', 'false', '0', 0):
+        return "closed"
+    raise ValueError(f"is_open {is_open!r} should be true or false")
+
+
+def import_ticket(row):
+    '''Checks one row of an import file and makes a Ticket from it, or raises ValueError saying what's wrong.
+    Only the title is needed. The ID is left out, the store hands out new ones so they can't clash.'''
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except ValueError as error:
+            raise ValueError(f'not JSON ({error})')
+    if not isinstance(row, dict):
+        raise ValueError('should be a JSON object, one ticket per line')
+    creation_date = import_date(row.get('creation_date'), 'creation_date')
+    status = import_status(row)
+    return Ticket(
+        import_text(row, 'title', required=True),
+        import_text(row, 'description'),
+        import_text(row, 'phone_number'),
+        creation_date,
+        notes=import_notes(row.get('notes'), creation_date),
+        is_open=status != "closed",
+        status=status,
+        closed_date=import_date(row.get('closed_date'), 'closed_date') if status == "closed" else None
+    )
+
+
+def read_import(path, file_format=None):
+    '''Reads and checks a whole import file. Returns (tickets, problems), problems being "line 12: no title" for
+    the rows that can't be imported. Nothing should be imported while there are problems, half an import is worse than none.'''
+    file_format = file_format or format_of(path)
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError(f"Can't import {file_format}, only {' or '.join(IMPORT_FORMATS)}")
+    new_tickets = []
+    problems = []
+    bad_rows = 0
+    # utf-8-sig, so the mark Excel puts at the start of a CSV file doesn't end up in the first column's name.
+    with open(path, 'r', newline='', encoding='utf-8-sig') as file:
+        for line_number, row in import_rows(file, file_format):
+            try:
+                new_tickets.append(import_ticket(row))
+            except ValueError as error:
+                bad_rows += 1
+                if len(problems) < IMPORT_PROBLEMS_SHOWN:
+                    problems.append(f'line {line_number}: {error}')
+    if bad_rows > len(problems):
+        problems.append(f'and {bad_rows - len(problems)} more')
+    return new_tickets, problems
+
+
+# How many tickets import_steps adds at a time, about a tenth of a second's worth.
+IMPORT_STEP = 2000
+
+
+@timed('import')
+def import_tickets(tickets, new_tickets):
+    '''Adds a batch of tickets as one change: one record, one save, and another program sees all of them or none.'''
+    added = []
+    for added in import_steps(tickets, new_tickets):
+        pass
+    return added
+
+
+def import_steps(tickets, new_tickets, step=IMPORT_STEP):
+    '''import_tickets a few at a time, for the window, which gets to draw in between. Every next() adds up to step
+    more and yields the tickets added so far, the one after the last records them. It's still one change,
+    the file lock is held from the first step to the record, so don't start another change in between.'''
+    added = []
+    records = []
+    with changing(tickets):
+        for start in range(0, len(new_tickets), step):
+            batch = tickets.add_many(new_tickets[start:start + step])
+            added.extend(batch)
+            # The record is made as it goes too, all at the end it's a second's work for a big import.
+            records.extend(ticket_to_dict(ticket) for ticket in batch)
+            yield added
+        log_action('import', f"Imported {len(added)} tickets")
+        record_change(tickets, {'op': 'add_many', 'tickets': records})
+
+
+###### BATCH CHANGES ######
+
+# What a batch change can do to each of its tickets. title, description and phone_number set that field to the text given.
+BATCH_ACTIONS = ('close', 'pending', 'reopen', 'note', 'title', 'description', 'phone_number')
+BATCH_STATUSES = {'close': "closed", 'pending': "pending", 'reopen': "open"}
+
+# A range bigger than this is more likely a typo (1-100000 for 1-100) than a real batch.
+MAX_BATCH = 50000
+
+
+def parse_ticket_ids(text):
+    '''The ticket IDs in text like "12, 15-20 31", in that order and each only once. Raises ValueError for anything else.'''
+    ticket_ids = {}
+    for part in re.split(r'[\s,]+', text.strip()):
+        if not part:
+            continue
+        first, dash, last = part.partition('-')
+        try:
+            start = int(first)
+            end = int(last) if dash else start
+        except ValueError:
+            raise ValueError(f"{part} isn't a ticket ID or a range like 15-20")
+        if end < start:
+            raise ValueError(f"{part} goes backwards, try {end}-{start}")
+        if len(ticket_ids) + end - start >= MAX_BATCH:
+            raise ValueError(f"That's more than {MAX_BATCH} tickets")
+        ticket_ids.update(dict.fromkeys(range(start, end + 1)))
+    return list(ticket_ids)
+
+
+def format_ticket_ids(ticket_ids):
+    '''The other way around from parse_ticket_ids: [3, 4, 5, 9] is "3-5, 9".'''
+    runs = []
+    for ticket_id in sorted(set(ticket_ids)):
+        if runs and runs[-1][1] == ticket_id - 1:
+            runs[-1][1] = ticket_id
+        else:
+            runs.append([ticket_id, ticket_id])
+    return ', '.join(str(start) if start == end else f'{start}-{end}' for start, end in runs)
+
+
+@timed('batch change')
+def batch_change(tickets, ticket_ids, action, text=None):
+    '''Does action (one of BATCH_ACTIONS) to every ticket in ticket_ids as one change: one record, one save, and another
+    program sees all of it or none. Tickets that already have the status asked for are left alone.
+    Returns the tickets that changed. Raises ValueError without changing anything if an ID isn't there,
+    and if a change fails partway the tickets changed before it are put back the way they were.'''
+    if action not in BATCH_ACTIONS:
+        raise ValueError(f"{action} isn't one of {', '.join(BATCH_ACTIONS)}")
+    if action in ('note', 'title', 'description') and not (text or '').strip():
+        raise ValueError(f"The {action} cannot be empty.")
+    with changing(tickets):
+        # Every ID is checked before any archived ticket is brought back for the change.
+        missing = [ticket_id for ticket_id in ticket_ids if not tickets.has(ticket_id)]
+        if missing:
+            raise ValueError(f"No ticket with ID {format_ticket_ids(missing)}")
+        found = [(ticket_id, tickets.get(ticket_id)) for ticket_id in ticket_ids]
+        # Kept to put back if the batch fails partway. Nothing of it is recorded then, so memory has to match.
+        before = [(ticket, ticket_data(ticket)) for ticket_id, ticket in found]
+        try:
+            changed = apply_batch(tickets, found, action, text)
+        except BaseException:
+            for ticket, data in before:
+                if ticket_data(ticket) != data:
+                    tickets.refresh(ticket, ticket_from_dict(data))
+            raise
+    return changed
+
+
+def apply_batch(tickets, found, action, text):
+    # The part of batch_change that changes tickets, found is [(ticket ID, ticket)].
+    records = []
+    changed = []
+    for ticket_id, ticket in found:
+        if action in BATCH_STATUSES:
+            status = BATCH_STATUSES[action]
+            if ticket.status == status:
+                continue
+            tickets.set_status(ticket, status)
+            log_action('status', f"Ticket {ticket_id} set to {status} (batch)", ticket_id)
+            records.append({'op': 'status', 'id': ticket_id, 'status': status, 'closed_date': ticket.closed_date})
+        elif action == 'note':
+            note_entry = tickets.add_note(ticket, text)
+            log_action('note', f"Ticket updated {ticket_id} {text} (batch)", ticket_id)
+            records.append({'op': 'note', 'id': ticket_id, 'note': note_entry})
+        else:
+            tickets.update(ticket, **{action: text})
+            log_action('edit', f"Ticket {action} updated {text} (batch)", ticket_id)
+            records.append({'op': 'set', 'id': ticket_id, 'fields': {action: text}})
+        changed.append(ticket)
+    if records:
+        record_change(tickets, {'op': 'batch', 'records': records})
+    return changed
+
+
+###### BACKGROUND WORK ######
+
+class IOWorker:
+    '''One background thread for the slow file work (loading, saving, reading the log),
+    so the window never sits waiting on the disk. Jobs run one at a time in the order they came in.
+    Nothing is called back from the worker thread. Finished jobs wait in a queue until the
+    program picks them up with finished() on its own thread.'''
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.latest_save = None
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, work, done=None, busy=None, finished=None):
+        '''Runs work() in the background. done(result) and the status messages come back through finished().'''
+        self.jobs.put((work, done, busy, finished))
+
+    def save(self, tickets):
+        # If a save is still waiting its turn it just gets the newer job, a burst of saves only writes once.
+        job = tickets.storage.save_job(tickets)
+        with self.lock:
+            already_queued = self.latest_save is not None
+            self.latest_save = job
+        if not already_queued:
+            self.submit(self.write_latest_save, busy="Saving tickets", finished="Tickets saved")
+
+    def write_latest_save(self):
+        with self.lock:
+            job = self.latest_save
+            self.latest_save = None
+        job()
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            work, done, busy, finished = job
+            if busy:
+                self.results.put((f'{busy}...', None, None))
+            try:
+                result = work()
+            except Exception as error:
+                logging.exception(f"{busy or 'Background job'} failed")
+                self.results.put((f"{busy or 'Background job'} failed: {error}", None, None))
+                continue
+            self.results.put((finished, done, result))
+
+    def finished(self):
+        '''Every (message, done, result) that came back since the last call.'''
+        while True:
+            try:
+                yield self.results.get_nowait()
+            except queue.Empty:
+                return
+
+    def stop(self):
+        '''Lets the queued jobs finish, then ends the thread.'''
+        self.jobs.put(None)
+        self.thread.join()
@@ -0,0 +1,507 @@
+# Local HTTP API for the Ticket System, so other tools can create and look up tickets.
+# Start it with "ticketsystem serve", or from the window (Settings > Start API Server).
+#
+#   curl localhost:8765/tickets                          open and pending tickets, newest first
+#   curl 'localhost:8765/tickets?status=closed&limit=20&before=1234'
+#   curl localhost:8765/tickets/12
+#   curl 'localhost:8765/search?q=printer&status=open'
+#   curl localhost:8765/counts
+#   curl -X POST localhost:8765/tickets -H 'Content-Type: application/json' -d '{"title": "Printer jam", "description": "Floor 2", "phone_number": "555-1234"}'
+#   curl -X POST localhost:8765/tickets/12/notes -H 'Content-Type: application/json' -d '{"note": "Called back"}'
+#   curl -X POST localhost:8765/tickets/12/status -H 'Content-Type: application/json' -d '{"status": "closed"}'
+#   curl -X POST localhost:8765/batch -H 'Content-Type: application/json' -d '{"ids": "40-52,60", "action": "close"}'     one change for all of them
+#
+# Tickets come back the way they're saved in tickets.json. It only listens on this computer and has no passwords.
+# So a web page open in the browser can't use it either: a POST has to be sent as application/json (a page
+# can't send that without asking first), an Origin has to be this computer, and Host has to be localhost or
+# 127.0.0.1 (a page's own name pointed at 127.0.0.1 gets turned away).
+#
+# Requests are handled by a pool of threads. Every change goes to one writer, which runs it on the thread
+# that owns the store (the window's thread, or the main thread for "ticketsystem serve"), one at a time.
+# Lists and single tickets are read from a TicketSnapshot, which never changes once it's made, so reads
+# never wait for a write. Searches use the store's search index and go through the writer like changes do.
+
+
+import bisect
+import concurrent.futures
+import heapq
+import itertools
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+from ticketcore import (STATUSES, BATCH_ACTIONS, BATCH_STATUSES, Ticket, changing, record_change, check_for_changes,
+                        saved_form, ticket_key, ticket_to_dict, log_action, parse_ticket_ids, batch_change)
+
+
+API_HOST = '127.0.0.1'
+API_PORT = 8765
+
+# Threads answering requests. Most of a request is waiting on the network, so a few go a long way.
+API_THREADS = 8
+
+# How long (seconds) a request waits for the writer before giving up with a 503.
+WRITER_TIMEOUT = 10
+
+# Most tickets a list or search returns at once.
+MAX_LIMIT = 500
+
+# Names this computer goes by, the only ones accepted in the Host and Origin headers.
+LOCAL_NAMES = ('localhost', '127.0.0.1', '::1')
+
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+###### SNAPSHOTS ######
+
+class TicketSnapshot:
+    '''Every ticket in the store as saved JSON text, at one moment. Nothing in it is ever changed.
+    A change makes a new snapshot that shares the big base with the old one and only copies the
+    small overlay of tickets changed since the base was made. Once the overlay gets big a new base is made.'''
+
+    FOLD_AFTER = 1000
+
+    def __init__(self, base, base_keys, overlay, counts):
+        # ticket_id -> (key, status, text). Tickets in the overlay are newer than their copy in the base.
+        self.base = base
+        self.overlay = overlay
+        # status -> the base's keys with that status, oldest first.
+        self.base_keys = base_keys
+        self.counts = counts
+
+    @classmethod
+    def from_store(cls, tickets):
+        base = {ticket.ticket_id: (ticket_key(ticket), ticket.status, saved_form(ticket)) for ticket in tickets}
+        base_keys = {status: list(tickets.by_status[status]) for status in STATUSES}
+        return cls(base, base_keys, {}, {status: tickets.count(status) for status in STATUSES})
+
+    def with_changes(self, tickets, changed):
+        '''A new snapshot with the changed tickets (from tickets, the live store) in it.'''
+        if len(self.overlay) + len(changed) > self.FOLD_AFTER:
+            return TicketSnapshot.from_store(tickets)
+        overlay = dict(self.overlay)
+        for ticket in changed:
+            overlay[ticket.ticket_id] = (ticket_key(ticket), ticket.status, saved_form(ticket))
+        snapshot = TicketSnapshot(self.base, self.base_keys, overlay, {status: tickets.count(status) for status in STATUSES})
+        # Archiving takes tickets out of the store without telling the listeners, so that needs a new base.
+        if len(snapshot) != len(tickets):
+            return TicketSnapshot.from_store(tickets)
+        return snapshot
+
+    def __len__(self):
+        return len(self.base) + sum(1 for ticket_id in self.overlay if ticket_id not in self.base)
+
+    def entry(self, ticket_id):
+        return self.overlay.get(ticket_id) or self.base.get(ticket_id)
+
+    def get(self, ticket_id):
+        entry = self.entry(ticket_id)
+        return entry[2] if entry else None
+
+    def key(self, ticket_id):
+        entry = self.entry(ticket_id)
+        return entry[0] if entry else None
+
+    def count(self, status):
+        return self.counts[status]
+
+    def close(self):
+        # Nothing to let go of, a snapshot is just left for the next request.
+        pass
+
+    def newest_base_keys(self, keys, before):
+        # Walked by index, a slice would copy the whole list. Tickets in the overlay are taken from there.
+        end = len(keys) if before is None else bisect.bisect_left(keys, before)
+        for index in range(end - 1, -1, -1):
+            if keys[index][1] not in self.overlay:
+                yield keys[index]
+
+    def page(self, statuses, before=None, limit=50):
+        '''Up to limit tickets (as text) with the given statuses, older than the key before, newest first.'''
+        runs = [self.newest_base_keys(self.base_keys[status], before) for status in statuses]
+        runs.append(sorted((entry[0] for entry in self.overlay.values()
+                            if entry[1] in statuses and (before is None or entry[0] < before)), reverse=True))
+        return [self.get(ticket_id) for created_at, ticket_id in itertools.islice(heapq.merge(*runs, reverse=True), limit)]
+
+
+class SqliteSnapshot:
+    '''The same reads as TicketSnapshot, from an SQLite workspace. Each one is its own read transaction,
+    and SQLite keeps what a transaction sees from changing under it. close() ends it.'''
+
+    # Every request thread keeps its own connection, opening one for each request costs more than the request.
+    connections = threading.local()
+
+    def __init__(self, path):
+        reader = getattr(self.connections, 'reader', None)
+        if reader is None or reader[0] != path:
+            # Only loaded when it's used.
+            from ticketsqlite import SqliteTicketStore
+            connection = sqlite3.connect(path)
+            reader = self.connections.reader = (path, connection, SqliteTicketStore(connection))
+        path, self.connection, self.tickets = reader
+        self.connection.execute('BEGIN')
+        # Tickets read by an earlier request could be out of date.
+        self.tickets.loaded.clear()
+
+    def get(self, ticket_id):
+        ticket = self.tickets.get(ticket_id)
+        return saved_form(ticket) if ticket else None
+
+    def key(self, ticket_id):
+        ticket = self.tickets.get(ticket_id)
+        return ticket_key(ticket) if ticket else None
+
+    def count(self, status):
+        # The store's own counts are from when the connection was opened.
+        return self.connection.execute('SELECT COUNT(*) FROM tickets WHERE status = ?', (status,)).fetchone()[0]
+
+    def page(self, statuses, before=None, limit=50):
+        return [saved_form(ticket) for ticket in self.tickets.page(statuses, before, limit)]
+
+    def close(self):
+        self.connection.rollback()
+
+
+###### WRITER ######
+
+class StoreWriter:
+    '''Runs every change (and every search) on the one thread that owns the store, one at a time.
+    Other threads hand it jobs with submit and wait for the answer. The owning thread calls
+    run_pending now and then (the window does it from root.after), or run_forever.'''
+
+    def __init__(self, tickets):
+        self.jobs = queue.Queue()
+        self.changed = {}
+        self.tickets = None
+        self.snapshot = None
+        self.use_store(tickets)
+
+    def use_store(self, tickets):
+        '''Serves another store (the window switched workspaces). Call it on the owning thread.'''
+        if self.tickets is not None:
+            self.tickets.listeners.remove(self.ticket_changed)
+        self.tickets = tickets
+        self.changed = {}
+        tickets.listeners.append(self.ticket_changed)
+        # SQLite can give every read its own unchanging view, the in-memory store needs snapshots.
+        self.snapshot = TicketSnapshot.from_store(tickets) if hasattr(tickets, 'by_status') else None
+
+    def ticket_changed(self, ticket):
+        # A listener, so changes made in the window or by another program end up in the snapshot too.
+        self.changed[ticket.ticket_id] = ticket
+
+    def read_view(self):
+        if self.snapshot is not None:
+            return self.snapshot
+        return SqliteSnapshot(self.tickets.storage.path)
+
+    def submit(self, job):
+        '''Runs job(tickets) on the owning thread and returns what it returned. Errors are raised here.'''
+        future = Future()
+        self.jobs.put((job, future))
+        try:
+            return future.result(WRITER_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            # Cancelled before it started, it never runs. Too late to cancel means it's running and will make
+            # its change, so the answer is waited for instead of telling the caller it failed.
+            if future.cancel():
+                raise APIError(503, 'The ticket store is busy, try again')
+            return future.result()
+
+    def run_pending(self):
+        '''Runs every job waiting, then publishes one new snapshot for all of them.'''
+        while True:
+            try:
+                job, future = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            self.run(job, future)
+        self.publish()
+
+    def run(self, job, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(job(self.tickets))
+        except Exception as error:
+            future.set_exception(error)
+
+    def publish(self):
+        if self.changed and self.snapshot is not None:
+            self.snapshot = self.snapshot.with_changes(self.tickets, list(self.changed.values()))
+        self.changed = {}
+
+    def run_forever(self, stop, check_every=2.0):
+        '''Runs jobs as they come until stop (a threading.Event) is set. Also reads in changes
+        other programs make to the same ticket file every check_every seconds.'''
+        while not stop.is_set():
+            try:
+                job, future = self.jobs.get(timeout=check_every)
+            except queue.Empty:
+                check_for_changes(self.tickets)
+                self.publish()
+                continue
+            self.run(job, future)
+            self.run_pending()
+
+
+###### JOBS ######
+# What the requests ask the writer to do. Each one runs on the owning thread with the store.
+
+def create_ticket(title, description, phone_number):
+    def job(tickets):
+        with changing(tickets):
+            ticket = tickets.add(Ticket(title, description, phone_number))
+            log_action('add', f"Ticket Added {title} (API)", ticket.ticket_id)
+            record_change(tickets, {'op': 'add', 'ticket': ticket_to_dict(ticket)})
+        return saved_form(ticket)
+    return job
+
+
+def add_note(ticket_id, note):
+    def job(tickets):
+        with changing(tickets):
+            ticket = tickets.get(ticket_id)
+            if ticket is None:
+                raise APIError(404, f'No ticket with ID {ticket_id}')
+            note_entry = tickets.add_note(ticket, note)
+            log_action('note', f"Ticket updated {ticket_id} {note} (API)", ticket_id)
+            record_change(tickets, {'op': 'note', 'id': ticket_id, 'note': note_entry})
+        return saved_form(ticket)
+    return job
+
+
+def set_status(ticket_id, status):
+    def job(tickets):
+        with changing(tickets):
+            ticket = tickets.get(ticket_id)
+            if ticket is None:
+                raise APIError(404, f'No ticket with ID {ticket_id}')
+            tickets.set_status(ticket, status)
+            log_action('status', f"Ticket {ticket_id} set to {status} (API)", ticket_id)
+            record_change(tickets, {'op': 'status', 'id': ticket_id, 'status': status, 'closed_date': ticket.closed_date})
+        return saved_form(ticket)
+    return job
+
+
+def change_many(ticket_ids, action, text):
+    def job(tickets):
+        try:
+            changed = batch_change(tickets, ticket_ids, action, text)
+        except ValueError as error:
+            # The action and text were checked already, so it's an ID that isn't there.
+            raise APIError(404, str(error))
+        return [saved_form(ticket) for ticket in changed]
+    return job
+
+
+def search(query, fields, statuses, limit):
+    def job(tickets):
+        return [saved_form(ticket) for ticket in tickets.search(query, fields=fields, statuses=statuses)[:limit]]
+    return job
+
+
+###### HTTP ######
+
+def ticket_list_body(texts, extra=''):
+    # The tickets are JSON text already, they're joined instead of parsed and written again.
+    return '{"tickets": [' + ', '.join(texts) + ']' + extra + '}'
+
+
+class TicketRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'TicketSystem'
+
+    def do_GET(self):
+        self.handle_api(self.get_routes)
+
+    def do_POST(self):
+        self.handle_api(self.post_routes)
+
+    def handle_api(self, routes):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        self.query = parse_qs(url.query)
+        try:
+            self.check_caller()
+            status, body = routes(parts)
+        except APIError as error:
+            status, body = error.status, json.dumps({'error': str(error)})
+        except Exception as error:
+            logging.exception(f"API request failed: {self.command} {self.path}")
+            status, body = 500, json.dumps({'error': str(error)})
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def get_routes(self, parts):
+        writer = self.server.writer
+        if parts == ['tickets']:
+            statuses = self.statuses('open,pending')
+            limit = self.limit()
+            view = writer.read_view()
+            try:
+                before = None
+                if 'before' in self.query:
+                    before = view.key(self.ticket_id(self.query['before'][0]))
+                    if before is None:
+                        raise APIError(404, 'No ticket with that ID to list from')
+                texts = view.page(statuses, before, limit)
+            finally:
+                view.close()
+            # The last ticket's ID is where the next page starts.
+            next_page = json.loads(texts[-1])['id'] if len(texts) == limit else None
+            return 200, ticket_list_body(texts, f', "next": {json.dumps(next_page)}')
+        if len(parts) == 2 and parts[0] == 'tickets':
+            view = writer.read_view()
+            try:
+                text = view.get(self.ticket_id(parts[1]))
+            finally:
+                view.close()
+            if text is None:
+                raise APIError(404, f'No ticket with ID {parts[1]}')
+            return 200, text
+        if parts == ['counts']:
+            view = writer.read_view()
+            try:
+                counts = {status: view.count(status) for status in STATUSES}
+            finally:
+                view.close()
+            return 200, json.dumps(counts)
+        if parts == ['search']:
+            query = self.query.get('q', [''])[0]
+            if not query.strip():
+                raise APIError(400, 'Search needs q')
+            fields = tuple(self.query['field']) if 'field' in self.query else None
+            texts = writer.submit(search(query, fields, self.statuses(','.join(STATUSES)), self.limit()))
+            return 200, ticket_list_body(texts)
+        raise APIError(404, 'Not found')
+
+    def post_routes(self, parts):
+        writer = self.server.writer
+        body = self.json_body()
+        if parts == ['tickets']:
+            title = str(body.get('title', '')).strip()
+            description = str(body.get('description', '')).strip()
+            if not title or not description:
+                raise APIError(400, 'Title and description cannot be empty.')
+            return 201, writer.submit(create_ticket(title, description, str(body.get('phone_number', ''))))
+        if len(parts) == 3 and parts[0] == 'tickets' and parts[2] == 'notes':
+            note = str(body.get('note', '')).strip()
+            if not note:
+                raise APIError(400, 'The note cannot be empty.')
+            return 200, writer.submit(add_note(self.ticket_id(parts[1]), note))
+        if len(parts) == 3 and parts[0] == 'tickets' and parts[2] == 'status':
+            status = body.get('status')
+            if status not in STATUSES:
+                raise APIError(400, f'status must be one of {", ".join(STATUSES)}')
+            return 200, writer.submit(set_status(self.ticket_id(parts[1]), status))
+        if parts == ['batch']:
+            action = body.get('action')
+            text = body.get('text')
+            if action not in BATCH_ACTIONS:
+                raise APIError(400, f'action must be one of {", ".join(BATCH_ACTIONS)}')
+            # Only the phone number can be set to nothing.
+            if action not in BATCH_STATUSES and not (isinstance(text, str) and (text.strip() or action == 'phone_number')):
+                raise APIError(400, f'{action} needs some text')
+            return 200, ticket_list_body(writer.submit(change_many(self.ticket_ids(body.get('ids')), action, text)))
+        raise APIError(404, 'Not found')
+
+    def check_caller(self):
+        '''Turns away requests a web page could have made the browser send.'''
+        port = self.server.server_port
+        hosts = {f'[{name}]' if ':' in name else name for name in LOCAL_NAMES}
+        allowed = {f'{host}:{port}' for host in hosts} | (hosts if port == 80 else set())
+        if self.headers.get('Host', '').lower() not in allowed:
+            raise APIError(403, 'Ask for localhost or 127.0.0.1')
+        origin = self.headers.get('Origin')
+        if origin is not None and urlsplit(origin).hostname not in LOCAL_NAMES:
+            raise APIError(403, 'Requests from web pages are not accepted')
+
+    def json_body(self):
+        if self.headers.get_content_type() != 'application/json':
+            raise APIError(415, 'The body has to be sent as application/json')
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            raise APIError(400, 'The body has to be JSON')
+        if not isinstance(body, dict):
+            raise APIError(400, 'The body has to be a JSON object')
+        return body
+
+    def ticket_id(self, text):
+        try:
+            return int(text)
+        except ValueError:
+            raise APIError(400, f'{text} is not a ticket ID')
+
+    def ticket_ids(self, ids):
+        # A list of IDs, or the same text the command line takes ("10-20,25").
+        try:
+            if isinstance(ids, str):
+                return parse_ticket_ids(ids)
+            if isinstance(ids, list) and all(isinstance(ticket_id, int) for ticket_id in ids):
+                return ids
+        except ValueError as error:
+            raise APIError(400, str(error))
+        raise APIError(400, 'ids has to be a list of ticket IDs or text like "10-20,25"')
+
+    def statuses(self, default):
+        statuses = tuple(self.query.get('status', [default])[0].split(','))
+        if any(status not in STATUSES for status in statuses):
+            raise APIError(400, f'status must be one or more of {", ".join(STATUSES)}')
+        return statuses
+
+    def limit(self):
+        try:
+            return max(1, min(int(self.query.get('limit', ['50'])[0]), MAX_LIMIT))
+        except ValueError:
+            raise APIError(400, 'limit has to be a number')
+
+    def log_message(self, format, *args):
+        # Every request in the action log would drown out everything else in it.
+        logging.debug(f"API {self.address_string()} {format % args}")
+
+
+class TicketServer(HTTPServer):
+    '''HTTP server that hands each request to a fixed pool of threads, instead of starting a thread per request.'''
+
+    def __init__(self, writer, host=API_HOST, port=API_PORT, threads=API_THREADS):
+        super().__init__((host, port), TicketRequestHandler)
+        self.writer = writer
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def start_server(writer, host=API_HOST, port=API_PORT, threads=API_THREADS):
+    '''Starts answering requests on a background thread and returns the server. server.shutdown() stops it.'''
+    server = TicketServer(writer, host, port, threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"API server listening on http://{host}:{server.server_port}")
+    return server
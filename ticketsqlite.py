@@ -0,0 +1,552 @@
+# SQLite storage for the Ticket System (set STORAGE = 'sqlite' in ticketcore.py).
+# Tickets and notes live in tickets.db. Nothing is read until a view, a count or a search asks for it,
+# and each of those is a query on an index, so opening a big archive costs about the same as a small one.
+# Search uses an FTS5 trigram table, which finds any part of a word like the in-memory index does.
+# Other copies of the program can use the same database. Every recorded change also goes in the changes
+# table, so each copy can read back just the tickets the others changed.
+
+
+import contextlib
+import logging
+import os
+import sqlite3
+import weakref
+from datetime import datetime
+
+from ticketcore import (STATUSES, TICKET_FILE, SQLITE_FILE, Ticket, JsonStorage, Reports, Histogram, caller_key, digits_only,
+                        phone_digits, ticket_key, note_to_dict, note_from_dict, parse_date, to_seconds, record_ticket_ids,
+                        timed, log_action)
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    phone_number TEXT NOT NULL,
+    status TEXT NOT NULL,
+    creation_date TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    closed_date TEXT,
+    caller TEXT
+);
+CREATE INDEX IF NOT EXISTS tickets_by_status ON tickets (status, created_at, id);
+CREATE INDEX IF NOT EXISTS tickets_by_date ON tickets (created_at, id);
+
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    ticket_id INTEGER NOT NULL REFERENCES tickets (id),
+    note TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notes_by_ticket ON notes (ticket_id, id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS ticket_search USING fts5 (
+    title, description, phone_number, phone_digits, notes, tokenize = 'trigram'
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id INTEGER NOT NULL
+);
+
+-- The Reports totals, changed in the same transaction as the tickets. The total of all close times is in meta.
+CREATE TABLE IF NOT EXISTS report_days (
+    day TEXT PRIMARY KEY,
+    opened INTEGER NOT NULL,
+    closed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS report_close_times (
+    bucket INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+'''
+
+# How many rows of the changes table are kept when the program closes. A copy of the program that
+# falls further behind than this reads every ticket it has loaded again.
+KEPT_CHANGES = 10000
+
+TICKET_COLUMNS = 'id, title, description, phone_number, status, creation_date, closed_date'
+
+# Columns update() may change. Anything else is not a column and must never end up in the SQL.
+EDITABLE_FIELDS = ('title', 'description', 'phone_number')
+
+# bm25 weights in ticket_search column order, same idea as SearchIndex.WEIGHTS.
+SEARCH_WEIGHTS = '3.0, 1.0, 3.0, 3.0, 1.0'
+
+
+def sort_key(created_at):
+    # ISO dates sort the same as the dates themselves, so the indexes can use plain text.
+    return created_at.isoformat(' ')
+
+
+def like_pattern(word):
+    return '%' + word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class SqliteTicketStore:
+    '''Does the same job as TicketStore, but reads tickets from the database as they are needed.
+    A ticket that has been read stays in memory as long as something (a view, a search, a change) holds on
+    to it, so everyone asking for it meanwhile gets the same object. The rest are read again when asked for.
+    Changes are written as they happen and committed when the storage records them.'''
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.loaded = weakref.WeakValueDictionary()
+        self.listeners = []
+        self.storage = None
+        self.archive = None
+        self.counts = dict.fromkeys(STATUSES, 0)
+        for status, count in connection.execute('SELECT status, COUNT(*) FROM tickets GROUP BY status'):
+            self.counts[status] = count
+        self.next_id = self.stored_next_id()
+        # The last change from the changes table this store has seen.
+        self.change_seq = connection.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+
+    def stored_next_id(self):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        if row is None:
+            row = self.connection.execute('SELECT COALESCE(MAX(id) + 1, 0) FROM tickets').fetchone()
+        return int(row[0])
+
+    def changed(self, ticket):
+        ticket.rendered = None
+        for listener in self.listeners:
+            listener(ticket)
+
+    def notes_of(self, ticket_ids):
+        '''{ticket ID: [note dicts]} for a batch of tickets. One query for the whole batch instead of one per ticket.'''
+        notes = {ticket_id: [] for ticket_id in ticket_ids}
+        for start in range(0, len(ticket_ids), 500):
+            chunk = ticket_ids[start:start + 500]
+            for ticket_id, note, timestamp in self.connection.execute(
+                    f'SELECT ticket_id, note, timestamp FROM notes WHERE ticket_id IN ({", ".join("?" * len(chunk))}) ORDER BY id',
+                    chunk):
+                notes[ticket_id].append({'note': note, 'timestamp': timestamp})
+        return notes
+
+    def tickets_from_rows(self, rows):
+        # Held here, so none of them can be let go of between finding it and handing it out.
+        found = {row[0]: self.loaded.get(row[0]) for row in rows}
+        missing = [ticket_id for ticket_id, ticket in found.items() if ticket is None]
+        notes = {ticket_id: [note_from_dict(note) for note in ticket_notes]
+                 for ticket_id, ticket_notes in self.notes_of(missing).items()}
+        tickets = []
+        for ticket_id, title, description, phone_number, status, creation_date, closed_date in rows:
+            ticket = found[ticket_id]
+            if ticket is None:
+                ticket = Ticket(title, description, phone_number, creation_date, notes=notes[ticket_id],
+                                is_open=status != "closed", status=status, ticket_id=ticket_id, closed_date=closed_date)
+                self.loaded[ticket_id] = ticket
+            tickets.append(ticket)
+        return tickets
+
+    def get(self, ticket_id):
+        ticket = self.loaded.get(ticket_id)
+        if ticket is not None:
+            return ticket
+        rows = self.connection.execute(f'SELECT {TICKET_COLUMNS} FROM tickets WHERE id = ?', (ticket_id,)).fetchall()
+        return self.tickets_from_rows(rows)[0] if rows else None
+
+    def has(self, ticket_id):
+        return ticket_id in self.loaded or self.connection.execute(
+            'SELECT 1 FROM tickets WHERE id = ?', (ticket_id,)).fetchone() is not None
+
+    def find(self, ticket_id):
+        # Nothing is archived here, looking at a ticket is the same as getting it.
+        return self.get(ticket_id)
+
+    def index_ticket(self, ticket):
+        self.connection.execute('DELETE FROM ticket_search WHERE rowid = ?', (ticket.ticket_id,))
+        self.connection.execute(
+            'INSERT INTO ticket_search (rowid, title, description, phone_number, phone_digits, notes) VALUES (?, ?, ?, ?, ?, ?)',
+            (ticket.ticket_id, ticket.title, ticket.description, ticket.phone_number,
+             digits_only(ticket.phone_number),
+             '\n'.join(note.text for note in ticket.notes)))
+
+    def add(self, ticket):
+        if ticket.ticket_id is None:
+            # Another program may have added tickets since, the database has the real next ID. Taking the
+            # write lock first means nobody else can hand out the same one before this is committed.
+            if not self.connection.in_transaction:
+                self.connection.execute('BEGIN IMMEDIATE')
+            self.next_id = max(self.next_id, self.stored_next_id())
+            ticket.ticket_id = self.next_id
+        self.next_id = max(self.next_id, ticket.ticket_id + 1)
+        change = Reports()
+        change.count(ticket.created_at, ticket.status, ticket.closed_at)
+        self.save_report_change(change)
+        self.connection.execute(
+            'INSERT INTO tickets (id, title, description, phone_number, status, creation_date, created_at, closed_date, caller) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (ticket.ticket_id, ticket.title, ticket.description, ticket.phone_number, ticket.status,
+             ticket.creation_date, sort_key(ticket.created_at), ticket.closed_date, caller_key(ticket.phone_number)))
+        self.connection.executemany(
+            'INSERT INTO notes (ticket_id, note, timestamp) VALUES (?, ?, ?)',
+            [(ticket.ticket_id, note.text, note.timestamp) for note in ticket.notes])
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)", (str(self.next_id),))
+        self.index_ticket(ticket)
+        self.loaded[ticket.ticket_id] = ticket
+        self.counts[ticket.status] += 1
+        self.changed(ticket)
+        return ticket
+
+    def add_many(self, new_tickets):
+        # Inside changing this is all one transaction, committed once at the end.
+        return [self.add(ticket) for ticket in new_tickets]
+
+    def set_status(self, ticket, new_status, closed_date=None):
+        if new_status == ticket.status:
+            return
+        self.counts[ticket.status] -= 1
+        self.counts[new_status] += 1
+        old_status, old_closed_at = ticket.status, ticket.closed_at
+        ticket.set_status(new_status, closed_date)
+        change = Reports()
+        change.status_changed(ticket, old_status, old_closed_at)
+        self.save_report_change(change)
+        self.connection.execute('UPDATE tickets SET status = ?, closed_date = ? WHERE id = ?',
+                                (new_status, ticket.closed_date, ticket.ticket_id))
+        self.changed(ticket)
+
+    def close(self, ticket):
+        self.set_status(ticket, "closed")
+
+    def update(self, ticket, **fields):
+        for field, value in fields.items():
+            if field not in EDITABLE_FIELDS:
+                raise ValueError(f"Can't change {field}")
+            self.connection.execute(f'UPDATE tickets SET {field} = ? WHERE id = ?', (value, ticket.ticket_id))
+            if field == 'phone_number':
+                self.connection.execute('UPDATE tickets SET caller = ? WHERE id = ?', (caller_key(value), ticket.ticket_id))
+            setattr(ticket, field, value)
+        self.index_ticket(ticket)
+        self.changed(ticket)
+
+    def add_note(self, ticket, note):
+        note_entry = note_to_dict(ticket.add_note(note))
+        self.connection.execute('INSERT INTO notes (ticket_id, note, timestamp) VALUES (?, ?, ?)',
+                                (ticket.ticket_id, note_entry['note'], note_entry['timestamp']))
+        self.index_ticket(ticket)
+        self.changed(ticket)
+        return note_entry
+
+    def save_report_change(self, change):
+        '''Adds a Reports made of just one change to the report tables.'''
+        self.connection.executemany(
+            'INSERT INTO report_days (day, opened, closed) VALUES (?, ?, ?) '
+            'ON CONFLICT (day) DO UPDATE SET opened = opened + excluded.opened, closed = closed + excluded.closed',
+            [(day, opened, closed) for day, (opened, closed) in change.days.items()])
+        self.connection.executemany(
+            'INSERT INTO report_close_times (bucket, count) VALUES (?, ?) '
+            'ON CONFLICT (bucket) DO UPDATE SET count = count + excluded.count',
+            change.close_times.buckets.items())
+        if change.close_times.total:
+            self.connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('close_total', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + excluded.value", (change.close_times.total,))
+
+    def report(self):
+        '''The Reports, read from the report tables. Databases from before there were reports get them
+        worked out from every ticket the first time.'''
+        if self.connection.execute("SELECT 1 FROM meta WHERE key = 'reports'").fetchone() is None:
+            if not self.connection.in_transaction:
+                self.connection.execute('BEGIN IMMEDIATE')
+            reports = Reports(self.next_id)
+            for created_at, status, closed_date in self.connection.execute('SELECT created_at, status, closed_date FROM tickets'):
+                reports.count(datetime.fromisoformat(created_at), status,
+                              None if closed_date is None else to_seconds(parse_date(closed_date)))
+            for table in ('report_days', 'report_close_times'):
+                self.connection.execute(f'DELETE FROM {table}')
+            self.connection.execute("DELETE FROM meta WHERE key = 'close_total'")
+            self.save_report_change(reports)
+            self.connection.execute("INSERT INTO meta (key, value) VALUES ('reports', '1')")
+            self.connection.commit()
+        reports = Reports(self.next_id)
+        for day, opened, closed in self.connection.execute('SELECT day, opened, closed FROM report_days'):
+            reports.days[day] = [opened, closed]
+        histogram = reports.close_times
+        for bucket, count in self.connection.execute('SELECT bucket, count FROM report_close_times WHERE count > 0'):
+            histogram.buckets[bucket] = count
+            histogram.count += count
+            # Only the buckets are kept, the top of the highest one will do for the slowest.
+            histogram.max = max(histogram.max, 2 ** (bucket / Histogram.BUCKETS_PER_DOUBLING))
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'close_total'").fetchone()
+        histogram.total = float(row[0]) if row else 0.0
+        return reports
+
+    def refresh(self, ticket, fresh):
+        '''Copies a newer version of a ticket (changed by another program) over the one in memory.'''
+        for field in ('title', 'description', 'phone_number', 'notes', 'status', 'closed_at'):
+            setattr(ticket, field, getattr(fresh, field))
+        self.changed(ticket)
+
+    def read_changes(self):
+        '''Reads back the tickets other programs changed since this store last looked, and returns them.'''
+        oldest, newest = self.connection.execute('SELECT MIN(seq), MAX(seq) FROM changes').fetchone()
+        if newest is None or newest <= self.change_seq:
+            return []
+        if oldest > self.change_seq + 1:
+            # Fell behind further than the table goes back, everything in memory might be out of date.
+            changed_ids = list(self.loaded)
+        else:
+            changed_ids = [row[0] for row in self.connection.execute(
+                'SELECT DISTINCT ticket_id FROM changes WHERE seq > ?', (self.change_seq,))]
+        self.change_seq = newest
+        return self.read_again(changed_ids)
+
+    def read_again(self, ticket_ids):
+        '''Reads the counts and the given tickets back from the database and returns the ones still there.'''
+        self.counts = dict.fromkeys(STATUSES, 0)
+        for status, count in self.connection.execute('SELECT status, COUNT(*) FROM tickets GROUP BY status'):
+            self.counts[status] = count
+        self.next_id = max(self.next_id, self.stored_next_id())
+        changed = []
+        for ticket_id in ticket_ids:
+            # Read again from the database. A ticket that's already loaded keeps its object and gets the new fields.
+            old = self.loaded.pop(ticket_id, None)
+            ticket = self.get(ticket_id)
+            if ticket is None:
+                continue
+            if old is not None:
+                self.loaded[ticket_id] = old
+                self.refresh(old, ticket)
+                ticket = old
+            else:
+                self.changed(ticket)
+            changed.append(ticket)
+        return changed
+
+    def roll_back(self):
+        '''For after a change failed and its transaction was rolled back. The loaded tickets may have been
+        changed already, so they're all read again, and a ticket that was added goes away.'''
+        self.next_id = self.stored_next_id()
+        self.read_again(list(self.loaded))
+
+    def count(self, status):
+        return self.counts[status]
+
+    def page_rows(self, statuses, before=None, count=50):
+        where = []
+        params = []
+        if statuses is not None:
+            where.append(f'status IN ({", ".join("?" * len(statuses))})')
+            params.extend(statuses)
+        if before is not None:
+            where.append('(created_at, id) < (?, ?)')
+            params.extend([sort_key(before[0]), before[1]])
+        sql = f'SELECT {TICKET_COLUMNS} FROM tickets'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+        return self.connection.execute(sql, params + [count]).fetchall()
+
+    def page(self, statuses, before=None, count=50):
+        '''Up to count tickets with the given statuses (all if None) older than the key before, newest first.'''
+        return self.tickets_from_rows(self.page_rows(statuses, before, count))
+
+    def ticket_dicts(self, statuses):
+        '''Every ticket with the given statuses as a dict, newest first, for exporting. Read a batch at a time
+        and not kept in loaded like the tickets newest_first hands out, so a big export doesn't fill memory.'''
+        before = None
+        while True:
+            rows = self.page_rows(statuses, before, 500)
+            notes = self.notes_of([row[0] for row in rows])
+            for ticket_id, title, description, phone_number, status, creation_date, closed_date in rows:
+                yield {'id': ticket_id, 'status': status, 'is_open': status != "closed", 'creation_date': creation_date,
+                       'title': title, 'description': description, 'phone_number': phone_number,
+                       'notes': notes[ticket_id], 'closed_date': closed_date}
+            if len(rows) < 500:
+                return
+            before = (parse_date(rows[-1][5]), rows[-1][0])
+
+    def newest_first(self, *statuses, archived=False):
+        # There's no archive here, the database only reads what it needs anyway.
+        before = None
+        while True:
+            batch = self.page(statuses or None, before, 500)
+            yield from batch
+            if len(batch) < 500:
+                return
+            before = ticket_key(batch[-1])
+
+    def __iter__(self):
+        return self.newest_first()
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def build_search_index(self):
+        # The FTS table is the index, and it is always up to date.
+        pass
+
+    def search_index_job(self):
+        return (lambda: None), (lambda index: None)
+
+    def contacts_job(self):
+        # tickets_by_caller does the job of the ContactIndex.
+        return (lambda: None), (lambda index: None)
+
+    @timed('caller history')
+    def caller_history(self, phone_number, statuses=STATUSES):
+        '''Every ticket with the given statuses from the caller with this phone number, newest first.'''
+        key = caller_key(phone_number)
+        if not key:
+            return []
+        rows = self.connection.execute(
+            f'SELECT {TICKET_COLUMNS} FROM tickets WHERE caller = ? AND status IN ({", ".join("?" * len(statuses))}) '
+            'ORDER BY created_at DESC, id DESC', [key] + list(statuses)).fetchall()
+        return self.tickets_from_rows(rows)
+
+    @timed('search')
+    def search(self, query, fields=None, statuses=STATUSES, whole_phrase=False):
+        '''Tickets matching every word of query in at least one of fields, best match first.'''
+        fields = fields or ('title', 'description', 'phone_number', 'notes')
+        query = query.strip()
+        words = [query] if whole_phrase else query.split()
+        if not words:
+            return []
+        matches = []
+        where = [f't.status IN ({", ".join("?" * len(statuses))})']
+        like_params = []
+        for word in words:
+            digits = phone_digits(word)
+            if len(word) >= 3:
+                # Trigrams need three characters. A quoted string matches anywhere in the column, like "in".
+                options = ['{%s} : "%s"' % (' '.join(fields), word.replace('"', '""'))]
+                if 'phone_number' in fields and len(digits) >= 3:
+                    options.append(f'phone_digits : "{digits}"')
+                matches.append('(' + ' OR '.join(options) + ')')
+            else:
+                where.append('(' + ' OR '.join(f"s.{field} LIKE ? ESCAPE '\\'" for field in fields) + ')')
+                like_params.extend([like_pattern(word)] * len(fields))
+        params = list(statuses) + like_params
+        order = 't.created_at DESC, t.id DESC'
+        if matches:
+            where.insert(0, 'ticket_search MATCH ?')
+            params.insert(0, ' AND '.join(matches))
+            order = f'bm25(ticket_search, {SEARCH_WEIGHTS}), ' + order
+        columns = ', '.join('t.' + column for column in TICKET_COLUMNS.split(', '))
+        sql = (f'SELECT {columns} FROM ticket_search s JOIN tickets t ON t.id = s.rowid '
+               f'WHERE {" AND ".join(where)} ORDER BY {order}')
+        rows = self.connection.execute(sql, params).fetchall()
+        return self.tickets_from_rows(rows)
+
+
+class SqliteStorage:
+    '''Tickets in an SQLite database. Every change is written right away and committed when it's recorded.'''
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+        # Goes up whenever another connection commits, so checking for changes is one cheap query.
+        self.data_version = None
+
+    def load(self, search_index=True):
+        first_start = not os.path.exists(self.path)
+        # Loaded on the background worker, used on the main thread afterwards. Never both at once.
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL with synchronous=NORMAL makes a commit cheap enough to do on every click.
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.executescript(SCHEMA)
+        # Databases from before tickets kept their closing time.
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(tickets)')]
+        if 'closed_date' not in columns:
+            self.connection.execute('ALTER TABLE tickets ADD COLUMN closed_date TEXT')
+        # And from before the caller history. Every ticket gets its caller once, in SQL.
+        if 'caller' not in columns:
+            self.connection.create_function('caller_key', 1, caller_key, deterministic=True)
+            self.connection.execute('ALTER TABLE tickets ADD COLUMN caller TEXT')
+            self.connection.execute('UPDATE tickets SET caller = caller_key(phone_number)')
+            self.connection.commit()
+        self.connection.execute('CREATE INDEX IF NOT EXISTS tickets_by_caller ON tickets (caller, created_at, id)')
+        tickets = SqliteTicketStore(self.connection)
+        # Only the main database takes over tickets.json. A new workspace starts out empty.
+        if first_start and self.path == SQLITE_FILE and os.path.exists(TICKET_FILE):
+            self.copy_json_tickets(tickets)
+        tickets.storage = self
+        self.data_version = self.connection.execute('PRAGMA data_version').fetchone()[0]
+        log_action('load', f"Tickets Loaded successfully ({len(tickets)} in {self.path})")
+        return tickets
+
+    def copy_json_tickets(self, tickets):
+        # First start on SQLite with a tickets.json around: bring those tickets over, once.
+        old_tickets = JsonStorage(TICKET_FILE).load(search_index=False)
+        for ticket in old_tickets:
+            tickets.add(ticket)
+        tickets.next_id = max(tickets.next_id, old_tickets.next_id)
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)", (str(tickets.next_id),))
+        self.connection.commit()
+        logging.info(f"Copied {len(old_tickets)} tickets from {TICKET_FILE} to {self.path}")
+
+    def record(self, tickets, record):
+        seqs = [self.connection.execute('INSERT INTO changes (ticket_id) VALUES (?)', (ticket_id,)).lastrowid
+                for ticket_id in record_ticket_ids(record)]
+        self.connection.commit()
+        # This program's own changes don't need reading back, unless another program's came in between.
+        if seqs and seqs[0] == tickets.change_seq + 1:
+            tickets.change_seq = seqs[-1]
+
+    @contextlib.contextmanager
+    def changing(self, tickets):
+        # The write lock is taken before reading the changes, so nothing can come in between.
+        if not self.connection.in_transaction:
+            self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            tickets.read_changes()
+            yield
+        except BaseException:
+            # Nothing of a change that failed halfway gets saved, and memory goes back to what's saved.
+            self.connection.rollback()
+            tickets.roll_back()
+            raise
+        self.connection.commit()
+
+    def sync(self, tickets, wait=True):
+        '''Reads back what other programs changed and returns the changed tickets.'''
+        data_version = self.connection.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self.data_version:
+            return []
+        self.data_version = data_version
+        changed = tickets.read_changes()
+        if changed:
+            logging.info(f"Read {len(changed)} tickets changed by another program in {self.path}")
+        return changed
+
+    def copied_rows(self, statuses):
+        '''Like copied_rows in ticketcore: returns a function for the background worker handing over ticket_dicts
+        as they are now, while this connection goes on changing. They come from a read transaction on a connection
+        of their own, which starts here and sees the database as it is at this moment.'''
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute('BEGIN')
+        # Its first reads start the transaction's view of the database.
+        reader = SqliteTicketStore(connection)
+
+        def rows():
+            try:
+                yield from reader.ticket_dicts(statuses)
+            finally:
+                connection.close()
+        return rows
+
+    def save(self, tickets):
+        self.connection.commit()
+
+    def save_job(self, tickets):
+        # Every change is committed as it happens, there is nothing left for the worker to write.
+        self.connection.commit()
+        return lambda: None
+
+    def close(self, tickets, compact=False):
+        self.connection.commit()
+        if compact:
+            self.connection.execute('DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?', (KEPT_CHANGES,))
+            self.connection.commit()
+            self.connection.execute('PRAGMA optimize')
+        self.connection.close()